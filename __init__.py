@@ -1,16 +1,44 @@
 import os
-import sys 
-import subprocess 
+import sys
 
 cwd                          = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(cwd)
-    
+
 from wordnet_mapper import WordNetMapper
 from config import paths
 
+class DocumentationFile(object):
+    '''
+    class attribute with the content of a file of the repository, which is
+    only read on first access. The attribute is None if the file is missing.
+    '''
+    def __init__(self, path):
+        self.path    = path
+        self.content = None
+        self.read    = False
+
+    def __get__(self, instance, owner):
+        if not self.read:
+            try:
+                with open(self.path) as infile:
+                    self.content = infile.read()
+            except IOError:
+                self.content = None
+            self.read = True
+        return self.content
+
+def __getattr__(name):
+    '''
+    AsyncWordNetMapper (python 3.7+) is only imported when it is used
+    '''
+    if name == 'AsyncWordNetMapper':
+        from async_mapper import AsyncWordNetMapper
+        return AsyncWordNetMapper
+    raise AttributeError("module %r has no attribute %r" % (__name__,name))
+
 #documentation attributes
-WordNetMapper.README         = open(os.path.join(cwd,"README.md")).read()
-WordNetMapper.LICENSE        = open(os.path.join(cwd,"LICENSE.md")).read()
+WordNetMapper.README         = DocumentationFile(os.path.join(cwd,"README.md"))
+WordNetMapper.LICENSE        = DocumentationFile(os.path.join(cwd,"LICENSE.md"))
 WordNetMapper.__author__     = ["Marten Postma","Ruben Izquierdo"]
 WordNetMapper.__license__    = "Apache"
 WordNetMapper.__version__    = "1.0.3"
@@ -0,0 +1,232 @@
+'''
+asyncio front end of WordNetMapper (python 3 only).
+
+every map_* method of WordNetMapper is available as a coroutine. Bins that
+are not loaded yet are loaded in an executor, so the event loop is never
+blocked by unpickling a bin, and coroutines that wait for the same bin share
+one load. Once the bins of a call are loaded, the lookup itself runs inline.
+'''
+#import built-in modules
+import os
+import asyncio
+import inspect
+from functools import partial
+
+#import installed or created modules
+from config import paths
+from wordnet_mapper import WordNetMapper
+from wn_mapper_utils import pos_lexkey
+
+#method -> bins needed by the method, as (kind,source argument,target
+#argument) tuples. A source argument ili takes the wordnet version from the
+#ilidef. offset2lexkey and lexkey2offset bins only have a source version.
+#reverse_offset2offset is the inverted offset2offset bin (see
+#WordNetMapper.load_reverse_offset_to_offset).
+REQUIRED_BINS = {
+    'map_offset_to_offset'   : [('offset2offset','source_wn_version','target_wn_version')],
+    'map_offset_from_offset' : [('reverse_offset2offset','source_wn_version','target_wn_version')],
+    'map_offset_to_ilidef'   : [('offset2offset','source_wn_version','target_wn_version')],
+    'map_offset_to_lexkey'   : [('offset2lexkey','source_wn_version',None)],
+    'map_lexkey_to_offset'   : [('lexkey2offset','source_wn_version',None)],
+    'map_lexkey_to_lexkey'   : [('lexkey2offset','source_wn_version',None),
+                                ('offset2offset','source_wn_version','target_wn_version'),
+                                ('offset2lexkey','target_wn_version',None)],
+    'map_lexkey_to_ilidef'   : [('lexkey2offset','source_wn_version',None),
+                                ('offset2offset','source_wn_version','target_wn_version')],
+    'map_ilidef_to_lexkey'   : [('offset2lexkey','ilidef',None)],
+    'map_ilidef_to_offset'   : [('offset2offset','ili','target_wn_version')],
+    'map_ilidef_to_ilidef'   : [('offset2offset','ili','target_wn_version'),
+                                ('offset2offset','target_wn_version','target_wn_version')],
+    'map_offsets_to_offsets' : [('offset2offset','source_wn_version','target_wn_version')],
+    'map_offsets_to_ilidefs' : [('offset2offset','source_wn_version','target_wn_version')],
+    'map_offsets_to_lexkeys' : [('offset2lexkey','source_wn_version',None)],
+    'map_lexkeys_to_offsets' : [('lexkey2offset','source_wn_version',None)],
+    'map_lexkeys_to_ilidefs' : [('lexkey2offset','source_wn_version',None),
+                                ('offset2offset','source_wn_version','target_wn_version')],
+    'map_lexkeys_to_lexkeys' : [('lexkey2offset','source_wn_version',None),
+                                ('offset2offset','source_wn_version','target_wn_version'),
+                                ('offset2lexkey','target_wn_version',None)],
+}
+
+def version_argument(arguments, name):
+    '''
+    @rtype: str | None
+    @return: wordnet version of argument name, None if it can not be
+    determined (the method then raises its usual exception)
+    '''
+    value = arguments[name]
+    if name in ('ili','ilidef'):
+        split = value.split('-') if isinstance(value,str) else []
+        return split[1] if len(split) == 4 else None
+    return value
+
+def pos_arguments(arguments):
+    '''
+    >>> pos_arguments({'lexkeys' : ['rock_hopper%1:05:00::','cerulean%5:00:00:chromatic:00',
+    ...                             'moustache%1:08:00::',5]})
+    ['n', 'a']
+
+    @rtype: list
+    @return: parts of speech with which the method loads offset2offset bins
+    (see WordNetMapper.offset_to_offset_bins): the pos argument, the pos of
+    the lexkey or ilidef argument, or the parts of speech of the lexkeys of
+    a batch method (see WordNetMapper.map_offsets_per_pos). [None] for all
+    parts of speech.
+    '''
+    if 'pos' in arguments:
+        return [arguments['pos']]
+    try:
+        if 'lexkey' in arguments:
+            return [pos_lexkey(arguments['lexkey'])]
+        if 'ili' in arguments:
+            return [arguments['ili'].split('-')[3]]
+    except (AttributeError,ValueError,IndexError,KeyError):
+        pass
+    if 'lexkeys' in arguments:
+        pos_values = []
+        for lexkey in arguments['lexkeys']:
+            try:
+                pos = pos_lexkey(lexkey)
+            except (AttributeError,ValueError,IndexError,KeyError):
+                continue
+            if pos not in pos_values:
+                pos_values.append(pos)
+        return pos_values
+    return [None]
+
+class AsyncWordNetMapper():
+    '''
+    asyncio wrapper of a WordNetMapper.
+
+    >>> async def main():
+    ...     my_mapper = AsyncWordNetMapper()
+    ...     outputs = await asyncio.gather(*[my_mapper.map_offset_to_offset("00020846", "21", "30")
+    ...                                      for request in range(4)])
+    ...     return outputs,my_mapper.mapper.bin_cache.misses
+    >>> asyncio.run(main())
+    ([('00021939', 'n'), ('00021939', 'n'), ('00021939', 'n'), ('00021939', 'n')], 1)
+    '''
+    def __init__(self, mapper=None, executor=None, **kwargs):
+        '''
+        @type  mapper: WordNetMapper | None
+        @param mapper: the mapper that is wrapped (default: a new
+        WordNetMapper created with kwargs)
+
+        @type  executor: concurrent.futures.Executor | None
+        @param executor: executor in which bins are loaded (default: the
+        default executor of the event loop)
+        '''
+        self.mapper   = mapper if mapper is not None else WordNetMapper(**kwargs)
+        self.executor = executor
+        #path of bin -> future of the load in progress
+        self.loading  = {}
+
+    def bin_paths(self, method, args, kwargs):
+        '''
+        @rtype: list
+        @return: list of (path of bin,function that loads the bin) needed by
+        a call of method
+        '''
+        signature = inspect.signature(getattr(WordNetMapper,method))
+        arguments = signature.bind(self.mapper,*args,**kwargs)
+        arguments.apply_defaults()
+        arguments = arguments.arguments
+
+        bins = []
+        for kind,source,target in REQUIRED_BINS[method]:
+            source_wn_version = version_argument(arguments, source)
+            if source_wn_version is None:
+                continue
+
+            if kind == 'reverse_offset2offset':
+                target_wn_version = version_argument(arguments, target)
+                for pos in pos_arguments(arguments):
+                    try:
+                        path_bin,bin_pos = self.mapper.reverse_offset_to_offset_path(source_wn_version,
+                                                                                     target_wn_version,
+                                                                                     pos)
+                    except ValueError:
+                        continue
+                    bins.append((path_bin,partial(self.mapper.load_reverse_offset_to_offset,
+                                                  source_wn_version,
+                                                  target_wn_version,
+                                                  bin_pos)))
+            elif kind == 'offset2offset':
+                target_wn_version = version_argument(arguments, target)
+                if (method in ('map_lexkey_to_ilidef','map_lexkeys_to_ilidefs') and
+                    source_wn_version == target_wn_version):
+                    continue
+                for pos in pos_arguments(arguments):
+                    try:
+                        offset2offset_bins = self.mapper.offset_to_offset_bins(source_wn_version,
+                                                                               target_wn_version,
+                                                                               pos)
+                    except ValueError:
+                        #unknown pos, the method raises ValueError itself
+                        continue
+                    for path_bin in offset2offset_bins:
+                        bins.append((path_bin,partial(self.mapper.load_bin_if_needed,
+                                                      path_bin,
+                                                      'mapping_offset_to_offset')))
+            else:
+                path_bin = os.path.join(paths['dir_%s_bins' % kind],source_wn_version)
+                bins.append((path_bin,partial(self.mapper.load_bin_if_needed,
+                                              path_bin,
+                                              {'offset2lexkey' : 'mapping_offset_to_lexkey',
+                                               'lexkey2offset' : 'mapping_lexkey_to_offset'}[kind])))
+
+        #without partitions, the parts of speech share the bin of all of them
+        seen = set()
+        return [(path_bin,load) for path_bin,load in bins
+                if not (path_bin in seen or seen.add(path_bin))]
+
+    async def load_bins(self, bins):
+        '''
+        load the bins that are not in the bin cache in the executor. A bin
+        that is already being loaded for another coroutine is not loaded
+        again, the coroutine waits for that load.
+
+        @type  bins: list
+        @param bins: list of (path of bin,function that loads the bin)
+        '''
+        loop = asyncio.get_running_loop()
+        for path_bin,load in bins:
+            if path_bin in self.mapper.bin_cache:
+                continue
+
+            future = self.loading.get(path_bin)
+            if future is None:
+                future = loop.run_in_executor(self.executor, load)
+                self.loading[path_bin] = future
+                future.add_done_callback(lambda future, path_bin=path_bin:
+                                         self.loading.pop(path_bin,None))
+            try:
+                #a cancelled caller does not cancel the load of the others
+                await asyncio.shield(future)
+            except IOError:
+                #the method raises IOError itself
+                pass
+
+    async def preload(self, *args, **kwargs):
+        '''
+        coroutine version of WordNetMapper.preload, run in the executor
+        '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          lambda: self.mapper.preload(*args, **kwargs))
+
+def _coroutine(method):
+    '''
+    create the coroutine version of a map_* method of WordNetMapper
+    '''
+    async def coroutine(self, *args, **kwargs):
+        await self.load_bins(self.bin_paths(method, args, kwargs))
+        return getattr(self.mapper,method)(*args, **kwargs)
+
+    coroutine.__name__ = method
+    coroutine.__doc__  = ('coroutine version of WordNetMapper.%s. bins that '
+                          'are not loaded yet are loaded in the executor.' % method)
+    return coroutine
+
+for method in REQUIRED_BINS:
+    setattr(AsyncWordNetMapper, method, _coroutine(method))
@@ -0,0 +1,141 @@
+'''
+import time of the package, measured with python -X importtime in fresh
+processes, checked against a budget.
+
+usage:
+    python benchmarks/import_time.py [--runs N] [--budget MS] [--cold]
+
+the median cumulative import time of the package over the runs is compared
+with the budget, the exit status is 1 if it is exceeded. The modules that
+take longest to import (in the run with the median time) are listed as well.
+
+by default the bytecode of the modules is cached (written by a first import
+that is not measured, in a temporary pycache_prefix, python 3.8+), as in an
+installed package. With --cold, no bytecode is written (-B), so the modules
+of the package are compiled in every run unless the package directory has a
+__pycache__; the compilation then takes most of the time.
+'''
+#import built-in modules
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+cwd          = os.path.dirname(os.path.realpath(__file__))
+package_dir  = os.path.dirname(cwd)
+
+#budgets in milliseconds of the cumulative import time of the package, with
+#and without cached bytecode
+IMPORT_BUDGET_MS      = 15.0
+COLD_IMPORT_BUDGET_MS = 35.0
+
+def parse_importtime(stderr):
+    '''
+    parse the output of python -X importtime
+
+    @type  stderr: str
+    @param stderr: standard error of the process
+
+    @rtype: list
+    @return: list of (module,self microseconds,cumulative microseconds)
+    '''
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            self_us,cumulative_us = int(fields[0]),int(fields[1])
+        except ValueError:
+            #header line
+            continue
+        timings.append((fields[2].strip(),self_us,cumulative_us))
+    return timings
+
+def measure(package_name, python=sys.executable, options=(), env=None):
+    '''
+    import the package in a fresh process
+
+    @type  options: sequence
+    @param options: extra options of the interpreter
+
+    @type  env: dict | None
+    @param env: environment of the process (default: os.environ)
+
+    @rtype: tuple
+    @return: (cumulative microseconds of the package, timings of all modules)
+    '''
+    process = subprocess.Popen([python] + list(options) +
+                               ['-X','importtime','-c','import %s' % package_name],
+                               cwd=os.path.dirname(package_dir),
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               universal_newlines=True,
+                               env=env)
+    stdout,stderr = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError('import of %s failed:\n%s' % (package_name,stderr))
+
+    timings = parse_importtime(stderr)
+    for module,self_us,cumulative_us in timings:
+        if module == package_name:
+            return cumulative_us,timings
+    raise RuntimeError('no import time reported for %s' % package_name)
+
+def main(arguments=None):
+    '''
+    run the benchmark
+
+    @rtype: bool
+    @return: True if the median import time is within the budget
+    '''
+    parser = argparse.ArgumentParser(description='import time of the package')
+    parser.add_argument('--runs',type=int,default=10,
+                        help='number of fresh processes (default: 10)')
+    parser.add_argument('--budget',type=float,default=None,
+                        help='budget in ms (default: %s, %s with --cold)' % (IMPORT_BUDGET_MS,
+                                                                           COLD_IMPORT_BUDGET_MS))
+    parser.add_argument('--cold',action='store_true',
+                        help='compile the modules in every run')
+    parser.add_argument('--top',type=int,default=10,
+                        help='number of slowest modules listed (default: 10)')
+    args = parser.parse_args(arguments)
+
+    if args.budget is None:
+        args.budget = COLD_IMPORT_BUDGET_MS if args.cold else IMPORT_BUDGET_MS
+
+    package_name = os.path.basename(package_dir)
+    env          = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE',None)
+    prefix       = tempfile.mkdtemp()
+    try:
+        if args.cold:
+            options = ['-B']
+        else:
+            options = ['-X','pycache_prefix=%s' % prefix]
+            measure(package_name, options=options, env=env)
+        runs = sorted((measure(package_name, options=options, env=env)
+                       for run in range(args.runs)),
+                      key=lambda run: run[0])
+    finally:
+        shutil.rmtree(prefix, ignore_errors=True)
+    median_us,timings = runs[len(runs) // 2]
+
+    print('%-30s %10s %10s' % ('module','self ms','cumul. ms'))
+    for module,self_us,cumulative_us in sorted(timings,key=lambda timing: -timing[2])[:args.top]:
+        print('%-30s %10.2f %10.2f' % (module,self_us/1000.0,cumulative_us/1000.0))
+
+    within_budget = median_us/1000.0 <= args.budget
+    print('median %s import time of %s over %s runs: %.2f ms (budget %.2f ms): %s' % (
+          'cold' if args.cold else 'warm',
+          package_name,
+          args.runs,
+          median_us/1000.0,
+          args.budget,
+          'ok' if within_budget else 'OVER BUDGET'))
+    return within_budget
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,87 @@
+'''
+report the memory (measured with tracemalloc) of every bin with the old
+keys that repeat the wordnet version(s), for example
+(offset,source_wn_version,target_wn_version), with bare keys and in the
+internal representation of the mapper (see mapping_tables).
+
+usage:
+    python benchmarks/key_memory.py [--kinds kind [kind ...]]
+
+kind is offset2offset | offset2lexkey | lexkey2offset (default: all)
+'''
+#import built-in modules
+import os
+import sys
+import gzip
+import pickle
+import argparse
+import tracemalloc
+from glob import glob
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(cwd))
+
+from config import paths
+from bin_cache import strip_versions
+from mapping_tables import convert_bin
+
+def load_raw(path_gz):
+    '''
+    load a pickled bin without converting its keys
+    '''
+    with gzip.open(path_gz,'rb') as infile:
+        return dict(pickle.load(infile))
+
+def main(arguments=None):
+    '''
+    print the memory per bin with versioned keys, with bare keys and in the
+    internal representation
+
+    @rtype: list
+    @return: list of (bin,versioned bytes,bare bytes,internal bytes)
+    '''
+    parser = argparse.ArgumentParser(description='memory of the bins per kind of key')
+    parser.add_argument('--kinds',nargs='+',
+                        choices=['offset2offset','offset2lexkey','lexkey2offset'],
+                        default=['offset2offset','offset2lexkey','lexkey2offset'],
+                        metavar='KIND',
+                        help='offset2offset | offset2lexkey | lexkey2offset (default: all)')
+    args = parser.parse_args(arguments)
+
+    report = []
+    print('%-22s %12s %12s %12s %8s' % ('bin','versioned MB','bare MB',
+                                         'internal MB','saved'))
+    for kind in args.kinds:
+        for path_gz in sorted(glob(os.path.join(paths['dir_%s_bins' % kind],'*.gz'))):
+            tracemalloc.start()
+            versioned      = load_raw(path_gz)
+            versioned_size = tracemalloc.get_traced_memory()[0]
+            if not versioned or not isinstance(next(iter(versioned)),tuple):
+                tracemalloc.stop()
+                continue
+
+            #the bare bin shares the values and offset/lexkey strings with
+            #the versioned bin: once the versioned bin is gone, only the bare
+            #bin is left in the traced memory
+            bare = strip_versions(versioned)
+            del versioned
+            bare_size = tracemalloc.get_traced_memory()[0]
+
+            internal = convert_bin(bare)
+            del bare
+            internal_size = tracemalloc.get_traced_memory()[0]
+            del internal
+            tracemalloc.stop()
+
+            name = '%s/%s' % (kind,os.path.basename(path_gz)[:-len('.gz')])
+            saved = 1 - internal_size / float(versioned_size)
+            print('%-22s %12.1f %12.1f %12.1f %7.1f%%' % (name,
+                                                         versioned_size/1e6,
+                                                         bare_size/1e6,
+                                                         internal_size/1e6,
+                                                         saved*100))
+            report.append((name,versioned_size,bare_size,internal_size))
+    return report
+
+if __name__ == '__main__':
+    main()
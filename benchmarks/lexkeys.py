@@ -0,0 +1,160 @@
+'''
+microbenchmark of the lemma -> lexkey resolution of
+WordNetMapper.map_offset_to_lexkey (wn_mapper_utils.select_lexkey) against
+the linear scan with the dynamic programming Levenshtein distance it
+replaced.
+
+usage:
+    python benchmarks/lexkeys.py [--wn-version V] [--queries N]
+
+the queries are made from the offsets with more than one lexkey in the
+offset2lexkey bin of wn_version: multiword lemmas (spaces instead of
+underscores) and misspelled lemmas (one or two random edits). The results of
+both implementations are compared.
+'''
+#import built-in modules
+import os
+import sys
+import time
+import random
+import string
+import argparse
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(cwd))
+
+from config import paths
+from bin_cache import load_pickle_bin
+import wn_mapper_utils as utils
+
+def legacy_levenshtein(s, t):
+    '''
+    Levenshtein distance before the bit-parallel implementation
+    '''
+    if s == t:
+        return 0
+    elif len(s) == 0:
+        return len(t)
+    elif len(t) == 0:
+        return len(s)
+
+    v0 = [None] * (len(t) + 1)
+    v1 = [None] * (len(t) + 1)
+
+    for i in range(len(v0)):
+        v0[i] = i
+
+    for i in range(len(s)):
+        v1[0] = i + 1
+        for j in range(len(t)):
+            cost = 0 if s[i] == t[j] else 1
+            v1[j + 1] = min(v1[j] + 1, v0[j + 1] + 1, v0[j] + cost)
+        for j in range(len(v0)):
+            v0[j] = v1[j]
+
+    return v1[len(t)]
+
+def legacy_select_lexkey(list_lexkeys, lemma):
+    '''
+    lemma -> lexkey resolution before the lemma index
+    '''
+    for lexkey in list_lexkeys:
+        if lexkey.startswith("%s%%" % lemma):
+            return lexkey
+
+    if len(list_lexkeys) == 1:
+        return list_lexkeys[0]
+
+    elif len(list_lexkeys) >= 2:
+        candidates = [(lexkey.split("%")[0],lexkey) for lexkey in list_lexkeys]
+        min_levenshtein = 1000
+        best_lexkey     = ""
+        for candidate_lemma,lexkey in candidates:
+            distance = legacy_levenshtein(candidate_lemma,lemma)
+            if distance < min_levenshtein:
+                min_levenshtein = distance
+                best_lexkey     = lexkey
+
+        return best_lexkey
+
+    return None
+
+def misspell(lemma, edits):
+    '''
+    apply edits random substitutions, deletions or insertions to lemma
+    '''
+    for edit in range(edits):
+        position = random.randint(0,max(len(lemma)-1,0))
+        operation = random.choice('sdi')
+        character = random.choice(string.ascii_lowercase)
+        if operation == 's':
+            lemma = lemma[:position] + character + lemma[position+1:]
+        elif operation == 'd':
+            lemma = lemma[:position] + lemma[position+1:]
+        else:
+            lemma = lemma[:position] + character + lemma[position:]
+    return lemma
+
+def make_queries(mapping, number_of_queries, seed=1):
+    '''
+    @rtype: dict
+    @return: kind of query -> list of (offset,lemma)
+    '''
+    random.seed(seed)
+    offsets = sorted(offset for offset,lexkeys in mapping.items() if len(lexkeys) >= 2)
+    queries = {'multiword' : [], 'misspelled' : []}
+    for offset in offsets:
+        for lemma in utils.lexkey_lemmas(mapping[offset]):
+            if '_' in lemma:
+                queries['multiword'].append((offset,lemma.replace('_',' ')))
+    for offset in random.sample(offsets,min(number_of_queries,len(offsets))):
+        lemma = random.choice(utils.lexkey_lemmas(mapping[offset]))
+        queries['misspelled'].append((offset,misspell(lemma,random.randint(1,2))))
+
+    queries['multiword'] = queries['multiword'][:number_of_queries]
+    return queries
+
+def main(arguments=None):
+    '''
+    run the microbenchmark
+
+    @rtype: dict
+    @return: kind of query -> (legacy seconds,current seconds)
+    '''
+    parser = argparse.ArgumentParser(description='lemma -> lexkey resolution against the linear scan')
+    parser.add_argument('--wn-version',default='30',
+                        help='wordnet version of the offset2lexkey bin (default: 30)')
+    parser.add_argument('--queries',type=int,default=20000,
+                        help='number of queries (default: 20000)')
+    args = parser.parse_args(arguments)
+
+    mapping = load_pickle_bin(os.path.join(paths['dir_offset2lexkey_bins'],args.wn_version))
+    queries = make_queries(mapping, args.queries)
+    get,get_lemmas = mapping.get,mapping.get_lemmas
+
+    results = {}
+    for kind,kind_queries in sorted(queries.items()):
+        start  = time.time()
+        legacy = [legacy_select_lexkey(get(offset),lemma)
+                  for offset,lemma in kind_queries]
+        legacy_seconds = time.time()-start
+
+        start   = time.time()
+        current = [utils.select_lexkey(get(offset),lemma,get_lemmas(offset))
+                   for offset,lemma in kind_queries]
+        current_seconds = time.time()-start
+
+        assert legacy == current
+        results[kind] = (legacy_seconds,current_seconds)
+
+    print('%-12s %8s %10s %10s %8s' % ('queries','number','legacy s','current s','speedup'))
+    for kind,(legacy_seconds,current_seconds) in sorted(results.items()):
+        print('%-12s %8s %10.3f %10.3f %7.2fx' % (kind,
+                                                   len(queries[kind]),
+                                                   legacy_seconds,
+                                                   current_seconds,
+                                                   legacy_seconds/current_seconds))
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+'''
+load generator for the HTTP server (see server.py): concurrent batch
+requests against localhost, with the latency percentiles and throughput.
+
+usage:
+    python benchmarks/load_generator.py [--url URL | --spawn] [--method M]
+                                        [--requests N] [--concurrency N]
+                                        [--batch-size N] [--ndjson]
+
+the items are offsets of the source version (map_offset_to_* methods) or
+lexkeys (map_lexkey_to_* methods), sampled from the bins. With --spawn, a
+server is started on a free port in a separate process and stopped at the
+end.
+'''
+#import built-in modules
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import subprocess
+from multiprocessing.pool import ThreadPool
+
+if sys.version_info.major == 2:
+    from urllib2 import urlopen, Request, URLError
+else:
+    from urllib.request import urlopen, Request
+    from urllib.error import URLError
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(cwd))
+
+from config import paths
+from bin_cache import load_pickle_bin
+
+def sample_items(method, source_wn_version, number_of_items, seed=1):
+    '''
+    @rtype: list
+    @return: offsets or lexkeys of source_wn_version
+    '''
+    random.seed(seed)
+    mapping = load_pickle_bin(os.path.join(paths['dir_offset2lexkey_bins'],source_wn_version))
+    offsets = random.sample(sorted(mapping),min(number_of_items,len(mapping)))
+    if method.startswith('map_lexkey'):
+        return [mapping.get(offset)[0] for offset in offsets]
+    return ['%08d' % offset for offset in offsets]
+
+def percentile(values, fraction):
+    '''
+    >>> percentile([1,2,3,4], 0.5)
+    2
+
+    @rtype: float
+    @return: value at fraction of the sorted values (nearest rank)
+    '''
+    values = sorted(values)
+    return values[max(0,int(round(fraction * len(values) + 0.5)) - 1)]
+
+def free_port():
+    '''
+    @rtype: int
+    @return: a free port on localhost
+    '''
+    sock = socket.socket()
+    sock.bind(('127.0.0.1',0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def spawn_server(port, arguments=()):
+    '''
+    start server.py in a separate process and wait until it listens
+
+    @rtype: subprocess.Popen
+    @return: the process of the server
+    '''
+    process = subprocess.Popen([sys.executable,
+                                os.path.join(os.path.dirname(cwd),'server.py'),
+                                '--port',str(port)] + list(arguments))
+    for attempt in range(600):
+        try:
+            urlopen('http://127.0.0.1:%s/health' % port).read()
+            return process
+        except (URLError,IOError):
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('server did not start')
+
+def make_request(url, method, source_wn_version, target_wn_version, batch, ndjson):
+    '''
+    @rtype: urllib Request
+    @return: request of one batch
+    '''
+    shared = {'source_wn_version' : source_wn_version}
+    if method not in ('map_offset_to_lexkey','map_lexkey_to_offset'):
+        shared['target_wn_version'] = target_wn_version
+
+    if ndjson:
+        query = '&'.join('%s=%s' % item for item in sorted(shared.items()))
+        return Request('%s/map/%s?%s' % (url,method,query),
+                       data=''.join(json.dumps(item) + '\n' for item in batch).encode('utf-8'),
+                       headers={'Content-Type' : 'application/x-ndjson'})
+
+    shared['items'] = batch
+    return Request('%s/map/%s' % (url,method),
+                   data=json.dumps(shared).encode('utf-8'),
+                   headers={'Content-Type' : 'application/json'})
+
+def main(arguments=None):
+    '''
+    run the load
+
+    @rtype: dict
+    @return: 'requests', 'items', 'errors', 'seconds', 'requests_per_second',
+    'items_per_second', 'p50_ms' and 'p99_ms'
+    '''
+    parser = argparse.ArgumentParser(description='load generator for server.py')
+    parser.add_argument('--url',default='http://127.0.0.1:8080')
+    parser.add_argument('--spawn',action='store_true',
+                        help='start a server on a free port for the run')
+    parser.add_argument('--server-arguments',nargs='*',default=[],
+                        help='arguments of the spawned server (for example --bin-format=shared)')
+    parser.add_argument('--method',default='map_offset_to_offset')
+    parser.add_argument('--source',default='21')
+    parser.add_argument('--target',default='30')
+    parser.add_argument('--requests',type=int,default=1000)
+    parser.add_argument('--concurrency',type=int,default=8)
+    parser.add_argument('--batch-size',type=int,default=100)
+    parser.add_argument('--ndjson',action='store_true',
+                        help='send newline-delimited JSON bodies')
+    args = parser.parse_args(arguments)
+
+    items   = sample_items(args.method, args.source, 10000)
+    batches = [[items[(number * args.batch_size + index) % len(items)]
+                for index in range(args.batch_size)]
+               for number in range(args.requests)]
+
+    process = None
+    url     = args.url
+    if args.spawn:
+        port    = free_port()
+        url     = 'http://127.0.0.1:%s' % port
+        process = spawn_server(port, args.server_arguments)
+
+    def run(batch):
+        start = time.time()
+        try:
+            response = urlopen(make_request(url, args.method, args.source,
+                                            args.target, batch, args.ndjson))
+            response.read()
+            error = False
+        except (URLError,IOError):
+            error = True
+        return time.time()-start,error
+
+    try:
+        #warm up: the bins are loaded by the first request
+        run(batches[0])
+
+        start = time.time()
+        pool  = ThreadPool(args.concurrency)
+        try:
+            results = pool.map(run, batches, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        seconds = time.time()-start
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies = [latency for latency,error in results]
+    report = {'requests'            : len(results),
+              'items'               : len(results) * args.batch_size,
+              'errors'              : sum(1 for latency,error in results if error),
+              'seconds'             : seconds,
+              'requests_per_second' : len(results) / seconds,
+              'items_per_second'    : len(results) * args.batch_size / seconds,
+              'p50_ms'              : 1000 * percentile(latencies,0.5),
+              'p99_ms'              : 1000 * percentile(latencies,0.99)}
+
+    print('%s requests of %s items (%s) with concurrency %s in %.2fs' % (report['requests'],
+                                                                          args.batch_size,
+                                                                          args.method,
+                                                                          args.concurrency,
+                                                                          seconds))
+    print('throughput : %.0f requests/s, %.0f items/s' % (report['requests_per_second'],
+                                                          report['items_per_second']))
+    print('latency    : p50 %.2f ms, p99 %.2f ms' % (report['p50_ms'],report['p99_ms']))
+    print('errors     : %s' % report['errors'])
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+'''
+regression benchmark: the resident memory of a WordNetMapper must stay flat
+when it is queried with unknown identifiers.
+
+usage:
+    python benchmarks/misses_rss.py [--misses N] [--bin-format pickle|mmap|shared]
+
+the script exits with status 1 if the resident set size grows more than
+MAX_GROWTH_MB over the misses.
+'''
+#import built-in modules
+import os
+import sys
+import time
+import argparse
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(cwd))
+
+from wordnet_mapper import WordNetMapper
+
+MAX_GROWTH_MB = 5.0
+
+def rss_mb():
+    '''
+    current resident set size of this process in MB
+    (read from /proc, so this only works on Linux)
+
+    @rtype: float
+    @return: resident set size in MB
+    '''
+    with open('/proc/self/statm') as infile:
+        resident_pages = int(infile.read().split()[1])
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024.0 / 1024.0
+
+def main(arguments=None):
+    '''
+    query --misses unknown offsets and lexkeys and report the growth of the
+    resident set size
+
+    @rtype: float
+    @return: growth of the resident set size in MB
+    '''
+    parser = argparse.ArgumentParser(description='resident memory of a mapper queried with unknown identifiers')
+    parser.add_argument('--misses',type=int,default=1000000,
+                        help='number of unknown identifiers per method (default: 1000000)')
+    parser.add_argument('--bin-format',choices=['pickle','mmap','shared'],default='pickle')
+    args = parser.parse_args(arguments)
+    number_of_misses,bin_format = args.misses,args.bin_format
+
+    my_mapper = WordNetMapper(bin_format=bin_format)
+
+    #load the bins and warm up
+    my_mapper.map_offset_to_offset("00020846", "21", "30")
+    my_mapper.map_offset_to_lexkey("05262185", "moustache", "30")
+    my_mapper.map_lexkey_to_offset('rock_hopper%1:05:00::', '21')
+
+    start_rss  = rss_mb()
+    start_time = time.time()
+
+    for number in range(number_of_misses):
+        unknown = "9%07d" % number
+        for method,args in [(my_mapper.map_offset_to_offset, (unknown, "21", "30")),
+                            (my_mapper.map_offset_to_lexkey, (unknown, "lemma", "30")),
+                            (my_mapper.map_lexkey_to_offset, (unknown + "%1:05:00::", "21"))]:
+            try:
+                method(*args)
+            except ValueError:
+                pass
+
+    growth = rss_mb() - start_rss
+    print('misses          : %s (x3 methods)' % number_of_misses)
+    print('bin format      : %s' % bin_format)
+    print('seconds         : %.2f' % (time.time() - start_time))
+    print('rss growth (MB) : %.2f' % growth)
+    return growth
+
+if __name__ == '__main__':
+    growth = main()
+    if growth > MAX_GROWTH_MB:
+        print('FAILED: rss grew more than %s MB' % MAX_GROWTH_MB)
+        sys.exit(1)
@@ -0,0 +1,137 @@
+'''
+microbenchmark of the bins_utils parsers against the line by line
+strip().split() parsers they replaced.
+
+usage:
+    python benchmarks/parsers.py [--lines N]
+
+synthetic index.sense and UPC mapping files are written to a temporary
+directory, both parsers are run and their output is compared.
+'''
+#import built-in modules
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from collections import defaultdict
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(cwd))
+
+import bins_utils
+
+def legacy_offset2offset(map_file, source_wn_version, target_wn_version, pos):
+    '''
+    parser of UPC mapping files before the streaming parsers
+    '''
+    mapping = defaultdict(dict)
+    with open(map_file) as infile:
+        for line in infile:
+            split         = line.strip().split()
+            source_offset = split[0]
+            for index_target_offset in range(1,len(split),2):
+                target_offset      = split[index_target_offset]
+                target_offset_conf = split[index_target_offset+1]
+                mapping[source_offset][(target_offset,pos)] = float(target_offset_conf)
+    return mapping
+
+def legacy_index_sense(index_sense_file):
+    '''
+    parsers of index.sense files before the streaming parsers: the file
+    is parsed once per direction
+    '''
+    lexkey2offset = defaultdict()
+    with open(index_sense_file) as infile:
+        for line in infile:
+            split = line.strip().split()
+            lexkey2offset[split[0]] = split[1]
+
+    offset2lexkey = defaultdict(list)
+    with open(index_sense_file) as infile:
+        for line in infile:
+            split = line.strip().split()
+            offset2lexkey[split[1]].append(split[0])
+
+    return lexkey2offset,offset2lexkey
+
+def write_synthetic_files(output_dir, number_of_lines, seed=1):
+    '''
+    write a synthetic index.sense file and UPC mapping file
+
+    @rtype: tuple
+    @return: (path index.sense file, path mapping file)
+    '''
+    random.seed(seed)
+    index_sense_file = os.path.join(output_dir,'index.sense')
+    map_file         = os.path.join(output_dir,'wn21-30.noun')
+
+    with open(index_sense_file,'w') as outfile:
+        for number in range(number_of_lines):
+            offset = '%08d' % random.randint(1,number_of_lines)
+            outfile.write('lemma_%s%%1:%02d:00:: %s %s %s\n' % (number,
+                                                               random.randint(0,45),
+                                                               offset,
+                                                               random.randint(1,5),
+                                                               random.randint(0,20)))
+
+    with open(map_file,'w') as outfile:
+        for number in range(number_of_lines):
+            targets = random.randint(1,3)
+            fields  = ['%08d' % number]
+            for target in range(targets):
+                fields.append('%08d' % random.randint(1,number_of_lines))
+                fields.append('%.3f' % (1.0/targets))
+            outfile.write(' '.join(fields) + ' \n')
+
+    return index_sense_file,map_file
+
+def timed(function, *args):
+    '''
+    @rtype: tuple
+    @return: (output,seconds)
+    '''
+    start  = time.time()
+    output = function(*args)
+    return output,time.time()-start
+
+def main(arguments=None):
+    '''
+    run the microbenchmark
+
+    @rtype: dict
+    @return: parser -> (legacy seconds,streaming seconds)
+    '''
+    parser = argparse.ArgumentParser(description='bins_utils parsers against the legacy parsers')
+    parser.add_argument('--lines',type=int,default=500000,
+                        help='number of lines of the synthetic files (default: 500000)')
+    args = parser.parse_args(arguments)
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        index_sense_file,map_file = write_synthetic_files(output_dir, args.lines)
+
+        legacy,legacy_seconds       = timed(legacy_index_sense, index_sense_file)
+        streaming,streaming_seconds = timed(bins_utils.mappings_index_sense, index_sense_file)
+        assert dict(legacy[0]) == streaming[0] and dict(legacy[1]) == streaming[1]
+        results = {'index.sense' : (legacy_seconds,streaming_seconds)}
+
+        legacy,legacy_seconds       = timed(legacy_offset2offset, map_file, '21', '30', 'n')
+        streaming,streaming_seconds = timed(bins_utils.mapping_offset2offset, map_file, '21', '30', 'n')
+        assert dict(legacy) == streaming
+        results['offset2offset'] = (legacy_seconds,streaming_seconds)
+    finally:
+        shutil.rmtree(output_dir)
+
+    print('%-15s %10s %10s %8s' % ('parser','legacy s','stream s','speedup'))
+    for parser,(legacy_seconds,streaming_seconds) in sorted(results.items()):
+        print('%-15s %10.3f %10.3f %7.2fx' % (parser,
+                                               legacy_seconds,
+                                               streaming_seconds,
+                                               legacy_seconds/streaming_seconds))
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+'''
+reproducible benchmark suite on synthetic bins of WordNet scale, which does
+not need resources/bins (see synthetic.py).
+
+usage:
+    python benchmarks/suite.py [--synsets N] [--queries N] [--bin-format F]
+                               [--versions V ...] [--output results.json]
+                               [--compare old_results.json]
+
+the synthetic index.sense and UPC mapping files are written to a temporary
+directory and the bins are created from them with create_bins. Measured:
+    - generate and build: seconds (per bin for the build) and peak RSS
+    - load: seconds and estimated size per bin
+    - methods: every public WordNetMapper method in a cold mapper (first
+      call, including loading its bins) and in a warm mapper (microseconds
+      per query over --queries queries), and peak RSS
+
+the build, load and methods phases each run in a fresh process, so that
+their peak RSS is their own. The results are written as JSON, together with
+the git commit, so that results of two commits can be compared with
+--compare.
+'''
+#import built-in modules
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(cwd))
+
+import synthetic
+import create_bins
+from config import paths
+from bin_cache import estimate_size
+from wordnet_mapper import WordNetMapper
+
+BIN_DIRS = {'offset2offset' : 'dir_offset2offset_bins',
+            'lexkey2offset' : 'dir_lexkey2offset_bins',
+            'offset2lexkey' : 'dir_offset2lexkey_bins'}
+
+def peak_rss_mb():
+    '''
+    peak resident set size of this process in MB (ru_maxrss is in KB on
+    Linux and in bytes on macOS)
+
+    @rtype: float
+    @return: peak resident set size in MB
+    '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak / 1024.0 / 1024.0
+    return peak / 1024.0
+
+def run_isolated(function, *args):
+    '''
+    run function in a fresh process and add its peak RSS to the result
+
+    @rtype: dict
+    @return: result of function with 'peak_rss_mb'
+    '''
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(measured, (function,) + args)
+    finally:
+        pool.close()
+        pool.join()
+
+def measured(function, *args):
+    result = function(*args)
+    result['peak_rss_mb'] = round(peak_rss_mb(),1)
+    return result
+
+def git_commit():
+    '''
+    @rtype: str | None
+    @return: commit of the repository, None if it can not be determined
+    '''
+    try:
+        output = subprocess.check_output(['git','rev-parse','HEAD'],
+                                         cwd=os.path.dirname(cwd),
+                                         stderr=subprocess.STDOUT)
+        return output.decode('ascii').strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+def build(data, versions, bin_format):
+    '''
+    create the bins of the synthetic data in paths['dir_bins'] with
+    create_bins
+
+    @rtype: dict
+    @return: 'seconds' and 'bins' (bin -> seconds)
+    '''
+    start = time.time()
+    bins  = {}
+    for source_wn_version,target_wn_version in create_bins.direct_pairs(versions,
+                                                                        data['mappings_dir']):
+        bin_start = time.time()
+        create_bins.build_offset2offset(source_wn_version,
+                                        target_wn_version,
+                                        data['mappings_dir'],
+                                        paths['dir_offset2offset_bins'])
+        bins['offset2offset/%s_%s' % (source_wn_version,target_wn_version)] = time.time()-bin_start
+
+    for version in versions:
+        bin_start = time.time()
+        create_bins.build_index_sense_bins(version,
+                                           data['index_senses_dir'],
+                                           paths['dir_lexkey2offset_bins'],
+                                           paths['dir_offset2lexkey_bins'])
+        bins['index_sense/%s' % version] = time.time()-bin_start
+
+    if bin_format == 'mmap':
+        bin_start = time.time()
+        create_bins.create_mmap_bins(paths['dir_offset2offset_bins'],
+                                     paths['dir_lexkey2offset_bins'],
+                                     paths['dir_offset2lexkey_bins'])
+        bins['mmap'] = time.time()-bin_start
+
+    return {'seconds' : time.time()-start, 'bins' : bins}
+
+def load(versions, bin_format):
+    '''
+    load every bin (of all parts of speech) once
+
+    @rtype: dict
+    @return: 'bins': bin -> {'seconds','bytes'}
+    '''
+    my_mapper = WordNetMapper(bin_format=bin_format)
+    bins      = {}
+    for kind,key in sorted(BIN_DIRS.items()):
+        if kind == 'offset2offset':
+            names = ['%s_%s' % (source,target) for source in versions for target in versions]
+        else:
+            names = versions
+        for name in names:
+            path_bin = os.path.join(paths[key],name)
+            if not os.path.exists(path_bin + my_mapper.bin_extension):
+                continue
+            start   = time.time()
+            mapping = my_mapper.load_bin(path_bin)
+            bins['%s/%s' % (kind,name)] = {'seconds' : time.time()-start,
+                                           'bytes'   : estimate_size(mapping)}
+    return {'bins' : bins}
+
+def method_calls(samples, source_wn_version, target_wn_version):
+    '''
+    the calls of every public method for the sampled synsets
+
+    @type  samples: list
+    @param samples: list of (offset,pos,lexkey) of source_wn_version
+
+    @rtype: list
+    @return: list of (method,list of argument tuples,number of queries per
+    call)
+    '''
+    s,t     = source_wn_version,target_wn_version
+    offsets = [offset for offset,pos,lexkey in samples]
+    lexkeys = [lexkey for offset,pos,lexkey in samples]
+    lemmas  = [lexkey.split('%')[0] for lexkey in lexkeys]
+    ilidefs = ['ili-%s-%s-%s' % (s,offset,pos) for offset,pos,lexkey in samples]
+
+    return [
+        ('map_offset_to_offset',   [(offset,s,t) for offset in offsets],1),
+        ('map_offset_to_ilidef',   [(offset,s,t) for offset in offsets],1),
+        ('map_offset_to_lexkey',   [(offset,lemma,s) for offset,lemma in zip(offsets,lemmas)],1),
+        ('map_lexkey_to_offset',   [(lexkey,s) for lexkey in lexkeys],1),
+        ('map_lexkey_to_lexkey',   [(lexkey,s,t) for lexkey in lexkeys],1),
+        ('map_lexkey_to_ilidef',   [(lexkey,s,t) for lexkey in lexkeys],1),
+        ('map_ilidef_to_offset',   [(ilidef,t) for ilidef in ilidefs],1),
+        ('map_ilidef_to_lexkey',   [(ilidef,lemma) for ilidef,lemma in zip(ilidefs,lemmas)],1),
+        ('map_ilidef_to_ilidef',   [(ilidef,s,t) for ilidef in ilidefs],1),
+        ('map_offsets_to_offsets', [(offsets,s,t)],len(offsets)),
+        ('map_offsets_to_ilidefs', [(offsets,s,t)],len(offsets)),
+        ('map_offsets_to_lexkeys', [(offsets,lemmas,s)],len(offsets)),
+        ('map_lexkeys_to_offsets', [(lexkeys,s)],len(lexkeys)),
+        ('map_lexkeys_to_ilidefs', [(lexkeys,s,t)],len(lexkeys)),
+        ('map_lexkeys_to_lexkeys', [(lexkeys,s,t)],len(lexkeys)),
+        ('overlap',                [(s,t)],1),
+        ('coverage',               [([s,t],)],1),
+        #the synsets of t mapped to the sampled synsets of s (the inverted
+        #offset2offset bin from t to s)
+        ('map_offset_from_offset', [(offset,t,s,'highest',pos) for offset,pos,lexkey in samples],1),
+    ]
+
+def time_methods(samples, versions, bin_format):
+    '''
+    time every call of method_calls in a cold and in a warm mapper
+
+    @rtype: dict
+    @return: 'methods': method -> {'cold_seconds','warm_us_per_query','errors'}
+    '''
+    methods = {}
+    for method,calls,queries in method_calls(samples, versions[0], versions[-1]):
+        #cold: the first call of a new mapper, which loads the bins
+        my_mapper = WordNetMapper(max_bins=None, bin_format=bin_format)
+        start     = time.time()
+        try:
+            getattr(my_mapper,method)(*calls[0])
+        except ValueError:
+            pass
+        cold = time.time()-start
+
+        #warm: all calls in the mapper of which the bins are loaded
+        errors = 0
+        function = getattr(my_mapper,method)
+        start  = time.time()
+        for args in calls:
+            try:
+                function(*args)
+            except ValueError:
+                errors += 1
+        warm = time.time()-start
+
+        methods[method] = {'cold_seconds'      : cold,
+                           'warm_us_per_query' : 1e6 * warm / (len(calls) * queries),
+                           'errors'            : errors}
+    return {'methods' : methods}
+
+def compare(old, new):
+    '''
+    print the ratio new/old of the timings and peak RSS of two results
+    '''
+    rows = []
+    for phase in ('generate','build','load','methods'):
+        for metric in ('seconds','peak_rss_mb'):
+            if metric in old.get(phase,{}) and metric in new.get(phase,{}):
+                rows.append(('%s %s' % (phase,metric),old[phase][metric],new[phase][metric]))
+    for method,timings in sorted(new['methods']['methods'].items()):
+        old_timings = old.get('methods',{}).get('methods',{}).get(method)
+        if old_timings is None:
+            continue
+        for metric in ('cold_seconds','warm_us_per_query'):
+            rows.append(('%s %s' % (method,metric),old_timings[metric],timings[metric]))
+
+    print('%-50s %12s %12s %8s' % ('metric',old.get('commit','old')[:10],
+                                   new.get('commit','new')[:10],'ratio'))
+    for metric,old_value,new_value in rows:
+        ratio = new_value / old_value if old_value else float('nan')
+        print('%-50s %12.4g %12.4g %8.2f' % (metric,old_value,new_value,ratio))
+
+def main(arguments=None):
+    '''
+    run the suite
+
+    @rtype: dict
+    @return: the results
+    '''
+    parser = argparse.ArgumentParser(description='benchmark suite on synthetic bins')
+    parser.add_argument('--synsets',type=int,default=117659,
+                        help='synsets per version (default: 117659, as WordNet 3.0)')
+    parser.add_argument('--queries',type=int,default=10000,
+                        help='queries per method in the warm mapper (default: 10000)')
+    parser.add_argument('--bin-format',choices=['pickle','mmap','shared'],default='pickle')
+    parser.add_argument('--versions',nargs='+',default=['20','21','30'],
+                        help='wordnet versions (default: 20 21 30). 30 and 20 are needed for the '
+                             'bins of a version to itself (see synthetic.generate)')
+    parser.add_argument('--seed',type=int,default=1)
+    parser.add_argument('--output',default=None,
+                        help='json file for the results (default: stdout)')
+    parser.add_argument('--compare',default=None,
+                        help='json file with results of an earlier run')
+    parser.add_argument('--keep',action='store_true',
+                        help='keep the temporary directory with the data and bins')
+    args = parser.parse_args(arguments)
+    #the bin of a version to itself is created from its mapping to 30, and
+    #that of 30 from its mapping to 20 (see create_bins.offset2offset_source_dir)
+    missing = [version for version in ('20','30') if version not in args.versions]
+    if missing:
+        parser.error('--versions should include 20 and 30 (missing: %s)' % ' '.join(missing))
+
+    results = {'commit'   : git_commit(),
+               'python'   : platform.python_version(),
+               'platform' : platform.platform(),
+               'config'   : vars(args)}
+
+    output_dir = tempfile.mkdtemp(prefix='WordNetMapper-suite-')
+    try:
+        #the mapper and create_bins read the bins from the directories in
+        #paths, the processes of the phases inherit them
+        for kind,key in BIN_DIRS.items():
+            paths[key] = os.path.join(output_dir,'bins',kind)
+            os.makedirs(paths[key])
+
+        start = time.time()
+        data  = synthetic.generate(os.path.join(output_dir,'data'),
+                                   args.versions,
+                                   args.synsets,
+                                   args.seed)
+        results['generate'] = {'seconds'     : time.time()-start,
+                               'peak_rss_mb' : round(peak_rss_mb(),1)}
+        sys.stderr.write('generated %s synsets per version in %.2fs\n' % (args.synsets,
+                                                                          results['generate']['seconds']))
+
+        results['build'] = run_isolated(build, data, args.versions, args.bin_format)
+        sys.stderr.write('built bins in %.2fs\n' % results['build']['seconds'])
+
+        results['load'] = run_isolated(load, args.versions, args.bin_format)
+
+        samples = random.Random(args.seed).sample(data['samples'],
+                                                  min(args.queries,len(data['samples'])))
+        results['methods'] = run_isolated(time_methods, samples, args.versions, args.bin_format)
+        for method,timings in sorted(results['methods']['methods'].items()):
+            sys.stderr.write('%-25s cold %8.3fs  warm %10.2fus/query\n' % (method,
+                                                                          timings['cold_seconds'],
+                                                                          timings['warm_us_per_query']))
+    finally:
+        if args.bin_format == 'shared':
+            from mmap_bins import remove_shared_bins
+            remove_shared_bins(os.path.join(output_dir,'bins'))
+        if args.keep:
+            sys.stderr.write('data and bins kept in %s\n' % output_dir)
+        else:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output,'w') as outfile:
+            json.dump(results, outfile, indent=2, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare) as infile:
+            compare(json.load(infile), results)
+
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+'''
+synthetic wordnet data for the benchmark suite (see suite.py): index.sense
+files and UPC mapping files of WordNet scale, with the layout of
+resources/wn_index_senses and resources/mappings-upc-2007.
+
+every version has the same synsets: synset i of a part of speech has the
+same lemmas in every version, but its own offset per version. The UPC
+mappings map synset i to synset i of the other version, some synsets to two
+synsets with lower confidences and a few not at all, like the real mappings.
+Offsets of different parts of speech overlap, as they do in wordnet.
+'''
+#import built-in modules
+import os
+import random
+
+#part of speech -> (share of the synsets,name in the UPC file names,ss_type)
+POS = [('n',0.70,'noun','1'),
+       ('v',0.12,'verb','2'),
+       ('a',0.15,'adj','3'),
+       ('r',0.03,'adv','4')]
+
+#one in SPLIT synsets is mapped to two synsets, one in UNMAPPED to none
+SPLIT    = 20
+UNMAPPED = 50
+
+def synset_lemmas(rng, pos, index):
+    '''
+    @rtype: list
+    @return: lexkeys of synset index of pos (the same in every version)
+    '''
+    ss_type = dict((pos_,ss_type_) for pos_,share,name,ss_type_ in POS)[pos]
+    lexkeys = []
+    for sense in range(rng.choice([1,1,1,2,2,3,4])):
+        lemma = 'lemma_%s%s_%s' % (pos,index,sense)
+        if pos == 'a' and index % 5 == 0:
+            #adjective satellite
+            lexkeys.append('%s%%5:00:00:head_%s:00' % (lemma,index))
+        else:
+            lexkeys.append('%s%%%s:%02d:00::' % (lemma,ss_type,index % 45))
+    return lexkeys
+
+def version_offsets(number_of_synsets, version, seed):
+    '''
+    @rtype: dict
+    @return: pos -> list of offsets (int) of the synsets of pos in version
+    '''
+    rng     = random.Random('%s-%s' % (seed,version))
+    offsets = {}
+    for pos,share,name,ss_type in POS:
+        offset = 1740
+        offsets[pos] = []
+        for index in range(int(number_of_synsets * share)):
+            offsets[pos].append(offset)
+            offset += rng.randint(40,400)
+    return offsets
+
+def write_index_sense(path, offsets, lexkeys):
+    '''
+    write an index.sense file (lexkey offset sense_number tag_cnt)
+    '''
+    with open(path,'w') as outfile:
+        for pos,pos_offsets in offsets.items():
+            for offset,synset_lexkeys in zip(pos_offsets,lexkeys[pos]):
+                for sense_number,lexkey in enumerate(synset_lexkeys):
+                    outfile.write('%s %08d %s 0\n' % (lexkey,offset,sense_number+1))
+
+def write_upc_mapping(path, source_offsets, target_offsets):
+    '''
+    write a UPC mapping file of one part of speech
+    (source_offset target_offset confidence [target_offset confidence ...])
+    '''
+    with open(path,'w') as outfile:
+        for index,source_offset in enumerate(source_offsets):
+            if index % UNMAPPED == UNMAPPED - 1:
+                continue
+            if index % SPLIT == 0 and index + 1 < len(target_offsets):
+                outfile.write('%08d %08d 0.667 %08d 0.333\n' % (source_offset,
+                                                                target_offsets[index],
+                                                                target_offsets[index+1]))
+            else:
+                outfile.write('%08d %08d 1\n' % (source_offset,target_offsets[index]))
+
+def generate(output_dir, versions, number_of_synsets, seed=1):
+    '''
+    write index.sense files to output_dir/wn_index_senses/<version> and UPC
+    mappings to output_dir/mappings-upc-2007/mapping-<source>-<target>/ for
+    all pairs of different versions
+
+    @type  versions: list
+    @param versions: wordnet versions (include '30', and '20' if '30' is
+    mapped to itself, see create_bins.offset2offset_source_dir)
+
+    @type  number_of_synsets: int
+    @param number_of_synsets: synsets per version (WordNet 3.0 has 117659)
+
+    @rtype: dict
+    @return: 'index_senses_dir', 'mappings_dir' and 'samples': list of
+    (offset,pos,lexkey) of synsets of versions[0]
+    '''
+    rng      = random.Random(seed)
+    lexkeys  = dict((pos,[synset_lemmas(rng,pos,index)
+                          for index in range(int(number_of_synsets * share))])
+                    for pos,share,name,ss_type in POS)
+    offsets  = dict((version,version_offsets(number_of_synsets,version,seed))
+                    for version in versions)
+
+    index_senses_dir = os.path.join(output_dir,'wn_index_senses')
+    mappings_dir     = os.path.join(output_dir,'mappings-upc-2007')
+    os.makedirs(index_senses_dir)
+    for version in versions:
+        write_index_sense(os.path.join(index_senses_dir,version),
+                          offsets[version],
+                          lexkeys)
+
+    for source_wn_version in versions:
+        for target_wn_version in versions:
+            if source_wn_version == target_wn_version:
+                continue
+            pair_dir = os.path.join(mappings_dir,'mapping-%s-%s' % (source_wn_version,
+                                                                   target_wn_version))
+            os.makedirs(pair_dir)
+            for pos,share,name,ss_type in POS:
+                write_upc_mapping(os.path.join(pair_dir,'wn%s-%s.%s' % (source_wn_version,
+                                                                       target_wn_version,
+                                                                       name)),
+                                  offsets[source_wn_version][pos],
+                                  offsets[target_wn_version][pos])
+
+    samples = []
+    for pos,share,name,ss_type in POS:
+        for index,offset in enumerate(offsets[versions[0]][pos]):
+            samples.append(('%08d' % offset,pos,lexkeys[pos][index][0]))
+
+    return {'index_senses_dir' : index_senses_dir,
+            'mappings_dir'     : mappings_dir,
+            'samples'          : samples}
@@ -0,0 +1,106 @@
+'''
+stress test of one WordNetMapper shared by a pool of threads that map
+offsets and lexkeys between mixed pairs of wordnet versions.
+
+usage:
+    python benchmarks/thread_stress.py [--threads N] [--tasks N] [--max-bins N] [--bin-format F]
+
+the results of the threads are compared with the results of a mapper that
+is only used by the main thread. Without max-bins, every bin has to be
+loaded exactly once (single flight), also if threads request it at the same
+time. The exit status is 1 if a check fails.
+'''
+#import built-in modules
+import os
+import sys
+import time
+import random
+import argparse
+from multiprocessing.pool import ThreadPool
+
+cwd = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(cwd))
+
+from config import paths
+from wordnet_mapper import WordNetMapper
+
+def make_tasks(versions, number_of_tasks, seed=1):
+    '''
+    @rtype: list
+    @return: list of (source_wn_version,target_wn_version,offsets,lexkeys)
+    '''
+    random.seed(seed)
+    reference = WordNetMapper(max_bins=2)
+    samples   = {}
+    for version in versions:
+        bin = reference.load_bin_if_needed(os.path.join(paths['dir_offset2lexkey_bins'],version),
+                                           'mapping_offset_to_lexkey')
+        offsets = random.sample(sorted(bin),200)
+        samples[version] = (['%08d' % offset for offset in offsets],
+                            [bin.get(offset)[0] for offset in offsets])
+
+    tasks = []
+    for task in range(number_of_tasks):
+        source_wn_version = random.choice(versions)
+        target_wn_version = random.choice(versions)
+        offsets,lexkeys   = samples[source_wn_version]
+        tasks.append((source_wn_version,target_wn_version,offsets,lexkeys))
+    return tasks
+
+def run_task(mapper, task):
+    '''
+    @rtype: tuple
+    @return: (offset mappings,lexkey mappings) of the task
+    '''
+    source_wn_version,target_wn_version,offsets,lexkeys = task
+    return (mapper.map_offsets_to_offsets(offsets,source_wn_version,target_wn_version,'all'),
+            mapper.map_lexkeys_to_lexkeys(lexkeys,source_wn_version,target_wn_version))
+
+def main(arguments=None):
+    '''
+    run the stress test
+
+    @rtype: bool
+    @return: True if all checks passed
+    '''
+    parser = argparse.ArgumentParser(description='stress test of a shared WordNetMapper')
+    parser.add_argument('--threads',type=int,default=16)
+    parser.add_argument('--tasks',type=int,default=400)
+    parser.add_argument('--max-bins',type=int,default=None,
+                        help='size of the bin cache of the shared mapper '
+                             '(default: no limit)')
+    parser.add_argument('--bin-format',default='pickle')
+    parser.add_argument('--versions',nargs='+',default=['20','21','30'])
+    args = parser.parse_args(arguments)
+
+    tasks = make_tasks(args.versions, args.tasks)
+
+    reference = WordNetMapper(max_bins=None, bin_format=args.bin_format)
+    expected  = [run_task(reference,task) for task in tasks]
+
+    shared = WordNetMapper(max_bins=args.max_bins, bin_format=args.bin_format)
+    start  = time.time()
+    pool   = ThreadPool(args.threads)
+    try:
+        results = pool.map(lambda task: run_task(shared,task), tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    seconds = time.time()-start
+
+    checks = [('results equal to single threaded mapper', results == expected)]
+    if args.max_bins is None:
+        needed = len(reference.bin_cache)
+        checks.append(('every bin loaded once (%s loads, %s bins)' % (shared.bin_cache.misses,needed),
+                       shared.bin_cache.misses == needed))
+
+    print('%s tasks on %s threads in %.2fs, bin cache: %s' % (len(tasks),
+                                                              args.threads,
+                                                              seconds,
+                                                              shared.bin_cache.info()))
+    for check,passed in checks:
+        print('%-60s %s' % (check,'ok' if passed else 'FAILED'))
+    return all(passed for check,passed in checks)
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
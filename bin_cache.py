@@ -0,0 +1,489 @@
+#import built-in modules
+import sys
+import threading
+from collections import OrderedDict
+
+def load_pickle_bin(path_bin):
+    '''
+    a gzipped pickled bin is loaded from disk and converted to the internal
+    representation of the mapper (see mapping_tables). Lookups of unknown
+    keys never insert new entries (older bins are pickled as
+    collections.defaultdict).
+    If the bin does not exist, IOError is raised.
+
+    @type  path_bin: str
+    @param path_bin: full path to bin (without the .gz extension)
+
+    @rtype: mapping_tables.Offset2OffsetTable | dict
+    @return: the mapping stored in the bin
+    '''
+    #mapping_tables is only imported when the first pickled bin is loaded
+    from mapping_tables import convert_bin
+    
+    return convert_bin(read_pickle_bin(path_bin))
+
+def read_pickle_bin(path_bin):
+    '''
+    a gzipped pickled bin is loaded from disk as a plain dict with bare keys
+    (see strip_versions).
+    If the bin does not exist or does not match the bins manifest
+    (see bins_manifest.verify), IOError is raised.
+
+    @type  path_bin: str
+    @param path_bin: full path to bin (without the .gz extension)
+
+    @rtype: dict
+    @return: the mapping stored in the bin
+    '''
+    #gzip, pickle and the manifest are only imported when the first pickled
+    #bin is loaded
+    import gzip
+    import bins_manifest
+    if sys.version_info.major == 2:
+        import cPickle as pickle
+    else:
+        import pickle
+    
+    bins_manifest.verify(path_bin+'.gz')
+    
+    try:
+        with gzip.open(path_bin+'.gz',"rb") as infile:
+            mapping = pickle.load(infile)
+    except IOError:
+        raise IOError('''there is no dict available for the combination of the given source and target versions''')
+
+    return strip_versions(mapping)
+
+def strip_versions(mapping):
+    '''
+    bins created before the keys were reduced to a bare offset or lexkey
+    repeat the wordnet version(s) in every key, for example
+    (offset,source_wn_version,target_wn_version). The versions are dropped
+    from those keys. Bins with bare keys are only converted to a plain dict.
+    
+    >>> strip_versions({('00020846','21','30') : {('00021939','n') : 1.0}})
+    {'00020846': {('00021939', 'n'): 1.0}}
+    >>> strip_versions({'00020846' : {('00021939','n') : 1.0}})
+    {'00020846': {('00021939', 'n'): 1.0}}
+    
+    @type  mapping: dict
+    @param mapping: a loaded bin
+    
+    @rtype: dict
+    @return: mapping with bare keys
+    '''
+    for key in mapping:
+        if isinstance(key,tuple):
+            return dict((key[0],value) for key,value in mapping.items())
+        break
+    
+    return dict(mapping)
+
+def deep_size(obj):
+    '''
+    approximate size in bytes of obj, including the containers, strings and
+    numbers it holds.
+
+    @type  obj: object
+    @param obj: str | float | int | tuple | list | dict
+
+    @rtype: int
+    @return: size in bytes
+    '''
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj,dict):
+        for key,value in obj.items():
+            size += deep_size(key) + deep_size(value)
+    elif isinstance(obj,(tuple,list)):
+        for item in obj:
+            size += deep_size(item)
+
+    return size
+
+def estimate_size(mapping,sample_size=200):
+    '''
+    estimate the size in bytes of a loaded bin by measuring the
+    first sample_size entries and extrapolating to the whole mapping.
+    For bins that report their own size (attribute nbytes, for example
+    mmap bins), that size is returned.
+
+    >>> estimate_size({}) > 0
+    True
+    >>> estimate_size({'00001740' : ['entity%1:03:00::']}) > 100
+    True
+
+    @type  mapping: dict
+    @param mapping: a loaded bin
+
+    @type  sample_size: int
+    @param sample_size: number of entries that are measured
+
+    @rtype: int
+    @return: estimated size in bytes
+    '''
+    if hasattr(mapping,'nbytes'):
+        return mapping.nbytes
+    
+    size = sys.getsizeof(mapping)
+    if not mapping:
+        return size
+
+    sampled = 0
+    sample  = 0
+    for key,value in mapping.items():
+        sample  += deep_size(key) + deep_size(value)
+        sampled += 1
+        if sampled == sample_size:
+            break
+
+    return size + int(sample * len(mapping) / float(sampled))
+
+class BinCache():
+    '''
+    least recently used cache of loaded bins, keyed by the path of the bin.
+
+    The capacity can be bounded by the number of bins (max_bins) and/or by
+    the estimated size in bytes of the loaded bins (max_bytes). If both are
+    None, bins are never evicted. The most recently requested bin is always
+    kept, even if it exceeds max_bytes on its own.
+
+    The cache can be shared between threads. A cached bin is returned
+    without waiting for a lock (the LRU order is only updated if the lock
+    is free). A bin that is not cached is loaded once: threads that request
+    it while it is loading wait for that load (single flight). The hits of
+    cached bins are counted without the lock, so under heavy concurrency the
+    count of hits is approximate.
+
+    >>> cache = BinCache(max_bins=2)
+    >>> loader = lambda path_bin: {path_bin : 1}
+    >>> for path_bin in ['a','b','a','c']:
+    ...     mapping = cache.get(path_bin,loader)
+    >>> cache.paths()
+    ['a', 'c']
+    >>> (cache.hits,cache.misses,cache.evictions)
+    (1, 3, 1)
+
+    >>> import time
+    >>> from multiprocessing.pool import ThreadPool
+    >>> cache = BinCache()
+    >>> slow_loader = lambda path_bin: time.sleep(0.1) or {path_bin : 1}
+    >>> mappings = ThreadPool(8).map(lambda path_bin: cache.get(path_bin,slow_loader),
+    ...                              ['a','b'] * 8)
+    >>> (cache.misses,len(set(id(mapping) for mapping in mappings)))
+    (2, 2)
+    '''
+    def __init__(self, max_bins=None, max_bytes=None):
+
+        self.max_bins    = max_bins
+        self.max_bytes   = max_bytes
+        self.bins        = OrderedDict()
+        self.sizes       = {}
+        self.total_bytes = 0
+        self.hits        = 0
+        self.misses      = 0
+        self.evictions   = 0
+        self.reloads     = 0
+        self.loaded      = set()
+        self.lock        = threading.RLock()
+        #path of bin -> [threading.Event,bin,exception] of loads in progress
+        self.loading     = {}
+
+    def __contains__(self, path_bin):
+        return path_bin in self.bins
+
+    def __len__(self):
+        return len(self.bins)
+
+    def paths(self):
+        '''
+        @rtype: list
+        @return: paths of the cached bins, least recently used first
+        '''
+        with self.lock:
+            return list(self.bins)
+
+    def get(self, path_bin, loader):
+        '''
+        return the bin stored at path_bin. On a miss, loader(path_bin) is
+        called, the result is cached and least recently used bins are evicted
+        until the cache is within its capacity again.
+
+        @type  path_bin: str
+        @param path_bin: full path to bin
+
+        @type  loader: callable
+        @param loader: function that loads a bin given its path
+
+        @rtype: dict
+        @return: the loaded bin
+        '''
+        mapping = self.bins.get(path_bin)
+        if mapping is not None:
+            self.hits += 1
+            if self.lock.acquire(False):
+                try:
+                    if path_bin in self.bins:
+                        self.bins[path_bin] = self.bins.pop(path_bin)
+                finally:
+                    self.lock.release()
+            return mapping
+
+        with self.lock:
+            mapping = self.bins.get(path_bin)
+            if mapping is not None:
+                self.hits += 1
+                return mapping
+
+            load  = self.loading.get(path_bin)
+            owner = load is None
+            if owner:
+                load = self.loading[path_bin] = [threading.Event(),None,None]
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if not owner:
+            load[0].wait()
+            if load[2] is not None:
+                raise load[2]
+            return load[1]
+
+        try:
+            load[1] = loader(path_bin)
+        except Exception as exception:
+            load[2] = exception
+            raise
+        else:
+            self.put(path_bin, load[1])
+            return load[1]
+        finally:
+            with self.lock:
+                del self.loading[path_bin]
+            load[0].set()
+
+    def put(self, path_bin, mapping):
+        '''
+        add a loaded bin to the cache and evict if needed
+
+        @type  path_bin: str
+        @param path_bin: full path to bin
+
+        @type  mapping: dict
+        @param mapping: the loaded bin
+        '''
+        size = estimate_size(mapping) if self.max_bytes is not None else 0
+
+        with self.lock:
+            self.discard(path_bin)
+
+            #a bin that was loaded before may have changed on disk
+            if path_bin in self.loaded:
+                self.reloads += 1
+            self.loaded.add(path_bin)
+
+            self.bins[path_bin]  = mapping
+            self.sizes[path_bin] = size
+            self.total_bytes    += size
+
+            self.evict()
+
+    def discard(self, path_bin):
+        '''
+        remove a bin from the cache (if present)
+
+        @type  path_bin: str
+        @param path_bin: full path to bin
+        '''
+        with self.lock:
+            if path_bin in self.bins:
+                del self.bins[path_bin]
+                self.total_bytes -= self.sizes.pop(path_bin)
+
+    def evict(self):
+        '''
+        evict least recently used bins until the cache is within capacity
+        '''
+        with self.lock:
+            while len(self.bins) > 1:
+                too_many  = self.max_bins  is not None and len(self.bins) > self.max_bins
+                too_large = self.max_bytes is not None and self.total_bytes > self.max_bytes
+                if not (too_many or too_large):
+                    break
+
+                path_bin = next(iter(self.bins))
+                self.discard(path_bin)
+                self.evictions += 1
+
+    def clear(self):
+        '''
+        remove all bins from the cache (the counters are kept)
+        '''
+        with self.lock:
+            self.bins.clear()
+            self.sizes.clear()
+            self.total_bytes = 0
+
+    def info(self):
+        '''
+        @rtype: dict
+        @return: counters and current usage of the cache
+        '''
+        return {'hits'        : self.hits,
+                'misses'      : self.misses,
+                'evictions'   : self.evictions,
+                'reloads'     : self.reloads,
+                'bins'        : len(self.bins),
+                'total_bytes' : self.total_bytes,
+                'max_bins'    : self.max_bins,
+                'max_bytes'   : self.max_bytes}
+
+class FrozenDict(dict):
+    '''
+    dict that can not be changed, used for the cached results of
+    ResultCache.
+
+    >>> frozen = FrozenDict({('ili-30-02069355-a','a') : 1.0})
+    >>> frozen[('ili-30-02069355-a','a')] = 0.5
+    Traceback (most recent call last):
+    TypeError: FrozenDict can not be changed
+    >>> frozen |= {('ili-30-02069355-a','a') : 0.5} # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    TypeError: FrozenDict can not be changed
+    '''
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('FrozenDict can not be changed')
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+    #dict |= (Python 3.9) updates in place without calling update
+    __ior__ = _immutable
+
+    def __reduce__(self):
+        return (FrozenDict,(dict(self),))
+
+def freeze(result):
+    '''
+    @type  result: str | tuple | dict
+    @param result: result of a WordNetMapper method
+
+    @rtype: str | tuple | FrozenDict
+    @return: result that can not be changed by the caller
+    '''
+    if isinstance(result,dict) and not isinstance(result,FrozenDict):
+        return FrozenDict(result)
+    return result
+
+class ResultCache():
+    '''
+    least recently used cache of the results of the composite WordNetMapper
+    methods (for example map_lexkey_to_lexkey), keyed by
+    (method,input,wordnet versions,output format).
+
+    results are stored frozen (see freeze), so callers can not change the
+    cached results. All results are dropped when a bin of bin_cache is loaded
+    again, since it may have changed on disk. A cache with max_results 0
+    stores nothing. The cache can be shared between threads.
+
+    >>> bins    = BinCache()
+    >>> results = ResultCache(max_results=2, bin_cache=bins)
+    >>> results.store(('map_lexkey_to_ilidef','other%3:00:00::','30','30','all'),
+    ...               {('ili-30-02069355-a','a') : 1.0})
+    {('ili-30-02069355-a', 'a'): 1.0}
+    >>> results.lookup(('map_lexkey_to_ilidef','other%3:00:00::','30','30','all'))
+    {('ili-30-02069355-a', 'a'): 1.0}
+    >>> (results.hits,results.misses)
+    (1, 0)
+    >>> mapping = bins.get('a',lambda path_bin: {})
+    >>> bins.discard('a')
+    >>> mapping = bins.get('a',lambda path_bin: {})
+    >>> results.lookup(('map_lexkey_to_ilidef','other%3:00:00::','30','30','all')) is None
+    True
+    '''
+    def __init__(self, max_results=0, bin_cache=None):
+
+        self.max_results = max_results
+        self.bin_cache   = bin_cache
+        self.results     = OrderedDict()
+        self.lock        = threading.Lock()
+        self.reloads     = bin_cache.reloads if bin_cache is not None else 0
+        self.hits        = 0
+        self.misses      = 0
+        self.evictions   = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def check_reloads(self):
+        '''
+        drop all results if a bin was loaded again since the last check
+        '''
+        if self.bin_cache is not None and self.bin_cache.reloads != self.reloads:
+            self.reloads = self.bin_cache.reloads
+            self.results.clear()
+
+    def lookup(self, key):
+        '''
+        @type  key: tuple
+        @param key: (method,input,wordnet versions,output format)
+
+        @rtype: str | tuple | FrozenDict | None
+        @return: the cached result, None if not cached
+        '''
+        if not self.max_results:
+            return None
+
+        with self.lock:
+            self.check_reloads()
+            result = self.results.pop(key,None)
+            if result is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.results[key] = result
+            return result
+
+    def store(self, key, result):
+        '''
+        cache a result and evict the least recently used results if needed
+
+        @type  key: tuple
+        @param key: (method,input,wordnet versions,output format)
+
+        @type  result: str | tuple | dict
+        @param result: result of the method
+
+        @rtype: str | tuple | dict
+        @return: the result as it is cached (frozen), result itself if
+        nothing is cached
+        '''
+        if not self.max_results:
+            return result
+
+        result = freeze(result)
+        with self.lock:
+            self.check_reloads()
+            self.results[key] = result
+            while len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self):
+        '''
+        remove all results from the cache (the counters are kept)
+        '''
+        with self.lock:
+            self.results.clear()
+
+    def info(self):
+        '''
+        @rtype: dict
+        @return: counters and current usage of the cache
+        '''
+        return {'hits'        : self.hits,
+                'misses'      : self.misses,
+                'evictions'   : self.evictions,
+                'results'     : len(self.results),
+                'max_results' : self.max_results}
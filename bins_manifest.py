@@ -0,0 +1,187 @@
+'''
+manifest of the bins: for every bin, the fingerprints of the files it was
+created from and of the bin itself.
+
+create_bins uses the manifest to only recreate bins whose inputs changed
+(python create_bins.py run --incremental), the mapper uses it to refuse bins
+that do not match the manifest.
+
+format of the manifest (json):
+    {bin (relative to the bins directory) :
+        {'inputs' : {input (relative to the resources directory) :
+                        {'sha256' : str, 'size' : int, 'mtime' : float}},
+         'output' : {'sha256' : str, 'size' : int, 'mtime' : float}}}
+'''
+#import built-in modules
+import os
+
+#import installed or created modules
+from config import paths
+
+_loaded = {}
+
+def sha256(path):
+    '''
+    @rtype: str
+    @return: sha256 hex digest of the content of the file at path
+    '''
+    import hashlib
+    
+    digest = hashlib.sha256()
+    with open(path,'rb') as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint(path, previous=None):
+    '''
+    fingerprint of a file. If the size and mtime are the same as in the
+    previous fingerprint, the file is assumed to be unchanged and its content
+    is not hashed again.
+
+    @type  path: str
+    @param path: full path to a file
+
+    @type  previous: dict | None
+    @param previous: previous fingerprint of the file
+
+    @rtype: dict
+    @return: {'sha256' : str, 'size' : int, 'mtime' : float}
+    '''
+    stat = os.stat(path)
+    if (previous is not None and
+        previous['size'] == stat.st_size and
+        previous['mtime'] == stat.st_mtime):
+        return dict(previous)
+
+    return {'sha256' : sha256(path),
+            'size'   : stat.st_size,
+            'mtime'  : stat.st_mtime}
+
+def bin_name(path_gz, bins_dir=None):
+    '''
+    @rtype: str
+    @return: name of the bin in the manifest, for example
+    offset2offset/21_30.gz
+    '''
+    bins_dir = bins_dir or paths['dir_bins']
+    return os.path.relpath(path_gz, bins_dir).replace(os.sep,'/')
+
+def input_name(path, resources_dir=None):
+    '''
+    @rtype: str
+    @return: name of an input file in the manifest, for example
+    wn_index_senses/30
+    '''
+    resources_dir = resources_dir or paths['resources']
+    return os.path.relpath(path, resources_dir).replace(os.sep,'/')
+
+def load_manifest(manifest_path=None):
+    '''
+    load the manifest. the manifest is cached until the file changes.
+
+    @rtype: dict
+    @return: the manifest, empty if there is no manifest
+    '''
+    import json
+    
+    manifest_path = manifest_path or paths['bins_manifest']
+    try:
+        mtime = os.stat(manifest_path).st_mtime
+    except OSError:
+        return {}
+
+    if manifest_path not in _loaded or _loaded[manifest_path][0] != mtime:
+        with open(manifest_path) as infile:
+            _loaded[manifest_path] = (mtime,json.load(infile))
+
+    return _loaded[manifest_path][1]
+
+def save_manifest(manifest, manifest_path=None):
+    '''
+    write the manifest (via a temporary file)
+    '''
+    import json
+    
+    manifest_path = manifest_path or paths['bins_manifest']
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path,'w') as outfile:
+        json.dump(manifest,outfile,indent=1,sort_keys=True)
+    os.rename(tmp_path,manifest_path)
+
+def input_fingerprints(inputs, entry=None, resources_dir=None):
+    '''
+    @type  inputs: list
+    @param inputs: full paths to the input files of a bin
+
+    @type  entry: dict | None
+    @param entry: entry of the bin in the manifest
+
+    @rtype: dict
+    @return: input name -> fingerprint
+    '''
+    previous = (entry or {}).get('inputs',{})
+    fingerprints = {}
+    for path in inputs:
+        name = input_name(path, resources_dir)
+        fingerprints[name] = fingerprint(path, previous.get(name))
+    return fingerprints
+
+def is_stale(path_gz, inputs, manifest, bins_dir=None, resources_dir=None):
+    '''
+    a bin is stale if it does not exist, if it is not in the manifest, if
+    it changed since it was created or if one of its inputs changed.
+
+    @type  path_gz: str
+    @param path_gz: full path to the bin
+
+    @type  inputs: list
+    @param inputs: full paths to the input files of the bin
+
+    @type  manifest: dict
+    @param manifest: the manifest
+
+    @rtype: bool
+    @return: True if the bin has to be created again
+    '''
+    entry = manifest.get(bin_name(path_gz, bins_dir))
+    if entry is None or not os.path.exists(path_gz):
+        return True
+
+    if fingerprint(path_gz, entry['output'])['sha256'] != entry['output']['sha256']:
+        return True
+
+    current = input_fingerprints(inputs, entry, resources_dir)
+    recorded = dict((name,value['sha256']) for name,value in entry['inputs'].items())
+    return recorded != dict((name,value['sha256']) for name,value in current.items())
+
+def record(path_gz, inputs, manifest, bins_dir=None, resources_dir=None):
+    '''
+    store the fingerprints of a bin that was just created and its inputs
+    in the manifest
+    '''
+    manifest[bin_name(path_gz, bins_dir)] = {
+        'inputs' : input_fingerprints(inputs, resources_dir=resources_dir),
+        'output' : fingerprint(path_gz)}
+
+def verify(path_gz, manifest_path=None, bins_dir=None):
+    '''
+    check a bin against the manifest before it is loaded. IOError is raised
+    if the manifest has an entry for the bin and the bin does not match it.
+    Bins without an entry (or without a manifest) are not checked. A bin with
+    the size and mtime of its entry is not hashed again (see fingerprint).
+
+    @type  path_gz: str
+    @param path_gz: full path to the bin
+    '''
+    entry = load_manifest(manifest_path).get(bin_name(path_gz, bins_dir))
+    if entry is None:
+        return
+
+    expected = entry['output']
+    try:
+        current = fingerprint(path_gz, expected)
+    except OSError:
+        return
+    if current['size'] != expected['size'] or current['sha256'] != expected['sha256']:
+        raise IOError('%s does not match the bins manifest, please create the bins again' % path_gz)
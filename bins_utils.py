@@ -1,5 +1,95 @@
-from collections import defaultdict
 import os 
+import gc
+
+def iter_chunks(path, chunk_size=1 << 20):
+    '''
+    generator of the lines of a file, read in chunks of about chunk_size
+    bytes. every chunk is yielded as a list of complete lines without
+    trailing newlines, so that parsers can loop over a chunk without the
+    overhead of a generator per line.
+    
+    @type  path: str
+    @param path: full path to a file
+    
+    @type  chunk_size: int
+    @param chunk_size: number of bytes that is read at once
+    
+    @rtype: generator
+    @return: lists of lines of the file
+    '''
+    rest = ''
+    with open(path) as infile:
+        while True:
+            chunk = infile.read(chunk_size)
+            if not chunk:
+                break
+            lines = (rest + chunk).split('\n')
+            rest  = lines.pop()
+            yield lines
+    if rest:
+        yield [rest]
+
+class paused_gc():
+    '''
+    context manager that pauses the cyclic garbage collector. the parsers
+    create millions of small containers that can not form cycles, and the
+    collector would otherwise walk the growing mappings over and over.
+    '''
+    def __enter__(self):
+        self.enabled = gc.isenabled()
+        gc.disable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            gc.enable()
+
+def parse_offset2offset(map_file,
+                        source_wn_version,
+                        target_wn_version,
+                        pos,
+                        mapping):
+    '''
+    stream the records of a UPC file mapping offsets of one wn version to
+    another straight into mapping:
+    source_offset    ->    (target_offset,pos)    ->    confidence
+    If source_wn_version == target_wn_version, every source offset is mapped
+    to itself with confidence 1.0.
+    
+    @type  map_file: str
+    @param map_file: full path to file mapping offsets of one wn version to
+    another (see mapping_offset2offset)
+    
+    @type  mapping: dict
+    @param mapping: dict that is updated
+    
+    @rtype: dict
+    @return: mapping
+    '''
+    same_version = source_wn_version == target_wn_version
+    get          = mapping.get
+    
+    with paused_gc():
+        for lines in iter_chunks(map_file):
+            for line in lines:
+                split = line.split()
+                if len(split) < 2:
+                    continue
+                source_offset = split[0]
+                
+                targets = get(source_offset)
+                if targets is None:
+                    targets = mapping[source_offset] = {}
+                
+                if same_version:
+                    #TODO: this has to change to index.sense file
+                    targets[(source_offset,pos)] = 1.0
+                    continue
+                
+                for index_target_offset in range(1,len(split),2):
+                    targets[(split[index_target_offset],pos)] = float(split[index_target_offset+1])
+    
+    return mapping
 
 def mapping_offset2offset(map_file,
                           source_wn_version,
@@ -7,9 +97,8 @@ def mapping_offset2offset(map_file,
                           pos):
                           
     '''
-    this method create a defaultdict mappping 
-    (source_offset,source_wn_version,target_wn_version)    ->
-        'confidence' ->    (target_offset,pos)
+    this method create a dict mappping 
+    source_offset    ->    (target_offset,pos)    ->    confidence
     
     @type  map_file: str
     @param map_file: full path to file mapping offsets of one wn version to
@@ -26,50 +115,115 @@ def mapping_offset2offset(map_file,
     @type  pos: str
     @param pos: part of speech (n,v,a,r)
     
-    @rtype:  collections.defaultdict
-    @return: (source_offset,source_wn_verison,target_wn_version)    ->
-        (target_offset,pos) -> confidence (float)
+    @rtype:  dict
+    @return: source_offset    ->    (target_offset,pos) -> confidence (float)
+
+    '''
+    return parse_offset2offset(map_file,
+                               source_wn_version,
+                               target_wn_version,
+                               pos,
+                               {})
 
+def compose_offset2offset(first, second, threshold=0.0):
     '''
-    #set mapping
-    mapping = defaultdict(dict)
+    compose two offset2offset mappings (version a -> version b and
+    version b -> version c) into a mapping from version a to version c.
+    the confidence of a target is the sum, over the intermediate synsets,
+    of the product of the confidences of both steps:
+    confidence(s,t) = sum over m of first[s][m] * second[m][t]
+    
+    @type  first: dict
+    @param first: source_offset -> (target_offset,pos) -> confidence
+    
+    @type  second: dict
+    @param second: source_offset -> (target_offset,pos) -> confidence, the
+    source offsets are the target offsets of first
+    
+    @type  threshold: float
+    @param threshold: targets with a lower confidence are pruned
     
-    #loop through file
-    with open(map_file) as infile:
-        for line in infile:
-            split         = line.strip().split()
-            source_offset = split[0]
+    @rtype: dict
+    @return: source_offset -> (target_offset,pos) -> confidence (float)
+    '''
+    composed = {}
+    
+    with paused_gc():
+        for source_offset,intermediates in first.items():
+            targets = {}
+            for (intermediate_offset,pos),confidence in intermediates.items():
+                for target,target_confidence in second.get(intermediate_offset,{}).items():
+                    targets[target] = targets.get(target,0.0) + confidence * target_confidence
             
-            for index_target_offset in range(1,len(split),2):
-                
-                #obtain indices
-                index_target_offset_conf = index_target_offset+1
-                
-                if source_wn_version == target_wn_version:
-                    #TODO: this has to change to index.sense file
-                    target_offset      = source_offset
-                    target_offset_conf = 1.0
-                else:
-                    target_offset            = split[index_target_offset]
-                    target_offset_conf       = split[index_target_offset_conf]
-                
-                #set keys and values
-                main_key = (source_offset,source_wn_version,target_wn_version)
-                subkey   = (target_offset,pos)
-                subvalue = float(target_offset_conf)
+            targets = dict((target,confidence) 
+                           for target,confidence in targets.items()
+                           if confidence >= threshold)
+            if targets:
+                composed[source_offset] = targets
+    
+    return composed
+
+def parse_index_sense(index_sense_file,
+                      lexkey2offset=None,
+                      offset2lexkey=None):
+    '''
+    stream the (lexkey,offset) records of a wordnet index.sense file straight
+    into lexkey2offset and/or offset2lexkey, in one pass over the file.
+    only the first two fields of every line are split off.
+    
+    @type  index_sense_file: str
+    @param index_sense_file: full path to wordnet index.sense file 
+    
+    @type  lexkey2offset: dict | None
+    @param lexkey2offset: dict lexkey -> offset that is updated
+    
+    @type  offset2lexkey: dict | None
+    @param offset2lexkey: dict offset -> list of possible sensekeys that is
+    updated
+    '''
+    with paused_gc():
+        for lines in iter_chunks(index_sense_file):
+            for line in lines:
+                split = line.split(' ',2)
+                if len(split) < 2:
+                    split = line.split()
+                    if len(split) < 2:
+                        continue
+                lexkey,offset = split[0],split[1]
                 
-                #update mapping
-                mapping[main_key][subkey] = subvalue
+                if lexkey2offset is not None:
+                    lexkey2offset[lexkey] = offset
+                if offset2lexkey is not None:
+                    if offset in offset2lexkey:
+                        offset2lexkey[offset].append(lexkey)
+                    else:
+                        offset2lexkey[offset] = [lexkey]
+
+def mappings_index_sense(index_sense_file):
+    '''
+    method creates the lexkey2offset and offset2lexkey mapping in one pass
+    over the index.sense file.
     
-    #return output
-    return mapping
+    @type  index_sense_file: str
+    @param index_sense_file: full path to wordnet index.sense file 
+    
+    @rtype: tuple
+    @return: (lexkey2offset,offset2lexkey).
+    lexkey2offset: lexkey -> offset.
+    offset2lexkey: offset -> list of possible sensekeys
+    '''
+    lexkey2offset = {}
+    offset2lexkey = {}
+    parse_index_sense(index_sense_file, lexkey2offset, offset2lexkey)
+    
+    return lexkey2offset,offset2lexkey
 
 def mapping_offset2lexkey(index_sense_file,
                           source_wn_version):
                           
     '''
     method create a dict mapping:
-    (offset,source_wn_version) -> list of possible sensekeys
+    offset -> list of possible sensekeys
     
     @type  index_sense_file: str
     @param index_sense_file: full path to wordnet index.sense file 
@@ -77,25 +231,12 @@ def mapping_offset2lexkey(index_sense_file,
     @type  source_wn_version: str
     @param source_wn_version: source wn_version (for example '2.1')
     
-    @rtype: collections.defaultdict
-    @return: mapping (offset,source_wn_version) -> list of possible sensekeyss
+    @rtype: dict
+    @return: mapping offset -> list of possible sensekeyss
     '''
-    #set mapping
-    mapping = defaultdict(list)
+    mapping = {}
+    parse_index_sense(index_sense_file, offset2lexkey=mapping)
     
-    #loop through index.sense file
-    with open(index_sense_file) as infile:
-        for line in infile:
-            
-            #get lexkey and offset
-            split    = line.strip().split()
-            lexkey   = split[0]
-            offset   = split[1]
-            
-            #update mapping
-            mapping[(offset,source_wn_version)].append(lexkey)
-
-    #return output
     return mapping
 
 def mapping_lexkey2offset(index_sense_file,
@@ -103,7 +244,7 @@ def mapping_lexkey2offset(index_sense_file,
                           
     '''
     method create a dict mapping:
-    (lexkey,source_wn_version) ->    offset
+    lexkey ->    offset
     
     @type  index_sense_file: str
     @param index_sense_file: full path to wordnet index.sense file 
@@ -111,25 +252,12 @@ def mapping_lexkey2offset(index_sense_file,
     @type  source_wn_version: str
     @param source_wn_version: source wn_version (for example '2.1')
     
-    @rtype:  collections.defaultdict
-    @return: (lexkey,source_wn_version) -> offset
+    @rtype:  dict
+    @return: lexkey -> offset
     '''
-    #set mapping
-    mapping = defaultdict()
+    mapping = {}
+    parse_index_sense(index_sense_file, lexkey2offset=mapping)
     
-    #loop through index.sense file
-    with open(index_sense_file) as infile:
-        for line in infile:
-            
-            #get lexkey and offset
-            split    = line.strip().split()
-            lexkey   = split[0]
-            offset   = split[1]
-            
-            #update mapping
-            mapping[(lexkey,source_wn_version)] = offset
-
-    #return output
     return mapping
 
 
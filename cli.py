@@ -0,0 +1,319 @@
+'''
+command line interface of the WordNetMapper.
+
+usage:
+    python -m WordNetMapper map --from 21 --to 30 [--to-type lexkey|offset|ilidef]
+                                [--format tsv|jsonl] [--jobs N] [--chunk-size N]
+                                [input] [--output OUTPUT]
+
+every row of the input (a file or stdin) holds one lexkey, offset or ilidef
+(the type is detected per row) and optionally a lemma, which is needed to
+map offsets and ilidefs to lexkeys:
+    - tsv: identifier<TAB>lemma<TAB>... , the mapping is appended to the row
+    - jsonl: {"id" : identifier, "lemma" : lemma, ...}, the mapping is added
+      to the object
+
+the input is read in chunks of --chunk-size rows, which are mapped by a pool
+of --jobs processes. The output is written in the order of the input and at
+most a few chunks per process are in memory at any time. A summary of the
+throughput is written to stderr.
+'''
+#import built-in modules
+import sys
+import json
+import time
+import argparse
+from collections import deque
+
+#import installed or created modules
+from wordnet_mapper import WordNetMapper
+
+#output fields per output type
+OUTPUT_FIELDS = {'offset' : ('offset','pos'),
+                 'lexkey' : ('lexkey',),
+                 'ilidef' : ('ilidef',)}
+
+#mapper of the process (see init_worker)
+_mapper = None
+
+def identifier_type(identifier):
+    '''
+    >>> [identifier_type(identifier) for identifier in ['ili-30-02069355-a','other%3:00:00::','02069355',2069355]]
+    ['ilidef', 'lexkey', 'offset', 'offset']
+
+    @rtype: str
+    @return: ilidef | lexkey | offset
+    '''
+    if not hasattr(identifier,'startswith'):
+        #int offsets of jsonl input, other values are not mapped (see
+        #wn_mapper_utils.parse_offset)
+        return 'offset'
+    elif identifier.startswith('ili-'):
+        return 'ilidef'
+    elif '%' in identifier:
+        return 'lexkey'
+    return 'offset'
+
+def map_offsets(mapper, offsets, lemmas, source_wn_version, target_wn_version, to_type):
+    '''
+    map offsets of source_wn_version to to_type in target_wn_version
+
+    @rtype: list
+    @return: tuple of output fields (see OUTPUT_FIELDS) per offset, None if
+    the offset could not be mapped
+    '''
+    targets = mapper.map_offsets_to_offsets(offsets, source_wn_version, target_wn_version)
+    return offsets_to_type(mapper, targets, lemmas, target_wn_version, to_type)
+
+def offsets_to_type(mapper, targets, lemmas, wn_version, to_type):
+    '''
+    convert (offset,pos) tuples of wn_version to to_type
+
+    @rtype: list
+    @return: tuple of output fields (see OUTPUT_FIELDS) per target, None if
+    the target is None or no lexkey is found
+    '''
+    if to_type == 'offset':
+        return targets
+    elif to_type == 'ilidef':
+        return [None if target is None else ('ili-%s-%s-%s' % (wn_version,target[0],target[1]),)
+                for target in targets]
+
+    lexkeys = mapper.map_offsets_to_lexkeys(['' if target is None else target[0] for target in targets],
+                                            [lemma or '' for lemma in lemmas],
+                                            wn_version)
+    return [None if target is None or lexkey is None else (lexkey,)
+            for target,lexkey in zip(targets,lexkeys)]
+
+def map_identifiers(mapper, identifiers, lemmas, source_wn_version, target_wn_version, to_type):
+    '''
+    map identifiers (lexkeys, offsets or ilidefs) to to_type in
+    target_wn_version, with the batch methods of the mapper per type of
+    identifier
+
+    >>> my_mapper = WordNetMapper()
+    >>> map_identifiers(my_mapper, ['00020846','rock_hopper%1:05:00::','ili-30-02069355-a','99999999'],
+    ...                 [None,None,'other',None], '21', '30', 'offset')
+    [('00021939', 'n'), ('02057330', 'n'), ('02069355', 'a'), None]
+    >>> map_identifiers(my_mapper, ['cerulean%5:00:00:chromatic:00'], [None], '21', '30', 'lexkey')
+    [('cerulean%5:00:00:chromatic:00',)]
+
+    @rtype: list
+    @return: tuple of output fields (see OUTPUT_FIELDS) per identifier, None
+    if it could not be mapped
+    '''
+    output = [None] * len(identifiers)
+    groups = {}
+    for index,identifier in enumerate(identifiers):
+        groups.setdefault(identifier_type(identifier),[]).append(index)
+
+    for from_type,indices in groups.items():
+        group_ids    = [identifiers[index] for index in indices]
+        group_lemmas = [lemmas[index] for index in indices]
+
+        if from_type == 'offset':
+            results = map_offsets(mapper, group_ids, group_lemmas,
+                                  source_wn_version, target_wn_version, to_type)
+
+        elif from_type == 'lexkey' and to_type == 'lexkey':
+            results = [None if lexkey is None else (lexkey,)
+                       for lexkey in mapper.map_lexkeys_to_lexkeys(group_ids,
+                                                                   source_wn_version,
+                                                                   target_wn_version)]
+
+        elif from_type == 'lexkey':
+            #the offsets are mapped with the pos of their lexkey
+            offsets = mapper.map_lexkeys_to_offsets(group_ids, source_wn_version)
+            targets = mapper.map_offsets_per_pos(mapper.map_offsets_to_offsets, group_ids, offsets,
+                                                 source_wn_version, target_wn_version)
+            results = offsets_to_type(mapper, targets, group_lemmas, target_wn_version, to_type)
+
+        else:
+            #an ilidef contains its own wordnet version
+            targets = []
+            for ilidef in group_ids:
+                try:
+                    targets.append(mapper.map_ilidef_to_offset(ilidef, target_wn_version))
+                except (ValueError,IOError):
+                    targets.append(None)
+            results = offsets_to_type(mapper, targets, group_lemmas, target_wn_version, to_type)
+
+        for index,result in zip(indices,results):
+            output[index] = result
+
+    return output
+
+def init_worker(bin_format):
+    '''
+    create the mapper of a worker process
+    '''
+    global _mapper
+    _mapper = WordNetMapper(bin_format=bin_format)
+
+def map_chunk(chunk, input_format, source_wn_version, target_wn_version, to_type):
+    '''
+    parse, map and format a chunk of input lines. A JSONL row that is not an
+    object is not mapped and written as it is.
+
+    >>> map_chunk(['{"id": "00020846"}', '[1, 2]', '"x"'], 'jsonl', '21', '30', 'offset')
+    (['{"id": "00020846", "offset": "00021939", "pos": "n"}', '[1, 2]', '"x"'], 3, 1)
+
+    @rtype: tuple
+    @return: (output lines,number of rows,number of mapped rows)
+    '''
+    if _mapper is None:
+        init_worker('pickle')
+
+    rows = []
+    for line in chunk:
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+        if input_format == 'jsonl':
+            row = json.loads(line)
+            if isinstance(row,dict):
+                rows.append((row,row.get('id',''),row.get('lemma')))
+            else:
+                rows.append((row,None,None))
+        else:
+            fields = line.split('\t')
+            rows.append((fields,fields[0],fields[1] if len(fields) >= 2 else None))
+
+    #rows without identifier (JSONL rows that are not objects) are not mapped
+    mapped_rows = [(row,identifier,lemma) for row,identifier,lemma in rows
+                   if identifier is not None]
+    mapped_results = iter(map_identifiers(_mapper,
+                                          [identifier for row,identifier,lemma in mapped_rows],
+                                          [lemma for row,identifier,lemma in mapped_rows],
+                                          source_wn_version,
+                                          target_wn_version,
+                                          to_type))
+    results = [None if identifier is None else next(mapped_results)
+               for row,identifier,lemma in rows]
+
+    fields = OUTPUT_FIELDS[to_type]
+    lines  = []
+    for (row,identifier,lemma),result in zip(rows,results):
+        if input_format == 'jsonl':
+            if identifier is not None:
+                for field,value in zip(fields,result or [None] * len(fields)):
+                    row[field] = value
+            lines.append(json.dumps(row))
+        else:
+            lines.append('\t'.join(row + list(result or [''] * len(fields))))
+
+    mapped = sum(1 for result in results if result is not None)
+    return lines,len(rows),mapped
+
+def iter_chunks(infile, chunk_size):
+    '''
+    generator of lists of at most chunk_size lines of infile
+    '''
+    chunk = []
+    for line in infile:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_map(args, infile, outfile):
+    '''
+    map the rows of infile to outfile, chunk by chunk and in input order
+
+    @rtype: dict
+    @return: summary with 'rows', 'mapped', 'seconds' and 'rows_per_second'
+    '''
+    start   = time.time()
+    summary = {'rows' : 0, 'mapped' : 0}
+    task    = (args.format, args.source_wn_version, args.target_wn_version, args.to_type)
+
+    def write(result):
+        lines,rows,mapped = result
+        for line in lines:
+            outfile.write(line + '\n')
+        summary['rows']   += rows
+        summary['mapped'] += mapped
+
+    if args.jobs <= 1:
+        init_worker(args.bin_format)
+        for chunk in iter_chunks(infile, args.chunk_size):
+            write(map_chunk(chunk, *task))
+    else:
+        import multiprocessing
+
+        #at most two chunks per process are submitted at once, so memory
+        #stays bounded whatever the size of the input
+        pool    = multiprocessing.Pool(args.jobs, init_worker, (args.bin_format,))
+        pending = deque()
+        try:
+            for chunk in iter_chunks(infile, args.chunk_size):
+                pending.append(pool.apply_async(map_chunk, (chunk,) + task))
+                if len(pending) >= 2 * args.jobs:
+                    write(pending.popleft().get())
+            while pending:
+                write(pending.popleft().get())
+        finally:
+            pool.close()
+            pool.join()
+
+    summary['seconds']         = time.time() - start
+    summary['rows_per_second'] = summary['rows'] / max(summary['seconds'],1e-9)
+    return summary
+
+def main(arguments=None):
+    '''
+    entry point of python -m WordNetMapper
+
+    @rtype: int
+    @return: exit status
+    '''
+    parser = argparse.ArgumentParser(prog='python -m WordNetMapper',
+                                     description='map lexkeys, offsets and ilidefs between wordnet versions')
+    subparsers = parser.add_subparsers(dest='command')
+
+    map_parser = subparsers.add_parser('map',
+                                       help='map a tsv or jsonl file (or stdin) row by row')
+    map_parser.add_argument('input',nargs='?',default='-',
+                            help='input file (default: stdin)')
+    map_parser.add_argument('--output','-o',default='-',
+                            help='output file (default: stdout)')
+    map_parser.add_argument('--from',dest='source_wn_version',required=True,
+                            help='wordnet version of the lexkeys and offsets in the input (for example 21)')
+    map_parser.add_argument('--to',dest='target_wn_version',required=True,
+                            help='wordnet version to map to (for example 30)')
+    map_parser.add_argument('--to-type',choices=sorted(OUTPUT_FIELDS),default='offset',
+                            help='type of the output (default: offset)')
+    map_parser.add_argument('--format',choices=['tsv','jsonl'],default='tsv',
+                            help='format of input and output (default: tsv)')
+    map_parser.add_argument('--jobs',type=int,default=1,
+                            help='number of processes (default: 1)')
+    map_parser.add_argument('--chunk-size',type=int,default=10000,
+                            help='number of rows per chunk (default: 10000)')
+    map_parser.add_argument('--bin-format',choices=['pickle','mmap','shared'],default='pickle',
+                            help='format of the bins (see WordNetMapper, default: pickle)')
+
+    args = parser.parse_args(arguments)
+    if args.command != 'map':
+        parser.print_help()
+        return 2
+
+    infile  = sys.stdin  if args.input  == '-' else open(args.input)
+    outfile = sys.stdout if args.output == '-' else open(args.output,'w')
+    try:
+        summary = run_map(args, infile, outfile)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    sys.stderr.write('mapped %s of %s rows in %.2fs (%.0f rows/s)\n' % (summary['mapped'],
+                                                                       summary['rows'],
+                                                                       summary['seconds'],
+                                                                       summary['rows_per_second']))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,6 +7,8 @@ cwd = os.path.dirname(os.path.realpath(__file__))
 paths = {'cwd'                    : cwd,
          'resources'              : os.sep.join([cwd,'resources']),
          'wn_versions'            : ['16','17','171','20','21','30'],
+         'dir_bins'               : os.path.join(cwd,'resources','bins'),
+         'bins_manifest'          : os.path.join(cwd,'resources','bins','manifest.json'),
          'dir_offset2offset_bins' : os.path.join(cwd,'resources','bins','offset2offset'),
          'dir_lexkey2offset_bins' : os.path.join(cwd,'resources','bins','lexkey2offset'),
          'dir_offset2lexkey_bins' : os.path.join(cwd,'resources','bins','offset2lexkey'),
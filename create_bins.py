@@ -1,12 +1,12 @@
 #import built-in modules
-import os 
+import os
 import sys
-from collections import defaultdict
-from glob import glob 
-import subprocess
+import gzip
+import time
+import argparse
+from glob import glob
 
 #import pickle (use cPickle for python2)
-import sys
 if sys.version_info.major == 2:
     import cPickle as pickle
 else:
@@ -14,7 +14,10 @@ else:
 
 #import external modules (created or installed)
 import bins_utils
+import bins_manifest
+import wn_mapper_utils
 from config import paths
+from bin_cache import read_pickle_bin
 
 #extract general variables
 cwd                    = paths['cwd']
@@ -29,100 +32,489 @@ index_senses_dir       = paths['index_senses_dir']
 
 def save_pickle(mapping,output_path_mapping):
     '''
-    the mapping is saved, then gzipped
-    
-    @type  mapping: collections.defaultdict
+    the mapping is pickled and gzipped in-process to output_path_mapping.gz
+
+    @type  mapping: dict
     @param mapping: a mapping
-    
+
     @type output_path_mapping: str
     @param output_path_mapping: output path where mapping should be stored
     '''
-    #dump defaultdict
-    pickle.dump(mapping,open(output_path_mapping,'wb'))
-    
-    #gzip it
-    command = "gzip {output_path_mapping}".format(**locals())
-    subprocess.call(command,shell=True)
-    
-    
+    #partitions are stored in a directory per bin
+    output_dir = os.path.dirname(output_path_mapping)
+    if output_dir and not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    #write to a temporary file first, so that a crash never leaves a
+    #truncated bin behind
+    tmp_path = output_path_mapping + '.gz.tmp'
+    with gzip.open(tmp_path,'wb') as outfile:
+        pickle.dump(mapping,outfile,protocol=2)
+    os.rename(tmp_path,output_path_mapping + '.gz')
+
+def offset2offset_source_dir(source_wn_version,
+                             target_wn_version,
+                             mappings_dir=mappings_upc_2007):
+    '''
+    path of the UPC directory with the offset mappings from source_wn_version
+    to target_wn_version. For source_wn_version == target_wn_version, the
+    offsets of a mapping from source_wn_version to another version are used.
+
+    @rtype: str
+    @return: full path to directory with a mapping file per pos
+    '''
+    if source_wn_version == target_wn_version:
+
+        if target_wn_version == "30":
+            other_wn_version = '20'
+        else:
+            other_wn_version = '30'
+
+        return os.path.join(mappings_dir,
+                            'mapping-%s-%s' % (source_wn_version,
+                                               other_wn_version))
+
+    return os.path.join(mappings_dir,
+                        'mapping-%s-%s' % (source_wn_version,
+                                           target_wn_version))
+
+def build_offset2offset(source_wn_version,
+                        target_wn_version,
+                        mappings_dir=mappings_upc_2007,
+                        bins_dir=dir_offset2offset_bins):
+    '''
+    create the offset2offset bin of one pair of wordnet versions. Offsets are
+    only unique per part of speech, so the mapping of every part of speech
+    is also stored as a partition of the bin (for example
+    offset2offset/21_30/n), which WordNetMapper loads for queries with a
+    pos. In the bin of all parts of speech, later parts of speech replace
+    the offsets they share with earlier ones.
+
+    @rtype: str
+    @return: path of the bin
+    '''
+    #set output path for mapping offset2offset
+    bin_path   = os.path.join(bins_dir,
+                              "%s_%s" % (source_wn_version,
+                                         target_wn_version))
+    source_dir = offset2offset_source_dir(source_wn_version,
+                                          target_wn_version,
+                                          mappings_dir)
+
+    #loop
+    offset2offset = {}
+    for map_file in sorted(glob(source_dir+"/*")):
+
+        pos     = bins_utils.get_pos(map_file)
+        mapping = bins_utils.mapping_offset2offset(map_file,
+                                                   source_wn_version,
+                                                   target_wn_version,
+                                                   pos)
+
+        save_pickle(mapping, os.path.join(bin_path,pos))
+        offset2offset.update(mapping)
+
+    #dump mapping
+    save_pickle(offset2offset, bin_path)
+    return bin_path
+
+def partition_offset2offset(bin_path):
+    '''
+    create the partitions per part of speech (see build_offset2offset) of an
+    existing offset2offset bin, from the part of speech of its targets.
+    Offsets that were replaced by another part of speech in the bin are
+    only restored by creating the bin again from the UPC mappings.
+
+    @type  bin_path: str
+    @param bin_path: path of the bin (without .gz)
+
+    @rtype: list
+    @return: paths of the partitions
+    '''
+    partitions = {}
+    for source_offset,target_offsets in read_pickle_bin(bin_path).items():
+        for (target_offset,pos),confidence in target_offsets.items():
+            partition = partitions.setdefault(wn_mapper_utils.partition_pos(pos),{})
+            partition.setdefault(source_offset,{})[(target_offset,pos)] = confidence
+
+    partition_paths = []
+    for pos,mapping in sorted(partitions.items()):
+        partition_paths.append(os.path.join(bin_path,pos))
+        save_pickle(mapping, partition_paths[-1])
+    return partition_paths
+
+def build_composed_offset2offset(versions,
+                                 threshold=0.0,
+                                 bins_dir=dir_offset2offset_bins):
+    '''
+    create the offset2offset bin from versions[0] to versions[-1] by
+    composing the offset2offset bins along versions
+    (see bins_utils.compose_offset2offset)
+
+    @type  versions: list
+    @param versions: path of wordnet versions (for example ['16','30','21'])
+
+    @type  threshold: float
+    @param threshold: composed targets with a lower confidence are pruned
+
+    @rtype: str
+    @return: path of the bin
+    '''
+    step_paths = [os.path.join(bins_dir,
+                               "%s_%s" % (source_wn_version,
+                                          target_wn_version))
+                  for source_wn_version,target_wn_version in zip(versions,versions[1:])]
+    bin_path   = os.path.join(bins_dir,
+                              "%s_%s" % (versions[0],
+                                         versions[-1]))
+
+    #the partitions per part of speech are composed if every step has them
+    outputs = [(step_paths,bin_path)]
+    for pos in sorted(set(wn_mapper_utils.POS_PARTITIONS.values())):
+        partition_paths = [os.path.join(step_path,pos) for step_path in step_paths]
+        if all(os.path.exists(path + '.gz') for path in partition_paths):
+            outputs.append((partition_paths,os.path.join(bin_path,pos)))
+
+    for paths_steps,output_path in outputs:
+        composed = read_pickle_bin(paths_steps[0])
+        for step_path in paths_steps[1:]:
+            composed = bins_utils.compose_offset2offset(composed,
+                                                        read_pickle_bin(step_path),
+                                                        threshold)
+        save_pickle(composed, output_path)
+    return bin_path
+
+def build_lexkey2offset(source_wn_version,
+                        index_dir=index_senses_dir,
+                        bins_dir=dir_lexkey2offset_bins):
+    '''
+    create the lexkey2offset bin of one wordnet version
+
+    @rtype: str
+    @return: path of the bin
+    '''
+    index_sense_file = os.path.join(index_dir,source_wn_version)
+    bin_path         = os.path.join(bins_dir,source_wn_version)
+    mapping          = bins_utils.mapping_lexkey2offset(index_sense_file,
+                                                        source_wn_version)
+
+    #dump mapping
+    save_pickle(mapping,bin_path)
+    return bin_path
+
+def build_offset2lexkey(source_wn_version,
+                        index_dir=index_senses_dir,
+                        bins_dir=dir_offset2lexkey_bins):
+    '''
+    create the offset2lexkey bin of one wordnet version
+
+    @rtype: str
+    @return: path of the bin
+    '''
+    index_sense_file = os.path.join(index_dir,source_wn_version)
+    bin_path         = os.path.join(bins_dir,source_wn_version)
+    mapping          = bins_utils.mapping_offset2lexkey(index_sense_file,
+                                                        source_wn_version)
+
+    #dump mapping
+    save_pickle(mapping,bin_path)
+    return bin_path
+
+def build_index_sense_bins(source_wn_version,
+                           index_dir=index_senses_dir,
+                           lexkey2offset_dir=dir_lexkey2offset_bins,
+                           offset2lexkey_dir=dir_offset2lexkey_bins):
+    '''
+    create the lexkey2offset and offset2lexkey bins of one wordnet version
+    in one pass over its index.sense file
+
+    @rtype: list
+    @return: paths of the bins
+    '''
+    index_sense_file = os.path.join(index_dir,source_wn_version)
+    lexkey2offset,offset2lexkey = bins_utils.mappings_index_sense(index_sense_file)
+
+    bin_paths = [os.path.join(lexkey2offset_dir,source_wn_version),
+                 os.path.join(offset2lexkey_dir,source_wn_version)]
+    save_pickle(lexkey2offset,bin_paths[0])
+    save_pickle(offset2lexkey,bin_paths[1])
+    return bin_paths
+
+def build_tasks(versions=wn_versions):
+    '''
+    all bins that are created from the UPC mappings and index.sense files,
+    as (function,args,bin_paths,inputs) tuples. bin_paths are the bins a task creates, inputs are the files they
+    are created from.
+
+    @rtype: list
+    @return: list of (function,args,bin_paths,inputs)
+    '''
+    tasks = []
+    for source_wn_version,target_wn_version in direct_pairs(versions):
+        bin_path   = os.path.join(dir_offset2offset_bins,
+                                  "%s_%s" % (source_wn_version,
+                                             target_wn_version))
+        source_dir = offset2offset_source_dir(source_wn_version,
+                                              target_wn_version)
+        map_files  = sorted(glob(source_dir+"/*"))
+        tasks.append((build_offset2offset,
+                      (source_wn_version,target_wn_version),
+                      [bin_path] + [os.path.join(bin_path,bins_utils.get_pos(map_file))
+                                    for map_file in map_files],
+                      map_files))
+
+    for source_wn_version in versions:
+        index_sense_file = os.path.join(index_senses_dir,source_wn_version)
+        tasks.append((build_index_sense_bins,
+                      (source_wn_version,),
+                      [os.path.join(dir_lexkey2offset_bins,source_wn_version),
+                       os.path.join(dir_offset2lexkey_bins,source_wn_version)],
+                      [index_sense_file]))
+    return tasks
+
+def direct_pairs(versions=wn_versions, mappings_dir=mappings_upc_2007):
+    '''
+    the pairs of wordnet versions of which the UPC mappings have a directory
+
+    @rtype: list
+    @return: list of (source_wn_version,target_wn_version)
+    '''
+    return [(source_wn_version,target_wn_version)
+            for source_wn_version in versions
+            for target_wn_version in versions
+            if os.path.isdir(offset2offset_source_dir(source_wn_version,
+                                                      target_wn_version,
+                                                      mappings_dir))]
+
+def compose_tasks(versions=wn_versions, threshold=0.0, mappings_dir=mappings_upc_2007):
+    '''
+    the offset2offset bins of the pairs of wordnet versions without UPC
+    mappings, composed from the bins of the pairs with UPC mappings along the
+    cheapest path (see wn_mapper_utils.version_path). These tasks have to
+    run after the tasks of build_tasks, since their inputs are bins.
+
+    @rtype: list
+    @return: list of (function,args,bin_paths,inputs)
+    '''
+    available = direct_pairs(versions, mappings_dir)
+    if not available:
+        return []
+
+    tasks = []
+    for source_wn_version in versions:
+        for target_wn_version in versions:
+            if (source_wn_version,target_wn_version) in available:
+                continue
+
+            path = wn_mapper_utils.version_path(source_wn_version,
+                                                target_wn_version,
+                                                available)
+            if path is None:
+                print('no path of UPC mappings from %s to %s' % (source_wn_version,
+                                                                   target_wn_version))
+                continue
+
+            inputs = [os.path.join(dir_offset2offset_bins,
+                                   "%s_%s.gz" % (source,target))
+                      for source,target in zip(path,path[1:])]
+            tasks.append((build_composed_offset2offset,
+                          (path,threshold),
+                          [os.path.join(dir_offset2offset_bins,
+                                        "%s_%s" % (source_wn_version,
+                                                   target_wn_version))],
+                          inputs))
+    return tasks
+
+def stale_tasks(tasks, manifest):
+    '''
+    the tasks of which the bin is stale according to the manifest
+    (see bins_manifest.is_stale). Tasks of which the input files are missing
+    are skipped, so that existing bins are never replaced by empty ones.
+
+    @rtype: list
+    @return: list of (function,args,bin_paths,inputs)
+    '''
+    stale = []
+    for task in tasks:
+        function,args,bin_paths,inputs = task
+        if not inputs or not all(os.path.exists(path) for path in inputs):
+            print('skipped %s: input files are missing' % ', '.join(os.path.relpath(bin_path,cwd)
+                                                                  for bin_path in bin_paths))
+        elif any(bins_manifest.is_stale(bin_path+'.gz', inputs, manifest)
+                 for bin_path in bin_paths):
+            stale.append(task)
+    return stale
+
+def run_task(task):
+    '''
+    run one task of build_tasks and time it
+
+    @rtype: tuple
+    @return: (task, seconds)
+    '''
+    function,args,bin_paths,inputs = task
+    start = time.time()
+    function(*args)
+    return task,time.time()-start
+
+def run_tasks(tasks, jobs=1, manifest=None):
+    '''
+    run the tasks of build_tasks, in a pool of jobs processes if jobs > 1.
+    the time needed per bin is printed. If a manifest is given, the
+    fingerprints of every created bin are recorded in it.
+
+    @type  tasks: list
+    @param tasks: list of (function,args,bin_paths,inputs)
+
+    @type  jobs: int
+    @param jobs: number of processes
+
+    @type  manifest: dict | None
+    @param manifest: manifest (see bins_manifest) that is updated
+
+    @rtype: list
+    @return: list of (path of the bin, seconds of the task that created it)
+    '''
+    start = time.time()
+
+    if jobs > 1:
+        import multiprocessing
+        pool    = multiprocessing.Pool(jobs)
+        results = pool.imap_unordered(run_task, tasks)
+    else:
+        pool    = None
+        results = (run_task(task) for task in tasks)
+
+    timings = []
+    try:
+        for (function,args,bin_paths,inputs),seconds in results:
+            names = ', '.join(os.path.relpath(bin_path,cwd) for bin_path in bin_paths)
+            print('%-60s %6.2fs' % (names,seconds))
+            for bin_path in bin_paths:
+                timings.append((bin_path,seconds))
+                if manifest is not None:
+                    bins_manifest.record(bin_path+'.gz', inputs, manifest)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print('created %s bins in %.2fs (%s jobs)' % (len(timings),
+                                                  time.time()-start,
+                                                  jobs))
+    return timings
+
 def create_offset2offset():
     '''
+    create the offset2offset bins of all pairs of wordnet versions
     '''
     for source_wn_version in wn_versions:
         for target_wn_version in wn_versions:
-            
-            #set output path for mapping offset2offset
-            bin_path   = os.path.join(dir_offset2offset_bins,
-                                      "%s_%s" % (source_wn_version,
-                                                target_wn_version))
-            
-            #create path source dir with mappings offset 2 offsets
-            if source_wn_version == target_wn_version:
-                
-                if target_wn_version == "30":
-                    source_dir = os.path.join(mappings_upc_2007,
-                                          'mapping-%s-%s' % (source_wn_version,
-                                                             '20'))
-                else:
-                    source_dir = os.path.join(mappings_upc_2007,
-                                          'mapping-%s-%s' % (source_wn_version,
-                                                             '30'))
-                    
-            else:
-                source_dir = os.path.join(mappings_upc_2007,
-                                          'mapping-%s-%s' % (source_wn_version,
-                                                             target_wn_version))
-                
-            
-            #loop
-            offset2offset = defaultdict(dict)
-            for map_file in glob(source_dir+"/*"):
-                
-                pos     = bins_utils.get_pos(map_file)
-                mapping = bins_utils.mapping_offset2offset(map_file,
-                                                           source_wn_version,
-                                                           target_wn_version, 
-                                                           pos)
-                
-                offset2offset.update(mapping)
-            
-            #dump defaultdict
-            save_pickle(offset2offset, bin_path)
+            build_offset2offset(source_wn_version,target_wn_version)
+
+def create_index_sense_bins():
+    '''
+    create the lexkey2offset and offset2lexkey bins of all wordnet versions
+    '''
+    for source_wn_version in wn_versions:
+        build_index_sense_bins(source_wn_version)
 
 def create_lexkey2offset():
     '''
+    create the lexkey2offset bins of all wordnet versions
     '''
     for source_wn_version in wn_versions:
-        
-        index_sense_file = os.path.join(index_senses_dir,source_wn_version)
-        bin_path         = os.path.join(dir_lexkey2offset_bins,
-                                        source_wn_version)
-        mapping          = bins_utils.mapping_lexkey2offset(index_sense_file,
-                                                            source_wn_version)
-        
-        #dump mapping 
-        save_pickle(mapping,bin_path)
-    
+        build_lexkey2offset(source_wn_version)
+
 def create_offset2lexkey():
     '''
+    create the offset2lexkey bins of all wordnet versions
     '''
     for source_wn_version in wn_versions:
-        
-        index_sense_file = os.path.join(index_senses_dir,source_wn_version)
-        bin_path         = os.path.join(dir_offset2lexkey_bins,
-                                        source_wn_version)
-        mapping          = bins_utils.mapping_offset2lexkey(index_sense_file,
-                                                            source_wn_version)
-        
-        #dump mapping 
-        save_pickle(mapping,bin_path)    
-
-if len(sys.argv) == 2:    
-    #create offset2offset
-    create_offset2offset()                   
-                    
-    #create lexkey2offset bins
-    create_lexkey2offset()
-
-    #create offset2lexkey bins
-    create_offset2lexkey()
\ No newline at end of file
+        build_offset2lexkey(source_wn_version)
+
+def create_mmap_bins(offset2offset_dir=dir_offset2offset_bins,
+                     lexkey2offset_dir=dir_lexkey2offset_bins,
+                     offset2lexkey_dir=dir_offset2lexkey_bins):
+    '''
+    every pickled bin is converted to the mmap format (see mmap_bins).
+    the mmap bins are stored next to the pickled bins.
+    '''
+    import mmap_bins
+
+    for kind,bins_dir in [('offset2offset',offset2offset_dir),
+                          ('lexkey2offset',lexkey2offset_dir),
+                          ('offset2lexkey',offset2lexkey_dir)]:
+        #partitions of offset2offset bins are stored in a directory per bin
+        path_gzs = (glob(os.path.join(bins_dir,'*.gz')) +
+                    glob(os.path.join(bins_dir,'*','*.gz')))
+        for path_gz in sorted(path_gzs):
+            bin_path = path_gz[:-len('.gz')]
+            name     = os.path.relpath(bin_path,bins_dir).split(os.sep)[0]
+            mapping  = read_pickle_bin(bin_path)
+            mmap_bins.save_mmap(mapping, bin_path, kind, *name.split('_'))
+
+def create_partitions():
+    '''
+    create the partitions per part of speech of every offset2offset bin
+    (see partition_offset2offset)
+    '''
+    for path_gz in sorted(glob(os.path.join(dir_offset2offset_bins,'*.gz'))):
+        partition_offset2offset(path_gz[:-len('.gz')])
+
+def main(arguments=None):
+    '''
+    command line interface:
+        python create_bins.py run [--jobs N] [--incremental] [--threshold T]    create the bins
+        python create_bins.py mmap                              convert pickled bins to mmap bins
+        python create_bins.py partition                         split existing offset2offset bins per pos
+    '''
+    parser = argparse.ArgumentParser(description='create the WordNetMapper bins')
+    parser.add_argument('mode',
+                        choices=['run','mmap','partition'],
+                        help='run: create all bins from the UPC mappings and '
+                             'index.sense files, mmap: convert the pickled '
+                             'bins to the mmap format, partition: create the '
+                             'partitions per pos of existing offset2offset '
+                             'bins')
+    parser.add_argument('--jobs',
+                        type=int,
+                        default=1,
+                        help='number of processes used to create the bins '
+                             '(default: 1)')
+    parser.add_argument('--incremental',
+                        action='store_true',
+                        help='only create the bins of which the input files '
+                             'changed according to the bins manifest')
+    parser.add_argument('--threshold',
+                        type=float,
+                        default=0.01,
+                        help='confidence below which targets are pruned from '
+                             'the offset2offset bins that are composed for '
+                             'pairs of wordnet versions without UPC mappings '
+                             '(default: 0.01)')
+    args = parser.parse_args(arguments)
+
+    if args.mode == 'mmap':
+        create_mmap_bins()
+    elif args.mode == 'partition':
+        create_partitions()
+    else:
+        manifest = bins_manifest.load_manifest()
+        try:
+            #the composed bins are created from the other bins, so they are
+            #created in a second stage
+            for stage in ('build','compose'):
+                if stage == 'build':
+                    tasks = build_tasks()
+                else:
+                    tasks = compose_tasks(threshold=args.threshold)
+                if args.incremental:
+                    tasks = stale_tasks(tasks, manifest)
+                    print('%s stale bins' % len(tasks))
+                run_tasks(tasks, args.jobs, manifest)
+        finally:
+            bins_manifest.save_manifest(manifest)
+
+if __name__ == '__main__':
+    main()
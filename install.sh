@@ -58,7 +58,7 @@ obtain_index_sense "http://wordnetcode.princeton.edu/2.1/WordNet-2.1.tar.gz" 21
 obtain_index_sense "http://wordnetcode.princeton.edu/3.0/WordNet-3.0.tar.gz" 30
 
 #create bins
-python create_bins.py run
+python create_bins.py run --jobs $(nproc)
 
 #rm mappings and index file
 rm -rf resources/wn_index_senses
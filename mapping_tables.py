@@ -0,0 +1,364 @@
+'''
+internal representation of the loaded bins.
+
+offsets are stored as int and target synsets as packed ints
+(see wn_mapper_utils.pack_offset). Strings are only parsed and formatted at
+the boundary of the public WordNetMapper methods.
+
+    - offset2offset: Offset2OffsetTable, source offset (int) ->
+      (packed target offsets, confidences), stored in flat arrays, plus the
+      target with the highest confidence per source offset
+    - offset2lexkey: Offset2LexkeyTable, offset (int) -> tuple of possible
+      lexkeys, plus the lemmas of the lexkeys of offsets with more than one
+      lexkey
+    - lexkey2offset: dict, lexkey -> offset (int)
+    - reverse offset2offset: Offset2OffsetTable, packed target offset ->
+      (source offsets, confidences), inverted on first use (see
+      reverse_offset2offset)
+'''
+#import built-in modules
+import sys
+from array import array
+
+#import installed or created modules
+from wn_mapper_utils import pack_offset, best_index, lexkey_lemmas
+
+#typecode of the arrays of (packed) offsets. Python 2 has no 'q'; packed
+#offsets (offset * 8 + code of pos) stay far below 2 ** 31, so its 'l' is
+#large enough on every platform
+try:
+    array('q')
+    OFFSETS = 'q'
+except ValueError:
+    OFFSETS = 'l'
+
+class Offset2OffsetTable():
+    '''
+    source offset (int) -> (packed target offsets,confidences).
+
+    the targets and confidences of all source offsets are stored in two flat
+    arrays. index maps a source offset to its position in starts, the targets
+    of a source offset are targets[starts[position]:starts[position+1]].
+    best[position] is the target with the highest confidence
+    (see wn_mapper_utils.best_index).
+
+    >>> table = Offset2OffsetTable.from_dict({'00020846' : {('00021939','n') : 1.0}})
+    >>> [list(column) for column in table.get(20846)]
+    [[175513], [1.0]]
+    >>> table.get_best(20846)
+    175513
+    >>> table.get(20847) is None
+    True
+    '''
+    def __init__(self, index, starts, targets, confidences, best=None):
+
+        self.index       = index
+        self.starts      = starts
+        self.targets     = targets
+        self.confidences = confidences
+        self.best        = best if best is not None else self.compute_best()
+
+    def compute_best(self):
+        '''
+        @rtype: array.array
+        @return: target with the highest confidence per source offset
+        '''
+        starts,targets,confidences = self.starts,self.targets,self.confidences
+        best = array(OFFSETS)
+        for position in range(len(starts)-1):
+            start,end = starts[position],starts[position+1]
+            best.append(targets[start + best_index(confidences[start:end])])
+        return best
+
+    @classmethod
+    def from_dict(cls, mapping):
+        '''
+        create table from a mapping as created by bins_utils.mapping_offset2offset
+
+        @type  mapping: dict
+        @param mapping: source_offset -> (target_offset,pos) -> confidence
+
+        @rtype: Offset2OffsetTable
+        @return: the table
+        '''
+        index       = {}
+        starts      = array('l',[0])
+        targets     = array(OFFSETS)
+        confidences = array('d')
+
+        for source_offset,target_offsets in mapping.items():
+            if not target_offsets:
+                continue
+            index[int(source_offset)] = len(index)
+            for (target_offset,pos),confidence in target_offsets.items():
+                targets.append(pack_offset(target_offset,pos))
+                confidences.append(confidence)
+            starts.append(len(targets))
+
+        return cls(index, starts, targets, confidences)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __contains__(self, source_offset):
+        return source_offset in self.index
+
+    def get(self, source_offset, default=None):
+        '''
+        @type  source_offset: int
+        @param source_offset: source offset
+
+        @rtype: tuple
+        @return: (packed target offsets,confidences), default if not found
+        '''
+        position = self.index.get(source_offset)
+        if position is None:
+            return default
+        start,end = self.starts[position],self.starts[position+1]
+        return self.targets[start:end],self.confidences[start:end]
+
+    def get_best(self, source_offset, default=None):
+        '''
+        @type  source_offset: int
+        @param source_offset: source offset
+
+        @rtype: int
+        @return: packed target offset with the highest confidence, default
+        if not found
+        '''
+        position = self.index.get(source_offset)
+        if position is None:
+            return default
+        return self.best[position]
+
+    def items(self):
+        for source_offset in self.index:
+            yield source_offset,self.get(source_offset)
+
+    @property
+    def nbytes(self):
+        '''
+        approximate size in bytes of the table
+        '''
+        size = sys.getsizeof(self.index) + 32 * len(self.index)
+        for column in (self.starts,self.targets,self.confidences,self.best):
+            size += column.itemsize * len(column)
+        return size
+
+class ChainedOffset2Offset():
+    '''
+    offset2offset along a path of offset2offset bins (for example 16 -> 30
+    and 30 -> 21), composed at query time. the confidence of a target is the
+    sum over the intermediate synsets of the product of the confidences
+    (see bins_utils.compose_offset2offset).
+
+    >>> first  = Offset2OffsetTable.from_dict({'00000001' : {('00000010','n') : 0.5,
+    ...                                                      ('00000011','n') : 0.5}})
+    >>> second = Offset2OffsetTable.from_dict({'00000010' : {('00000100','n') : 1.0},
+    ...                                        '00000011' : {('00000100','n') : 0.6,
+    ...                                                      ('00000101','n') : 0.4}})
+    >>> chained = ChainedOffset2Offset([first,second])
+    >>> sorted(zip(*chained.get(1)))
+    [(801, 0.8), (809, 0.2)]
+    >>> chained.get_best(1)
+    801
+    >>> chained.get(2) is None
+    True
+    '''
+    def __init__(self, mappings):
+
+        self.mappings = mappings
+
+    def __iter__(self):
+        #source offsets that may be found (of the first bin of the path)
+        return iter(self.mappings[0])
+
+    def get(self, source_offset, default=None):
+        '''
+        @type  source_offset: int
+        @param source_offset: source offset
+
+        @rtype: tuple
+        @return: (packed target offsets,confidences), default if not found
+        '''
+        if source_offset is None:
+            return default
+
+        #the offset of a packed offset is packed >> 3 (see
+        #wn_mapper_utils.pack_offset)
+        scores = {source_offset << 3 : 1.0}
+        for mapping in self.mappings:
+            next_scores = {}
+            for packed,confidence in scores.items():
+                found = mapping.get(packed >> 3)
+                if found is None:
+                    continue
+                for target,target_confidence in zip(*found):
+                    next_scores[target] = (next_scores.get(target,0.0) + 
+                                           confidence * target_confidence)
+            scores = next_scores
+
+        if not scores:
+            return default
+        return list(scores),list(scores.values())
+
+    def get_best(self, source_offset, default=None):
+        '''
+        @type  source_offset: int
+        @param source_offset: source offset
+
+        @rtype: int
+        @return: packed target offset with the highest confidence, default
+        if not found
+        '''
+        found = self.get(source_offset)
+        if found is None:
+            return default
+        targets,confidences = found
+        return targets[best_index(confidences)]
+
+def reverse_offset2offset(mapping):
+    '''
+    invert an offset2offset bin: packed target offset -> (source offsets,
+    confidences). The bins do not store the part of speech of the source
+    offsets, so the source offsets are ints (see
+    WordNetMapper.map_offset_from_offset).
+
+    >>> table = Offset2OffsetTable.from_dict({'00000001' : {('00000010','n') : 0.4},
+    ...                                       '00000002' : {('00000010','n') : 0.6,
+    ...                                                     ('00000011','n') : 0.4}})
+    >>> reverse = reverse_offset2offset(table)
+    >>> [list(column) for column in reverse.get(81)]
+    [[1, 2], [0.4, 0.6]]
+    >>> reverse.get_best(81)
+    2
+
+    @type  mapping: Offset2OffsetTable | mmap_bins.Offset2OffsetBin | ChainedOffset2Offset
+    @param mapping: offset2offset bin
+
+    @rtype: Offset2OffsetTable
+    @return: the inverted bin, keyed by packed target offset
+    '''
+    sources = {}
+    for source_offset in sorted(mapping):
+        found = mapping.get(source_offset)
+        if found is None:
+            continue
+        for target,confidence in zip(*found):
+            sources.setdefault(target,[]).append((source_offset,confidence))
+
+    index       = {}
+    starts      = array('l',[0])
+    offsets     = array(OFFSETS)
+    confidences = array('d')
+    for target in sorted(sources):
+        index[target] = len(index)
+        for source_offset,confidence in sources[target]:
+            offsets.append(source_offset)
+            confidences.append(confidence)
+        starts.append(len(offsets))
+
+    return Offset2OffsetTable(index, starts, offsets, confidences)
+
+class Offset2LexkeyTable(dict):
+    '''
+    offset (int) -> tuple of possible lexkeys.
+
+    lemmas holds the lemmas of the lexkeys (see wn_mapper_utils.lexkey_lemmas)
+    of every offset with more than one lexkey, so that the lexkey of a lemma
+    is found without parsing the lexkeys (see wn_mapper_utils.select_lexkey).
+
+    >>> table = Offset2LexkeyTable({3413428 : ('gambling_den%1:06:00::','gambling_hell%1:06:00::')})
+    >>> table.get_lemmas(3413428)
+    ('gambling_den', 'gambling_hell')
+    >>> table.get_lemmas(3413429) is None
+    True
+    '''
+    def __init__(self, *args):
+        dict.__init__(self, *args)
+        self.lemmas = dict((offset,lexkey_lemmas(lexkeys))
+                           for offset,lexkeys in self.items()
+                           if len(lexkeys) >= 2)
+
+    def get_lemmas(self, offset):
+        '''
+        @type  offset: int
+        @param offset: offset
+
+        @rtype: tuple | None
+        @return: lemmas of the lexkeys of the offset, None if the offset
+        has less than two lexkeys
+        '''
+        return self.lemmas.get(offset)
+
+def offset_set(mapping):
+    '''
+    the offsets of an offset keyed bin as a set
+
+    >>> sorted(offset_set({20846 : ('entity%1:03:00::',)}))
+    [20846]
+
+    @type  mapping: Offset2OffsetTable | Offset2LexkeyTable | mmap_bins.MmapBin
+    @param mapping: offset2offset | offset2lexkey bin
+
+    @rtype: set
+    @return: set of offsets (int)
+    '''
+    #the key table of mmap bins is converted in one go
+    keys_table = getattr(mapping,'keys_table',None)
+    if keys_table is not None:
+        return set(keys_table)
+    return set(mapping)
+
+def mapped_offsets(source_offsets, mapping):
+    '''
+    the source offsets that can be mapped with an offset2offset bin
+
+    >>> table = Offset2OffsetTable.from_dict({'00020846' : {('00021939','n') : 1.0}})
+    >>> sorted(mapped_offsets(set([20846,20847]), table))
+    [20846]
+
+    @type  source_offsets: set
+    @param source_offsets: offsets (int)
+
+    @type  mapping: Offset2OffsetTable | mmap_bins.Offset2OffsetBin | ChainedOffset2Offset
+    @param mapping: offset2offset bin
+
+    @rtype: set
+    @return: set of offsets (int)
+    '''
+    if isinstance(mapping,ChainedOffset2Offset):
+        return set(offset for offset in source_offsets
+                   if mapping.get(offset) is not None)
+    return source_offsets & offset_set(mapping)
+
+def convert_bin(mapping):
+    '''
+    convert a loaded bin with bare keys (see bin_cache.strip_versions) to
+    the internal representation. The kind of bin is determined by the type
+    of its values.
+
+    >>> convert_bin({'00020846' : ['entity%1:03:00::']})
+    {20846: ('entity%1:03:00::',)}
+    >>> convert_bin({'entity%1:03:00::' : '00001740'})
+    {'entity%1:03:00::': 1740}
+
+    @type  mapping: dict
+    @param mapping: offset2offset | offset2lexkey | lexkey2offset bin
+
+    @rtype: Offset2OffsetTable | Offset2LexkeyTable | dict
+    @return: the bin in the internal representation
+    '''
+    for value in mapping.values():
+        if isinstance(value,dict):
+            return Offset2OffsetTable.from_dict(mapping)
+        elif isinstance(value,list):
+            return Offset2LexkeyTable((int(offset),tuple(lexkeys))
+                                      for offset,lexkeys in mapping.items() if lexkeys)
+        return dict((lexkey,int(offset))
+                    for lexkey,offset in mapping.items() if offset)
+
+    return {}
@@ -0,0 +1,250 @@
+'''
+optional instrumentation of WordNetMapper: counters and latency histograms
+per method, per pair of wordnet versions and per strategy with which
+map_offset_to_lexkey selects a lexkey.
+
+the methods of a mapper are only wrapped if it is created with metrics (see
+instrument), so a mapper without metrics runs the plain methods. Every
+recorded value is also passed to the callback of Metrics, which can forward
+it to an exporter, for example:
+
+    def to_statsd(kind, name, labels, value):
+        if kind == 'histogram':
+            statsd_client.timing(name, value * 1000, tags=labels)
+        else:
+            statsd_client.increment(name, value, tags=labels)
+
+    my_mapper = WordNetMapper(metrics=Metrics(callback=to_statsd))
+
+metrics:
+    - wordnet_mapper_calls_total (counter): method, source, target, outcome
+      (ok | error: the method raised an exception, for example ValueError)
+    - wordnet_mapper_call_seconds (histogram): method, source, target
+      (the calls are the calls of the user: a method called by another
+      instrumented method is not counted again, see timed_method)
+    - wordnet_mapper_bin_loads_total (counter): kind, bin
+    - wordnet_mapper_bin_load_seconds (histogram): kind, bin
+    - wordnet_mapper_lexkey_selection_seconds (histogram): version, strategy
+      (none | single | exact | levenshtein, see wn_mapper_utils.lexkey_strategy)
+'''
+#import built-in modules
+import os
+import time
+import inspect
+import threading
+from bisect import bisect_left
+
+#upper bounds in seconds of the buckets of the histograms
+BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3,
+           0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, float('inf'))
+
+#methods of WordNetMapper that are instrumented
+METHODS = ['map_offset_to_offset',
+           'map_offset_from_offset',
+           'map_offset_to_ilidef',
+           'map_offset_to_lexkey',
+           'map_lexkey_to_offset',
+           'map_lexkey_to_lexkey',
+           'map_lexkey_to_ilidef',
+           'map_ilidef_to_offset',
+           'map_ilidef_to_lexkey',
+           'map_ilidef_to_ilidef',
+           'map_offsets_to_offsets',
+           'map_offsets_to_ilidefs',
+           'map_offsets_to_lexkeys',
+           'map_lexkeys_to_offsets',
+           'map_lexkeys_to_ilidefs',
+           'map_lexkeys_to_lexkeys',
+           'load_bin_if_needed',
+           'overlap',
+           'coverage']
+
+class Histogram():
+    '''
+    latency histogram with fixed buckets (see BUCKETS)
+    '''
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts  = [0] * len(buckets)
+        self.count   = 0
+        self.sum     = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets,value)] += 1
+        self.count += 1
+        self.sum   += value
+
+    def info(self):
+        '''
+        @rtype: dict
+        @return: count, sum and cumulative count per bucket (as the buckets
+        of Prometheus)
+        '''
+        cumulative,buckets = 0,[]
+        for bound,count in zip(self.buckets,self.counts):
+            cumulative += count
+            buckets.append((bound,cumulative))
+        return {'count' : self.count, 'sum' : self.sum, 'buckets' : buckets}
+
+class Metrics():
+    '''
+    counters and histograms with labels.
+
+    >>> metrics = Metrics()
+    >>> metrics.increment('calls', {'method' : 'map_offset_to_offset'})
+    >>> metrics.observe('seconds', {'method' : 'map_offset_to_offset'}, 0.002)
+    >>> stats = metrics.stats()
+    >>> [(counter['name'],counter['labels'],counter['value']) for counter in stats['counters']]
+    [('calls', {'method': 'map_offset_to_offset'}, 1)]
+    >>> stats['histograms'][0]['count']
+    1
+    '''
+    def __init__(self, callback=None, buckets=BUCKETS):
+        '''
+        @type  callback: callable | None
+        @param callback: called with (kind,name,labels,value) for every
+        recorded value, kind is 'counter' or 'histogram'
+
+        @type  buckets: tuple
+        @param buckets: upper bounds of the buckets of the histograms, the
+        last one should be float('inf')
+        '''
+        self.callback   = callback
+        self.buckets    = buckets
+        self.lock       = threading.Lock()
+        self.counters   = {}
+        self.histograms = {}
+
+    def increment(self, name, labels, value=1):
+        key = (name,tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key,0) + value
+        if self.callback is not None:
+            self.callback('counter', name, labels, value)
+
+    def observe(self, name, labels, value):
+        key = (name,tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+        if self.callback is not None:
+            self.callback('histogram', name, labels, value)
+
+    def stats(self):
+        '''
+        @rtype: dict
+        @return: 'counters': list of {'name','labels','value'} and
+        'histograms': list of {'name','labels','count','sum','buckets'}
+        '''
+        with self.lock:
+            counters = [{'name' : name, 'labels' : dict(labels), 'value' : value}
+                        for (name,labels),value in sorted(self.counters.items())]
+            histograms = []
+            for (name,labels),histogram in sorted(self.histograms.items(),
+                                                  key=lambda item: item[0]):
+                entry = {'name' : name, 'labels' : dict(labels)}
+                entry.update(histogram.info())
+                histograms.append(entry)
+        return {'counters' : counters, 'histograms' : histograms}
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+def version_labels(method):
+    '''
+    @rtype: tuple
+    @return: (position,name) in the arguments of method of source_wn_version
+    and target_wn_version, None if method does not have the argument
+    '''
+    try:
+        parameters = list(inspect.signature(method).parameters)
+    except AttributeError:
+        #Python 2 has no inspect.signature, self is left out as by signature
+        parameters = inspect.getargspec(method).args[1:]
+    return tuple((parameters.index(name),name) if name in parameters else None
+                 for name in ('source_wn_version','target_wn_version'))
+
+def timed_method(method, name, metrics, calls):
+    '''
+    wrap a bound method of WordNetMapper, so that its calls and latency are
+    recorded per pair of wordnet versions. Only the outermost call of a
+    thread is recorded: the methods that an instrumented method calls (for
+    example map_offsets_to_offsets called by map_lexkeys_to_lexkeys) are not
+    counted again.
+
+    @type  calls: threading.local
+    @param calls: depth of the instrumented calls per thread, shared by the
+    methods of a mapper
+    '''
+    versions = version_labels(method)
+    perf     = getattr(time,'perf_counter',time.time)
+
+    def labels(args, kwargs):
+        values = []
+        for version in versions:
+            if version is None:
+                values.append('')
+            else:
+                position,argument = version
+                values.append(args[position] if position < len(args)
+                              else kwargs.get(argument,''))
+        return {'method' : name, 'source' : values[0], 'target' : values[1]}
+
+    def timed(*args, **kwargs):
+        if getattr(calls,'depth',0):
+            return method(*args, **kwargs)
+
+        outcome     = 'error'
+        calls.depth = 1
+        start       = perf()
+        try:
+            result  = method(*args, **kwargs)
+            outcome = 'ok'
+            return result
+        finally:
+            seconds       = perf() - start
+            calls.depth   = 0
+            method_labels = labels(args, kwargs)
+            metrics.observe('wordnet_mapper_call_seconds', method_labels, seconds)
+            method_labels['outcome'] = outcome
+            metrics.increment('wordnet_mapper_calls_total', method_labels)
+
+    timed.__name__ = name
+    timed.__doc__  = method.__doc__
+    return timed
+
+def timed_loader(loader, metrics):
+    '''
+    wrap the function with which a mapper loads bins (see
+    WordNetMapper.load_bin), so that loads and their latency are recorded
+    '''
+    perf = getattr(time,'perf_counter',time.time)
+
+    def load(path_bin):
+        start  = perf()
+        result = loader(path_bin)
+        kind_dir,name = os.path.split(path_bin)
+        if os.path.basename(kind_dir) not in ('offset2offset','offset2lexkey','lexkey2offset'):
+            #partition of a bin (for example offset2offset/21_30/n)
+            kind_dir,bin_name = os.path.split(kind_dir)
+            name              = bin_name + '/' + name
+        labels = {'kind' : os.path.basename(kind_dir), 'bin' : name}
+        metrics.observe('wordnet_mapper_bin_load_seconds', labels, perf() - start)
+        metrics.increment('wordnet_mapper_bin_loads_total', labels)
+        return result
+
+    return load
+
+def instrument(mapper, metrics):
+    '''
+    replace the methods of mapper (see METHODS) and its bin loader by
+    instrumented versions
+    '''
+    calls = threading.local()
+    for name in METHODS:
+        setattr(mapper, name, timed_method(getattr(mapper,name), name, metrics, calls))
+    mapper.load_bin = timed_loader(mapper.load_bin, metrics)
@@ -0,0 +1,568 @@
+'''
+compact binary bin format that is searched in place through mmap.
+
+A bin is stored as a header followed by sorted fixed-width tables and a
+string pool. Nothing is unpickled when a bin is opened: lookups binary search
+the key table directly in the mapped file, so a cold process can answer its
+first query without reading the whole bin, and processes that open the same
+bin share the operating system page cache.
+
+layout (all tables use native byte order, recorded in the header):
+    - header (HEADER_FORMAT, padded to 8 bytes)
+    - offset2offset: keys uint32[n], starts uint32[n+1],
+      packed targets uint32[m] (see wn_mapper_utils.pack_offset),
+      confidences float64[m], packed target with the highest confidence
+      uint32[n] (see wn_mapper_utils.best_index)
+    - offset2lexkey: keys uint32[n], starts uint32[n+1],
+      string starts uint32[m+1], string pool
+    - lexkey2offset: string starts uint32[n+1], values uint32[n], string pool
+
+The readers return the same keys and values as the loaded pickled bins
+(see mapping_tables), the wordnet versions are stored once in the header.
+Bins can be written with python 2.7 (save_mmap), reading them requires
+python 3 (memoryview of an mmap), so the doctests only run with python 3.
+
+load_shared_bin converts pickled bins to this format on first use, in a
+directory in shared memory (/dev/shm if available). Processes of a worker
+pool then map the same pages instead of each holding its own copy of the
+bins, and since the mapped pages are read-only, reference counting in forked
+workers never copies them. The directory is kept after the processes exit
+(remove it with remove_shared_bins); directories of older versions of the
+bins are removed when a new version is converted (see prune_shared_bins).
+'''
+#import built-in modules
+import os
+import sys
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+
+#import installed or created modules
+from wn_mapper_utils import pack_offset, best_index
+
+EXTENSION      = '.wnb'
+MAGIC          = b'WNMB'
+FORMAT_VERSION = 3
+HEADER_FORMAT  = '<4sHHBB8s8sIII'
+HEADER_SIZE    = 48
+
+KINDS = {'offset2offset' : 1,
+         'offset2lexkey' : 2,
+         'lexkey2offset' : 3}
+KIND_NAMES = dict((code,kind) for kind,code in KINDS.items())
+
+BYTEORDERS = {'little' : 0, 'big' : 1}
+
+def _align(position, size=8):
+    '''
+    round position up to a multiple of size
+    '''
+    return (position + size - 1) // size * size
+
+def _uint32(values):
+    '''
+    create array of unsigned 32 bit integers
+    '''
+    for typecode in 'IL':
+        if array(typecode).itemsize == 4:
+            return array(typecode, values)
+    raise ValueError('no 32 bit unsigned integer type available')
+
+def _string_pool(strings):
+    '''
+    encode strings into one pool
+
+    @rtype: tuple
+    @return: (starts,pool). starts is an array of len(strings)+1 positions
+    in pool
+    '''
+    starts = [0]
+    chunks = []
+    for string in strings:
+        chunk = string.encode('utf-8')
+        chunks.append(chunk)
+        starts.append(starts[-1] + len(chunk))
+    return _uint32(starts), b''.join(chunks)
+
+def save_mmap(mapping, output_path_mapping, kind,
+              source_wn_version, target_wn_version=''):
+    '''
+    a mapping is written in the mmap format to output_path_mapping + '.wnb'
+
+    @type  mapping: dict
+    @param mapping: a mapping as created by bins_utils
+
+    @type  output_path_mapping: str
+    @param output_path_mapping: output path (without extension)
+
+    @type  kind: str
+    @param kind: offset2offset | offset2lexkey | lexkey2offset
+
+    @type  source_wn_version: str
+    @param source_wn_version: source wn_version (for example '21')
+
+    @type  target_wn_version: str
+    @param target_wn_version: target wn_version (only for offset2offset)
+    '''
+
+    sections = []
+    if kind == 'offset2offset':
+        keys,starts,targets,confidences,best = [],[0],[],[],[]
+        for key in sorted(mapping, key=int):
+            value = mapping[key]
+            if not value:
+                continue
+            keys.append(int(key))
+            for (target_offset,target_pos),confidence in value.items():
+                targets.append(pack_offset(target_offset,target_pos))
+                confidences.append(confidence)
+            best.append(targets[starts[-1] + best_index(confidences[starts[-1]:])])
+            starts.append(len(targets))
+        n_keys,n_values,pool = len(keys),len(targets),b''
+        sections = [_uint32(keys),_uint32(starts),_uint32(targets),
+                    array('d',confidences),_uint32(best)]
+
+    elif kind == 'offset2lexkey':
+        keys,starts,lexkeys = [],[0],[]
+        for key in sorted(mapping, key=int):
+            value = mapping[key]
+            if not value:
+                continue
+            keys.append(int(key))
+            lexkeys.extend(value)
+            starts.append(len(lexkeys))
+        string_starts,pool = _string_pool(lexkeys)
+        n_keys,n_values = len(keys),len(lexkeys)
+        sections = [_uint32(keys),_uint32(starts),string_starts]
+
+    elif kind == 'lexkey2offset':
+        items = sorted((key.encode('utf-8'),value)
+                       for key,value in mapping.items() if value)
+        starts = [0]
+        for lexkey,offset in items:
+            starts.append(starts[-1] + len(lexkey))
+        pool = b''.join(lexkey for lexkey,offset in items)
+        n_keys,n_values = len(items),len(items)
+        sections = [_uint32(starts),_uint32(int(offset) for lexkey,offset in items)]
+
+    else:
+        raise ValueError('unknown kind of bin: %s' % kind)
+
+    header = struct.pack(HEADER_FORMAT,
+                         MAGIC,
+                         FORMAT_VERSION,
+                         KINDS[kind],
+                         BYTEORDERS[sys.byteorder],
+                         0,
+                         source_wn_version.encode('ascii'),
+                         target_wn_version.encode('ascii'),
+                         n_keys,
+                         n_values,
+                         len(pool))
+
+    #the temporary file is unique per process, since workers may convert the
+    #same bin at the same time (see load_shared_bin)
+    tmp_path = '%s%s.%s.tmp' % (output_path_mapping, EXTENSION, os.getpid())
+    with open(tmp_path,'wb') as outfile:
+        outfile.write(header.ljust(HEADER_SIZE,b'\0'))
+        for section in sections:
+            #python 2 arrays have tostring instead of tobytes
+            outfile.write(section.tobytes() if hasattr(section,'tobytes') else section.tostring())
+            outfile.write(b'\0' * (_align(outfile.tell()) - outfile.tell()))
+        outfile.write(pool)
+    os.rename(tmp_path, output_path_mapping + EXTENSION)
+
+class MmapBin(object):
+    '''
+    read-only view on a bin in the mmap format (see module docstring).
+    Use load_mmap_bin to open a bin.
+    '''
+    kind = None
+
+    def __init__(self, mm, source_wn_version, target_wn_version,
+                       n_keys, n_values, pool_size):
+        self.mm                = mm
+        self.view              = memoryview(mm)
+        self.source_wn_version = source_wn_version
+        self.target_wn_version = target_wn_version
+        self.n_keys            = n_keys
+        self.n_values          = n_values
+        self.pool_size         = pool_size
+        self.nbytes            = len(mm)
+        self.position          = HEADER_SIZE
+
+    def _section(self, typecode, length):
+        '''
+        return a zero-copy view of the next table in the file
+        '''
+        itemsize = array(typecode).itemsize
+        start    = self.position
+        end      = start + itemsize * length
+        self.position = _align(end)
+        return self.view[start:end].cast(typecode)
+
+    def _uint32_section(self, length):
+        typecode = 'I' if array('I').itemsize == 4 else 'L'
+        return self._section(typecode, length)
+
+    def _pool(self):
+        return self.view[self.position:self.position+self.pool_size]
+
+    def __len__(self):
+        return self.n_keys
+
+    def __contains__(self, key):
+        return bool(self.get(key))
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for index in range(self.n_keys):
+            yield self.identifier(index)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        for key in self:
+            yield key, self.get(key)
+
+class _OffsetKeyed(MmapBin):
+    '''
+    bins with an offset as key and a range of values per key
+    '''
+    def _index(self, offset):
+        '''
+        @rtype: int
+        @return: position of offset (int) in the key table, -1 if not present
+        '''
+        if offset is None:
+            return -1
+        index = bisect_left(self.keys_table, offset)
+        if index < self.n_keys and self.keys_table[index] == offset:
+            return index
+        return -1
+
+    def identifier(self, index):
+        return self.keys_table[index]
+
+    def get(self, key, default=None):
+        index = self._index(key)
+        if index == -1:
+            return default
+        return self.value(self.starts[index], self.starts[index+1])
+
+class Offset2OffsetBin(_OffsetKeyed):
+    '''
+    source offset (int) -> (packed target offsets,confidences)
+    '''
+    kind = 'offset2offset'
+
+    def __init__(self, *args):
+        MmapBin.__init__(self, *args)
+        self.keys_table  = self._uint32_section(self.n_keys)
+        self.starts      = self._uint32_section(self.n_keys+1)
+        self.targets     = self._uint32_section(self.n_values)
+        self.confidences = self._section('d', self.n_values)
+        self.best        = self._uint32_section(self.n_keys)
+
+    def value(self, start, end):
+        return self.targets[start:end],self.confidences[start:end]
+
+    def get_best(self, offset, default=None):
+        '''
+        @rtype: int
+        @return: packed target offset with the highest confidence, default
+        if not found
+        '''
+        index = self._index(offset)
+        if index == -1:
+            return default
+        return self.best[index]
+
+class Offset2LexkeyBin(_OffsetKeyed):
+    '''
+    offset (int) -> tuple of possible lexkeys
+    '''
+    kind = 'offset2lexkey'
+
+    def __init__(self, *args):
+        MmapBin.__init__(self, *args)
+        self.keys_table    = self._uint32_section(self.n_keys)
+        self.starts        = self._uint32_section(self.n_keys+1)
+        self.string_starts = self._uint32_section(self.n_values+1)
+        self.pool          = self._pool()
+
+    def value(self, start, end):
+        string_starts,pool = self.string_starts,self.pool
+        return tuple(bytes(pool[string_starts[index]:string_starts[index+1]]).decode('utf-8')
+                     for index in range(start, end))
+
+    def get_lemmas(self, offset):
+        '''
+        the lemmas are not stored in the mmap format, they are taken from the
+        lexkeys when needed (see wn_mapper_utils.select_lexkey)
+
+        @rtype: None
+        '''
+        return None
+
+class Lexkey2OffsetBin(MmapBin):
+    '''
+    lexkey -> offset (int)
+    '''
+    kind = 'lexkey2offset'
+
+    def __init__(self, *args):
+        MmapBin.__init__(self, *args)
+        self.string_starts = self._uint32_section(self.n_keys+1)
+        self.values        = self._uint32_section(self.n_keys)
+        self.pool          = self._pool()
+
+    def identifier(self, index):
+        return bytes(self.pool[self.string_starts[index]:
+                               self.string_starts[index+1]]).decode('utf-8')
+
+    def _index(self, key):
+        '''
+        binary search of the lexkey in the sorted string table
+
+        @rtype: int
+        @return: position of key in the key table, -1 if not present
+        '''
+        try:
+            lexkey = key.encode('utf-8')
+        except AttributeError:
+            #not a lexkey (for example an int)
+            return -1
+        starts,pool = self.string_starts,self.pool
+
+        low,high = 0,self.n_keys
+        while low < high:
+            middle = (low + high) // 2
+            if pool[starts[middle]:starts[middle+1]].tobytes() < lexkey:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_keys and pool[starts[low]:starts[low+1]].tobytes() == lexkey:
+            return low
+        return -1
+
+    def get(self, key, default=None):
+        index = self._index(key)
+        if index == -1:
+            return default
+        return self.values[index]
+
+READERS = {'offset2offset' : Offset2OffsetBin,
+           'offset2lexkey' : Offset2LexkeyBin,
+           'lexkey2offset' : Lexkey2OffsetBin}
+
+def load_mmap_bin(path_bin):
+    '''
+    open a bin in the mmap format.
+    If the bin does not exist, IOError is raised.
+
+    >>> import os, tempfile
+    >>> path_bin = os.path.join(tempfile.mkdtemp(), '21_30')
+    >>> save_mmap({'00020846' : {('00021939','n') : 1.0}},
+    ...           path_bin, 'offset2offset', '21', '30')
+    >>> mapping = load_mmap_bin(path_bin)
+    >>> targets,confidences = mapping.get(20846)
+    >>> (list(targets),list(confidences))
+    ([175513], [1.0])
+    >>> mapping.get_best(20846)
+    175513
+    >>> mapping.get(0) is None
+    True
+    >>> save_mmap({'rock_hopper%1:05:00::' : '02057330'}, path_bin, 'lexkey2offset', '30')
+    >>> lexkeys = load_mmap_bin(path_bin)
+    >>> (lexkeys.get('rock_hopper%1:05:00::'),lexkeys.get(5))
+    (2057330, None)
+
+    @type  path_bin: str
+    @param path_bin: full path to bin (without the .wnb extension)
+
+    @rtype: MmapBin
+    @return: read-only view on the bin
+    '''
+    try:
+        with open(path_bin + EXTENSION,'rb') as infile:
+            mm = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError,OSError,ValueError):
+        raise IOError('''there is no dict available for the combination of the given source and target versions''')
+
+    (magic,format_version,kind_code,byteorder,padding,
+     source_wn_version,target_wn_version,
+     n_keys,n_values,pool_size) = struct.unpack_from(HEADER_FORMAT, mm)
+
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise IOError('%s is not a bin in mmap format version %s' % (path_bin,
+                                                                     FORMAT_VERSION))
+    if byteorder != BYTEORDERS[sys.byteorder]:
+        raise IOError('%s was created on a machine with a different byte order' % path_bin)
+
+    reader = READERS[KIND_NAMES[kind_code]]
+    return reader(mm,
+                  source_wn_version.rstrip(b'\0').decode('ascii'),
+                  target_wn_version.rstrip(b'\0').decode('ascii'),
+                  n_keys,
+                  n_values,
+                  pool_size)
+
+def shared_bins_prefix(bins_dir):
+    '''
+    @rtype: str
+    @return: full path to the shared directories of bins_dir without the
+    fingerprint of the manifest (see shared_bins_dir)
+    '''
+    import hashlib
+    import tempfile
+
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    digest = hashlib.sha1(os.path.realpath(bins_dir).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(base, 'WordNetMapper-%s-%s' % (getattr(os,'getuid',lambda: 0)(),
+                                                       digest))
+
+def shared_bins_dir(bins_dir):
+    '''
+    directory in shared memory (/dev/shm, or the temporary directory if
+    there is no /dev/shm) where load_shared_bin stores the converted bins of
+    bins_dir. The name is unique per user, per bins_dir and per version of
+    the bins: it ends with the fingerprint of the manifest of the bins (see
+    bins_manifest), so bins that are created again get a new directory and
+    the old one can be removed (see prune_shared_bins).
+
+    @type  bins_dir: str
+    @param bins_dir: directory with the pickled bins (paths['dir_bins'])
+
+    @rtype: str
+    @return: full path to directory
+    '''
+    import hashlib
+
+    try:
+        with open(os.path.join(bins_dir,'manifest.json'),'rb') as infile:
+            fingerprint = hashlib.sha1(infile.read()).hexdigest()[:12]
+    except IOError:
+        fingerprint = 'nomanifest'
+    return '%s-%s' % (shared_bins_prefix(bins_dir), fingerprint)
+
+def prune_shared_bins(bins_dir):
+    '''
+    remove the shared directories of bins_dir of other versions of the bins
+    than the current one (see shared_bins_dir). Processes that still map
+    bins of a removed directory keep their mapping.
+
+    @rtype: list
+    @return: the removed directories
+    '''
+    import shutil
+    from glob import glob
+
+    current = shared_bins_dir(bins_dir)
+    removed = []
+    for path in glob(shared_bins_prefix(bins_dir) + '*'):
+        if path != current and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    return removed
+
+def remove_shared_bins(bins_dir):
+    '''
+    remove every shared directory of bins_dir (see shared_bins_dir), for
+    example when the workers that used them are stopped. The files in shared
+    memory are otherwise kept until the next reboot. Processes that still
+    map bins of the directory keep their mapping, but convert the bins again
+    on their next load.
+
+    >>> import tempfile
+    >>> bins_dir = tempfile.mkdtemp()
+    >>> os.makedirs(shared_bins_dir(bins_dir))
+    >>> [os.path.basename(path)[-10:] for path in remove_shared_bins(bins_dir)]
+    ['nomanifest']
+    >>> os.path.exists(shared_bins_dir(bins_dir))
+    False
+
+    @rtype: list
+    @return: the removed directories
+    '''
+    import shutil
+    from glob import glob
+
+    removed = []
+    for path in glob(shared_bins_prefix(bins_dir) + '*'):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    return removed
+
+def load_shared_bin(path_bin, shared_dir=None):
+    '''
+    open the mmap version in shared memory of a pickled bin. The first
+    process that needs the bin converts it (again if the pickled bin is newer
+    than the converted bin), every process then maps the same file.
+    If the pickled bin does not exist, IOError is raised. The process that
+    creates the shared directory of a new version of the bins removes the
+    directories of older versions (see prune_shared_bins).
+
+    >>> import gzip, os, pickle, tempfile
+    >>> bins_dir = tempfile.mkdtemp()
+    >>> os.mkdir(os.path.join(bins_dir, 'offset2offset'))
+    >>> path_bin = os.path.join(bins_dir, 'offset2offset', '21_30')
+    >>> with gzip.open(path_bin + '.gz', 'wb') as outfile:
+    ...     pickle.dump({'00020846' : {('00021939','n') : 1.0}}, outfile)
+    >>> mapping = load_shared_bin(path_bin, shared_dir=tempfile.mkdtemp())
+    >>> mapping.get_best(20846)
+    175513
+
+    @type  path_bin: str
+    @param path_bin: full path to a pickled bin (without the .gz extension),
+    in a directory named after its kind (for example offset2offset/21_30, or
+    offset2offset/21_30/n for a partition)
+
+    @type  shared_dir: str | None
+    @param shared_dir: directory for the converted bins (default:
+    shared_bins_dir)
+
+    @rtype: MmapBin
+    @return: read-only view on the bin
+    '''
+    from bin_cache import read_pickle_bin
+
+    kind_dir,name = os.path.split(path_bin)
+    versions      = name
+    if os.path.basename(kind_dir) not in KINDS:
+        #partition of a bin (for example offset2offset/21_30/n)
+        kind_dir,versions = os.path.split(kind_dir)
+        name              = os.path.join(versions, name)
+    kind          = os.path.basename(kind_dir)
+    if shared_dir is None:
+        bins_dir   = os.path.dirname(kind_dir)
+        shared_dir = shared_bins_dir(bins_dir)
+        if not os.path.isdir(shared_dir):
+            prune_shared_bins(bins_dir)
+    shared_path   = os.path.join(shared_dir, kind, name)
+
+    try:
+        stale = (os.stat(shared_path + EXTENSION).st_mtime <
+                 os.stat(path_bin + '.gz').st_mtime)
+    except OSError:
+        stale = True
+
+    if stale:
+        mapping = read_pickle_bin(path_bin)
+        if not os.path.isdir(os.path.dirname(shared_path)):
+            try:
+                os.makedirs(os.path.dirname(shared_path))
+            except OSError:
+                #created by another process in the meantime
+                pass
+        save_mmap(mapping, shared_path, kind, *versions.split('_'))
+
+    return load_mmap_bin(shared_path)
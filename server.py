@@ -0,0 +1,324 @@
+'''
+HTTP server (standard library only) that keeps the bins of one WordNetMapper
+resident and maps batches of identifiers for other processes.
+
+usage:
+    python server.py [--host 127.0.0.1] [--port 8080] [--preload 21_30 ...]
+                     [--bin-format pickle|mmap|shared] [--max-bins N]
+
+endpoints:
+    - GET  /health          loaded bins and statistics of the mapper
+    - GET  /ready           200 once the bins of --preload are loaded, 503 before
+    - POST /map/<method>    map a batch with any map_* method of WordNetMapper
+
+the body of /map/<method> is a JSON object with the arguments shared by all
+items and the items, which are either the first argument of the method or
+objects with the arguments that differ per item:
+
+    POST /map/map_offset_to_offset
+    {"source_wn_version" : "21", "target_wn_version" : "30",
+     "items" : ["00020846", "99999999"]}
+    -> {"results" : [["00021939", "n"], null]}
+
+items that can not be mapped get null. With the Content-Type
+application/x-ndjson, the body has one item per line, the shared arguments
+are given in the query string (/map/map_offset_to_offset?source_wn_version=21
+&target_wn_version=30) and the response is streamed with one result per
+line. Batch methods (map_offsets_to_offsets, ...) take their lists as
+shared arguments and return their output as results.
+'''
+#import built-in modules
+import sys
+import json
+import argparse
+
+if sys.version_info.major == 2:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qsl
+else:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qsl
+
+#import installed or created modules
+from config import paths
+from wordnet_mapper import WordNetMapper
+
+#single method -> (batch method,single argument -> batch argument). Batches
+#of these methods are mapped with one call of the batch method.
+BATCH_METHODS = {
+    'map_offset_to_offset' : ('map_offsets_to_offsets',{'offset' : 'offsets'}),
+    'map_offset_to_ilidef' : ('map_offsets_to_ilidefs',{'offset' : 'offsets'}),
+    'map_offset_to_lexkey' : ('map_offsets_to_lexkeys',{'offset' : 'offsets',
+                                                        'lemma'  : 'lemmas'}),
+    'map_lexkey_to_offset' : ('map_lexkeys_to_offsets',{'lexkey' : 'lexkeys'}),
+    'map_lexkey_to_ilidef' : ('map_lexkeys_to_ilidefs',{'lexkey' : 'lexkeys'}),
+    'map_lexkey_to_lexkey' : ('map_lexkeys_to_lexkeys',{'lexkey' : 'lexkeys'}),
+}
+
+#first argument of the single methods
+ITEM_ARGUMENTS = {
+    'map_offset_to_offset' : 'offset',
+    'map_offset_from_offset' : 'offset',
+    'map_offset_to_ilidef' : 'offset',
+    'map_offset_to_lexkey' : 'offset',
+    'map_lexkey_to_offset' : 'lexkey',
+    'map_lexkey_to_ilidef' : 'lexkey',
+    'map_lexkey_to_lexkey' : 'lexkey',
+    'map_ilidef_to_offset' : 'ili',
+    'map_ilidef_to_lexkey' : 'ilidef',
+    'map_ilidef_to_ilidef' : 'ili',
+}
+
+#number of lines of an ndjson body that are mapped at once
+NDJSON_CHUNK = 1000
+
+#exceptions of invalid JSON, arguments or wordnet versions: status 400 for a
+#request, null for an item that is mapped on its own
+REQUEST_ERRORS = (ValueError,TypeError,KeyError,IOError)
+
+#exceptions of a malformed item (for example a number instead of a lexkey):
+#null for the item
+ITEM_ERRORS = REQUEST_ERRORS + (AttributeError,)
+
+def to_json(result):
+    '''
+    convert the output of a map_* method to JSON types: dicts of
+    output_format 'all' become lists of [target,confidence]
+
+    >>> to_json({('00021939','n') : 1.0})
+    [[['00021939', 'n'], 1.0]]
+
+    @rtype: object
+    @return: result with lists instead of tuples and dicts
+    '''
+    if isinstance(result,dict):
+        return sorted([to_json(target),confidence] for target,confidence in result.items())
+    if isinstance(result,(tuple,list)):
+        return [to_json(value) for value in result]
+    return result
+
+def map_items(mapper, method, shared, items):
+    '''
+    map items with a single map_* method, with one call of its batch method
+    if possible (see BATCH_METHODS)
+
+    >>> my_mapper = WordNetMapper()
+    >>> map_items(my_mapper, 'map_offset_to_offset', {'source_wn_version' : '21', 'target_wn_version' : '30'},
+    ...           ['00020846','99999999'])
+    [['00021939', 'n'], None]
+
+    items that are mapped on their own get None for the exceptions of
+    invalid arguments (see REQUEST_ERRORS), for example an unknown version
+
+    >>> map_items(my_mapper, 'map_offset_to_offset', {'source_wn_version' : '21'},
+    ...           [{'offset' : '00020846', 'target_wn_version' : '30'},
+    ...            {'offset' : '00020846', 'target_wn_version' : '99'}])
+    [['00021939', 'n'], None]
+
+    a malformed item gets None as well, without failing the other items (if
+    the batch method fails, the items are mapped on their own)
+
+    >>> map_items(my_mapper, 'map_lexkey_to_lexkey', {'source_wn_version' : '21'},
+    ...           [{'lexkey' : 'rock_hopper%1:05:00::', 'target_wn_version' : '30'}, 5])
+    ['rock_hopper%1:05:00::', None]
+    >>> map_items(my_mapper, 'map_offset_to_offset', {'source_wn_version' : '21', 'target_wn_version' : '30'},
+    ...           ['00020846',['00020846']])
+    [['00021939', 'n'], None]
+
+    @type  shared: dict
+    @param shared: arguments shared by all items
+
+    @type  items: list
+    @param items: first argument of the method or dict of arguments per item
+
+    @rtype: list
+    @return: JSON output per item, None if the item can not be mapped
+    '''
+    item_argument = ITEM_ARGUMENTS[method]
+    items = [item if isinstance(item,dict) else {item_argument : item}
+             for item in items]
+
+    batch = BATCH_METHODS.get(method)
+    if batch is not None and shared.get('output_format','highest') == 'highest':
+        batch_method,batch_arguments = batch
+        if all(set(item) <= set(batch_arguments) for item in items):
+            arguments = dict(shared)
+            for argument,batch_argument in batch_arguments.items():
+                arguments[batch_argument] = [item.get(argument,'') for item in items]
+            try:
+                return to_json(getattr(mapper,batch_method)(**arguments))
+            except ITEM_ERRORS:
+                pass
+
+    function = getattr(mapper,method)
+    results  = []
+    for item in items:
+        arguments = dict(shared)
+        arguments.update(item)
+        try:
+            results.append(to_json(function(**arguments)))
+        except ITEM_ERRORS:
+            results.append(None)
+    return results
+
+class MappingServer(ThreadingMixIn, HTTPServer):
+    '''
+    threaded HTTP server with one WordNetMapper, which is shared by the
+    threads of the requests (see WordNetMapper)
+    '''
+    daemon_threads = True
+
+    def __init__(self, address, mapper):
+        HTTPServer.__init__(self, address, MappingHandler)
+        self.mapper = mapper
+
+class MappingHandler(BaseHTTPRequestHandler):
+    '''
+    handler of the requests of MappingServer
+    '''
+    def log_message(self, format, *args):
+        #no line per request on stderr
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type','application/json')
+        self.send_header('Content-Length',str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        mapper = self.server.mapper
+        path   = urlparse(self.path).path
+        if path == '/health':
+            bins_dir = paths['dir_bins']
+            self.send_json(200, {'status'    : 'ok',
+                                 'ready'     : mapper.ready,
+                                 'bins'      : [path_bin[len(bins_dir):].lstrip('/')
+                                                for path_bin in mapper.bin_cache.paths()],
+                                 'bin_cache' : mapper.bin_cache.info()})
+        elif path == '/ready':
+            self.send_json(200 if mapper.ready else 503, {'ready' : mapper.ready})
+        else:
+            self.send_json(404, {'error' : 'unknown path %s' % path})
+
+    def do_POST(self):
+        url    = urlparse(self.path)
+        method = url.path[len('/map/'):] if url.path.startswith('/map/') else None
+        if (method is None or not method.startswith('map_') or
+            not hasattr(WordNetMapper,method)):
+            self.send_json(404, {'error' : 'unknown method %s' % url.path})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            if self.headers.get('Content-Type','').startswith('application/x-ndjson'):
+                self.map_ndjson(method, dict(parse_qsl(url.query)), length)
+            else:
+                body = json.loads(self.rfile.read(length).decode('utf-8'))
+                self.send_json(200, {'results' : self.map_body(method, body)})
+        except REQUEST_ERRORS as error:
+            #invalid JSON, arguments or wordnet versions
+            self.send_json(400, {'error' : '%s: %s' % (type(error).__name__,error)})
+
+    def map_body(self, method, body):
+        '''
+        @rtype: list
+        @return: results of the request
+        '''
+        mapper = self.server.mapper
+        shared = dict(body)
+        items  = shared.pop('items',None)
+        if method in ITEM_ARGUMENTS:
+            return map_items(mapper, method, shared, items or [])
+        #batch method
+        return to_json(getattr(mapper,method)(**shared))
+
+    def map_ndjson(self, method, shared, length):
+        '''
+        map an ndjson body in chunks of NDJSON_CHUNK lines and stream the
+        results, one line per item
+        '''
+        if method not in ITEM_ARGUMENTS:
+            raise ValueError('ndjson bodies are only supported by single methods')
+
+        mapper = self.server.mapper
+        chunks = self.read_ndjson(length)
+        #the first chunk is mapped before the response starts, so that
+        #invalid arguments still get status 400
+        first  = next(chunks,[])
+        results = map_items(mapper, method, shared, first)
+
+        self.send_response(200)
+        self.send_header('Content-Type','application/x-ndjson')
+        self.send_header('Connection','close')
+        self.end_headers()
+        self.close_connection = True
+        while True:
+            self.wfile.write(''.join(json.dumps(result) + '\n'
+                                     for result in results).encode('utf-8'))
+            try:
+                chunk = next(chunks,None)
+                if chunk is None:
+                    break
+                results = map_items(mapper, method, shared, chunk)
+            except REQUEST_ERRORS as error:
+                #the status is already sent: the error ends the stream
+                self.wfile.write((json.dumps({'error' : '%s: %s' % (type(error).__name__,error)}) +
+                                  '\n').encode('utf-8'))
+                break
+
+    def read_ndjson(self, length):
+        '''
+        generator of lists of at most NDJSON_CHUNK items of an ndjson body
+        of length bytes
+        '''
+        chunk = []
+        while length > 0:
+            line    = self.rfile.readline(length)
+            if not line:
+                break
+            length -= len(line)
+            line    = line.strip()
+            if line:
+                chunk.append(json.loads(line.decode('utf-8')))
+            if len(chunk) >= NDJSON_CHUNK:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def main(arguments=None):
+    '''
+    start the server
+    '''
+    parser = argparse.ArgumentParser(description='HTTP server of a WordNetMapper')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8080)
+    parser.add_argument('--preload',nargs='*',default=[],
+                        help='pairs of wordnet versions of which the bins are '
+                             'loaded at start (for example 21_30)')
+    parser.add_argument('--bin-format',choices=['pickle','mmap','shared'],default='pickle')
+    parser.add_argument('--max-bins',type=int,default=None,
+                        help='size of the bin cache (default: no limit)')
+    args = parser.parse_args(arguments)
+
+    mapper = WordNetMapper(max_bins=args.max_bins, bin_format=args.bin_format)
+    if args.preload:
+        mapper.preload(pairs=[tuple(pair.split('_')) for pair in args.preload],
+                       background=True)
+
+    server = MappingServer((args.host,args.port), mapper)
+    sys.stderr.write('serving on http://%s:%s\n' % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -4,3 +4,27 @@ python2.7 -m doctest wordnet_mapper.py
 
 #unit test 3.4
 python3.4 -m doctest wordnet_mapper.py -v
+
+#unit test bin cache
+python3.4 -m doctest bin_cache.py -v
+
+#unit test mmap bins
+python3.4 -m doctest mmap_bins.py -v
+
+#unit test utils
+python3.4 -m doctest wn_mapper_utils.py -v
+
+#unit test mapping tables
+python3.4 -m doctest mapping_tables.py -v
+
+#unit test asyncio front end
+python3.7 -m doctest async_mapper.py -v
+
+#unit test command line
+python3.4 -m doctest cli.py -v
+
+#unit test metrics
+python3.4 -m doctest metrics.py -v
+
+#unit test HTTP server
+python3.4 -m doctest server.py -v
@@ -1,3 +1,4 @@
+import numbers
 import operator
 
 def pos_lexkey(lexkey):
@@ -20,9 +21,217 @@ def pos_lexkey(lexkey):
     
     return pos
     
+#part of speech <-> code used in packed offsets
+POS_CODES = {''  : 0,
+             'n' : 1,
+             'v' : 2,
+             'a' : 3,
+             'r' : 4,
+             's' : 5}
+POS_NAMES = ('','n','v','a','r','s')
+
+def parse_offset(offset):
+    '''
+    convert an 8 character offset to an int. int offsets (for example of a
+    NumPy array of ints) are returned as they are.
+    
+    >>> parse_offset('00021939')
+    21939
+    >>> parse_offset(21939)
+    21939
+    >>> parse_offset('21939') is None
+    True
+    >>> parse_offset(None) is None
+    True
+    
+    @type  offset: str | int
+    @param offset: 8 character offset with trailing zeros (for example
+    00021939) or int offset
+    
+    @rtype: int | None
+    @return: the offset as int, None if offset is not a valid offset
+    '''
+    if isinstance(offset,numbers.Integral) and not isinstance(offset,bool):
+        return int(offset) if offset >= 0 else None
+    try:
+        if len(offset) != 8:
+            return None
+        return int(offset)
+    except (TypeError,ValueError):
+        return None
+
+def format_offset(offset):
+    '''
+    convert an int offset to an 8 character offset with trailing zeros
+    
+    >>> format_offset(21939)
+    '00021939'
+    '''
+    return '%08d' % offset
+
+def pack_offset(offset, pos):
+    '''
+    pack (offset,pos) into one int (offset * 8 + code of pos)
+    
+    >>> pack_offset('00021939','n')
+    175513
+    
+    @type  offset: str | int
+    @param offset: 8 character offset or int offset
+    
+    @type  pos: str
+    @param pos: n | v | a | r | s
+    
+    @rtype: int
+    @return: packed offset
+    '''
+    return int(offset) << 3 | POS_CODES[pos]
+
+def unpack_offset(packed):
+    '''
+    unpack an int created by pack_offset to (offset,pos)
+    
+    >>> unpack_offset(175513)
+    ('00021939', 'n')
+    
+    @type  packed: int
+    @param packed: packed offset
+    
+    @rtype: tuple
+    @return: (offset,pos)
+    '''
+    return '%08d' % (packed >> 3), POS_NAMES[packed & 7]
+
+#part of speech -> offset2offset partition (the UPC mappings store adjective
+#satellites with the adjectives)
+POS_PARTITIONS = {'n' : 'n',
+                  'v' : 'v',
+                  'a' : 'a',
+                  's' : 'a',
+                  'r' : 'r'}
+
+def partition_pos(pos):
+    '''
+    the offset2offset partition of a part of speech
+
+    >>> partition_pos('s')
+    'a'
+
+    @type  pos: str
+    @param pos: n | v | a | r | s
+
+    @rtype: str
+    @return: n | v | a | r, ValueError is raised for other pos
+    '''
+    try:
+        return POS_PARTITIONS[pos]
+    except KeyError:
+        raise ValueError("pos should be n, v, a, r or s, not %s" % pos)
+
+def partition_codes(pos):
+    '''
+    the codes (see POS_CODES) of the packed offsets in the partition of pos
+
+    >>> sorted(partition_codes('a'))
+    [3, 5]
+
+    @rtype: frozenset
+    @return: codes of the packed offsets
+    '''
+    partition = partition_pos(pos)
+    return frozenset(POS_CODES[name] for name,other in POS_PARTITIONS.items()
+                     if other == partition)
+
+def targets_to_dict(targets, confidences):
+    '''
+    convert packed target offsets and their confidences to the dict that is
+    returned by the public methods
+    
+    >>> targets_to_dict([175513], [1.0])
+    {('00021939', 'n'): 1.0}
+    
+    @type  targets: sequence
+    @param targets: packed target offsets (see pack_offset)
+    
+    @type  confidences: sequence
+    @param confidences: confidence (float) per target
+    
+    @rtype: dict
+    @return: mapping (offset,pos) -> confidence (float)
+    '''
+    return dict((unpack_offset(target),confidence)
+                for target,confidence in zip(targets,confidences))
+
+def best_index(confidences):
+    '''
+    index of the highest confidence. On ties the first target wins, which is
+    the target that the stable sort of format_output used to return.
+    
+    >>> best_index([0.333, 0.667, 0.667])
+    1
+    
+    @type  confidences: sequence
+    @param confidences: confidence (float) per target
+    
+    @rtype: int
+    @return: index of the target with the highest confidence
+    '''
+    best = 0
+    for index in range(1,len(confidences)):
+        if confidences[index] > confidences[best]:
+            best = index
+    return best
+
+def version_path(source_wn_version, target_wn_version, pairs):
+    '''
+    cheapest path from source_wn_version to target_wn_version over the
+    available offset2offset bins, i.e. the path with the fewest bins.
+    Among paths of the same length, the one that comes first in the order
+    of pairs is returned.
+    
+    >>> version_path('16','21',[('16','30'),('30','21'),('16','20'),('20','21')])
+    ['16', '30', '21']
+    >>> version_path('16','21',[('16','21'),('16','30'),('30','21')])
+    ['16', '21']
+    >>> version_path('21','16',[('16','21')]) is None
+    True
+    
+    @type  pairs: list
+    @param pairs: list of (source_wn_version,target_wn_version) of which an
+    offset2offset bin is available
+    
+    @rtype: list | None
+    @return: list of wordnet versions from source_wn_version to
+    target_wn_version, None if there is no path
+    '''
+    neighbours = {}
+    for source,target in pairs:
+        neighbours.setdefault(source,[]).append(target)
+    
+    #breadth first search
+    previous = {source_wn_version : None}
+    queue    = [source_wn_version]
+    for version in queue:
+        if version == target_wn_version:
+            path = []
+            while version is not None:
+                path.append(version)
+                version = previous[version]
+            return path[::-1]
+        for neighbour in neighbours.get(version,[]):
+            if neighbour not in previous:
+                previous[neighbour] = version
+                queue.append(neighbour)
+    
+    return None
+
 def format_output(d):
     '''
-    offset with highest confidence is returned. 
+    offset with highest confidence is returned (on ties, the first offset
+    in d). 
+    
+    >>> format_output({('00044164','n') : 0.5, ('01849351','n') : 0.5})
+    ('00044164', 'n')
     
     @type  d: dict
     @param d: mapping (offset,pos) -> confidence (float)
@@ -30,18 +239,115 @@ def format_output(d):
     @rtype: str
     @return: offset with highest confidence
     '''
-    (offset,pos),confidence = sorted(d.items(),
-                                     key=operator.itemgetter(1),
-                                     reverse=True)[0]
+    (offset,pos),confidence = max(d.items(),
+                                  key=operator.itemgetter(1))
     
     return offset,pos
 
-def levenshtein(s, t):
+def lexkey_lemmas(list_lexkeys):
+    '''
+    lemma part of every lexkey, in the same order
+    
+    >>> lexkey_lemmas(['gambling_den%1:06:00::','gambling_hell%1:06:00::'])
+    ('gambling_den', 'gambling_hell')
+    
+    @type  list_lexkeys: list
+    @param list_lexkeys: lexkeys
+    
+    @rtype: tuple
+    @return: tuple of lemmas
+    '''
+    return tuple(lexkey.split("%",1)[0] for lexkey in list_lexkeys)
+
+def select_lexkey(list_lexkeys, lemma, lemmas=None):
+    '''
+    pick the lexkey of lemma from the possible lexkeys of an offset:
+    (1) check if only one sensekey
+    (2) check for direct lemma match in possible sensekeys
+    (3) pick lexkey with lowest Levenshtein distance to lemma (the first
+    one in case of a tie)
+    
+    >>> select_lexkey(['gambling_den%1:06:00::','gambling_hell%1:06:00::'],'gambling hell')
+    'gambling_hell%1:06:00::'
+    >>> select_lexkey(['gambling_den%1:06:00::','gambling_hell%1:06:00::'],'gambling_hell')
+    'gambling_hell%1:06:00::'
+    
+    @type  list_lexkeys: list
+    @param list_lexkeys: possible lexkeys of an offset
+    
+    @type  lemma: str
+    @param lemma: the lemma corresponding to the offset
+    
+    @type  lemmas: tuple | None
+    @param lemmas: lexkey_lemmas(list_lexkeys) if it was computed beforehand
+    (see mapping_tables.Offset2LexkeyTable)
+    
+    @rtype: str | None
+    @return: lexkey, None if list_lexkeys is empty
+    '''
+    #check if only one lexkeys (a direct match would return it as well)
+    if len(list_lexkeys) == 1:
+        return list_lexkeys[0]
+    elif not list_lexkeys:
+        return None
+    
+    #check for direct match in possible lexkeys
+    if lemmas is None:
+        lemmas = lexkey_lemmas(list_lexkeys)
+    if lemma in lemmas:
+        return list_lexkeys[lemmas.index(lemma)]
+    
+    #Levenshtein: a candidate only has to be computed up to the lowest
+    #distance so far, since only a lower distance replaces the best lexkey
+    min_levenshtein = 1000
+    best_lexkey     = ""
+    for candidate_lemma,lexkey in zip(lemmas,list_lexkeys):
+        distance = levenshtein(candidate_lemma,lemma,min_levenshtein)
+        if distance < min_levenshtein:
+            min_levenshtein = distance
+            best_lexkey     = lexkey
+            if distance <= 1:
+                break
+
+    return best_lexkey
+
+def lexkey_strategy(list_lexkeys, lemma, lemmas=None):
+    '''
+    the step of select_lexkey that selects the lexkey
+
+    >>> lexkey_strategy(['gambling_den%1:06:00::','gambling_hell%1:06:00::'],'gambling hell')
+    'levenshtein'
+
+    @rtype: str
+    @return: none | single | exact | levenshtein
+    '''
+    if len(list_lexkeys) == 1:
+        return 'single'
+    elif not list_lexkeys:
+        return 'none'
+
+    if lemmas is None:
+        lemmas = lexkey_lemmas(list_lexkeys)
+    if lemma in lemmas:
+        return 'exact'
+    return 'levenshtein'
+
+def levenshtein(s, t, cutoff=None):
     ''' 
-    source: https://en.wikibooks.org/wiki/Algorithm_Implementation/Strings/Levenshtein_distance#Python
+    Levenshtein distance, computed with the bit-parallel algorithm of
+    Myers (1999) as formulated by Hyyro (2001): one column of the dynamic
+    programming matrix is updated with a few integer operations per
+    character of t.
+    
+    if cutoff is given, the computation stops as soon as the distance is
+    known to be cutoff or more, in which case cutoff is returned.
     
     >>> levenshtein('house', 'home')
     2
+    >>> levenshtein('gambling_hell', 'gambling hell')
+    1
+    >>> levenshtein('moustache', 'gambling hell', 3)
+    3
     
     @type  s: str
     @param s: a string (for example 'house')
@@ -49,30 +355,51 @@ def levenshtein(s, t):
     @type  t: str
     @param t: a string (for example ('home')
     
+    @type  cutoff: int | None
+    @param cutoff: distance from which the exact distance is not needed
+    
     @rtype: int
-    @param: levenshtein distance
+    @param: levenshtein distance (cutoff if the distance is cutoff or more)
     '''
-    
     if s == t: 
         return 0
     
-    elif len(s) == 0: 
-        return len(t)
-    elif len(t) == 0: 
-        return len(s)
+    len_s,len_t = len(s),len(t)
+    if cutoff is not None and abs(len_s - len_t) >= cutoff:
+        return cutoff
+    elif len_s == 0: 
+        return len_t
+    elif len_t == 0: 
+        return len_s
     
-    v0 = [None] * (len(t) + 1)
-    v1 = [None] * (len(t) + 1)
+    #bit i of peq[character] is set if s[i] == character
+    peq = {}
+    for i,character in enumerate(s):
+        peq[character] = peq.get(character,0) | (1 << i)
     
-    for i in range(len(v0)):
-        v0[i] = i
+    mask  = (1 << len_s) - 1
+    last  = 1 << (len_s - 1)
+    pv,mv = mask,0
+    score = len_s
     
-    for i in range(len(s)):
-        v1[0] = i + 1
-        for j in range(len(t)):
-            cost = 0 if s[i] == t[j] else 1
-            v1[j + 1] = min(v1[j] + 1, v0[j + 1] + 1, v0[j] + cost)
-        for j in range(len(v0)):
-            v0[j] = v1[j]
+    for j,character in enumerate(t):
+        eq = peq.get(character,0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        
+        #every remaining character of t lowers the distance by one at most
+        if cutoff is not None and score - (len_t - j - 1) >= cutoff:
+            return cutoff
+        
+        ph = (ph << 1) | 1
+        mh = mh << 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
  
-    return v1[len(t)]
\ No newline at end of file
+    return score
@@ -1,17 +1,11 @@
 #import built-in
 import os 
-import subprocess
-import gzip 
-
-#import pickle (use cPickle for python2)
-import sys
-if sys.version_info.major == 2:
-    import cPickle as pickle
-else:
-    import pickle
+import time
+import threading
     
 #import installed or created modules
 from config import paths
+from bin_cache import BinCache, ResultCache, load_pickle_bin, estimate_size
 
 import wn_mapper_utils as utils 
 
@@ -26,9 +20,42 @@ class WordNetMapper():
     two wordnet versions, the mapping will stay in memory. Hence, when the
     same method is called for the same wordnet versions, the process will be
     very quick.
+    
+    One mapper can be shared between threads: every bin is loaded once, also
+    if several threads request it at the same time, and loaded bins are read
+    without locking (see bin_cache.BinCache).
     '''
-    def __init__(self):
-        
+    def __init__(self, max_bins=8, max_bytes=None, bin_format='pickle', max_results=0,
+                       metrics=None):
+        '''
+        @type  max_bins: int | None
+        @param max_bins: maximum number of bins kept in memory (None for no
+        limit). The least recently used bin is evicted first.
+        
+        @type  max_bytes: int | None
+        @param max_bytes: maximum estimated size in bytes of the bins kept in
+        memory (None for no limit)
+        
+        @type  bin_format: str
+        @param bin_format: 'pickle' (gzipped pickles) | 'mmap' (see mmap_bins,
+        the bins have to be created first with: python create_bins.py mmap) |
+        'shared' (the pickled bins are converted to the mmap format in shared
+        memory on first use and shared by all processes, see
+        mmap_bins.load_shared_bin)
+        
+        @type  max_results: int
+        @param max_results: maximum number of results of the composite methods
+        (map_lexkey_to_lexkey, map_lexkey_to_ilidef and map_ilidef_to_ilidef)
+        kept in memory, 0 to not cache results (see bin_cache.ResultCache).
+        Cached results are returned as they are stored, dicts can therefore
+        not be changed (see bin_cache.FrozenDict).
+        
+        @type  metrics: metrics.Metrics | bool | None
+        @param metrics: record counters and latency histograms of the calls
+        (see metrics and stats). True creates a metrics.Metrics, which can
+        be shared by mappers. Without metrics, the methods are not
+        instrumented.
+        '''
         self.current_path_bin      = ""
         self.mapping_offset_to_offset   = {}
         self.mapping_offset_to_lexkey   = {}
@@ -36,33 +63,372 @@ class WordNetMapper():
         self.in_memory = {'mapping_offset_to_offset' : '',
                           'mapping_offset_to_lexkey' : '',
                           'mapping_lexkey_to_offset' : ''}
+        self.lock      = threading.Lock()
+        self.bin_cache = BinCache(max_bins=max_bins, max_bytes=max_bytes)
+        self.result_cache = ResultCache(max_results=max_results, 
+                                        bin_cache=self.bin_cache)
+        
+        if bin_format == 'pickle':
+            self.load_bin      = load_pickle_bin
+            self.bin_extension = '.gz'
+        elif bin_format == 'mmap':
+            from mmap_bins import load_mmap_bin, EXTENSION
+            self.load_bin      = load_mmap_bin
+            self.bin_extension = EXTENSION
+        elif bin_format == 'shared':
+            from mmap_bins import load_shared_bin
+            self.load_bin      = load_shared_bin
+            self.bin_extension = '.gz'
+        else:
+            raise ValueError("bin_format should be 'pickle', 'mmap' or 'shared', not %s" % bin_format)
+        self.bin_format = bin_format
+        self.plans      = {}
+        self.offset2offset_bins = {}
+        
+        #readiness of the bins requested with preload
+        self.ready          = True
+        self.preload_report = []
+        self.preload_thread = None
+        
+        #instrumentation
+        if metrics is True:
+            from metrics import Metrics
+            metrics = Metrics()
+        self.metrics = metrics or None
+        if self.metrics is not None:
+            from metrics import instrument
+            instrument(self, self.metrics)
+    
+    def stats(self):
+        '''
+        statistics of the bin cache, the result cache and, if the mapper was
+        created with metrics, of the calls (see metrics.Metrics.stats)
+        
+        >>> my_mapper = WordNetMapper(metrics=True)
+        >>> my_mapper.map_offset_to_offset("00020846", "21", "30")
+        ('00021939', 'n')
+        >>> stats = my_mapper.stats()
+        >>> [(counter['labels']['method'],counter['labels']['outcome'],counter['value'])
+        ...  for counter in stats['metrics']['counters']
+        ...  if counter['name'] == 'wordnet_mapper_calls_total']
+        [('map_offset_to_offset', 'ok', 1)]
+        
+        @rtype: dict
+        @return: 'bin_cache', 'result_cache' and 'metrics' (None without
+        metrics)
+        '''
+        return {'bin_cache'    : self.bin_cache.info(),
+                'result_cache' : self.result_cache.info(),
+                'metrics'      : self.metrics.stats() if self.metrics is not None else None}
         
     def load_bin_if_needed(self,
                            new_path_bin,
                            attribute):
         '''
-        method checks if the new_path_bin is different from currently in memory.
-        if so new_path_bin is loaded into memory, else nothing is done.
+        method returns the bin stored at new_path_bin. bins are kept in an
+        LRU cache (see bin_cache.BinCache), so switching between wordnet
+        versions only loads a bin from disk the first time it is requested
+        (or after it has been evicted).
         If the combination of source and target wordnet is not available, 
         IOError is raised.
         
+        >>> my_mapper = WordNetMapper()
+        >>> for source_wn_version in ["21","20","21","20"]:
+        ...     output = my_mapper.map_lexkey_to_offset('rock_hopper%1:05:00::', source_wn_version)
+        >>> (my_mapper.bin_cache.hits,my_mapper.bin_cache.misses)
+        (2, 2)
+        
         @type  new_path_bin: str
         @param new_path_bin: full path to new path of the bin which might be
         loaded.
         
         @type  attribute: str
         @param attribute: mapping_offset_to_offset | mapping_offset_to_lexkey | mapping_lexkey_to_offset
+        
+        @rtype: dict
+        @return: the loaded bin
         ''' 
+        mapping = self.bin_cache.get(new_path_bin, self.load_bin)
+        
         if new_path_bin != self.in_memory[attribute]:
+            with self.lock:
+                self.in_memory[attribute] = new_path_bin
+                setattr(self, attribute, mapping)
+        
+        return mapping
+
+    def preload(self, pairs=None, 
+                      kinds=('offset2offset','offset2lexkey','lexkey2offset'),
+                      background=False):
+        '''
+        load bins up front (with load_bin_if_needed), so that the first
+        queries do not have to wait for them. ready is False until all bins
+        are loaded. The bin cache should be large enough to hold all
+        requested bins (see max_bins and max_bytes), otherwise the first bins
+        are evicted again.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> report = my_mapper.preload(pairs=[('21','30')])
+        >>> [entry['bin'] for entry in report]
+        ['offset2offset/21_30', 'offset2lexkey/21', 'offset2lexkey/30', 'lexkey2offset/21', 'lexkey2offset/30']
+        >>> my_mapper.ready
+        True
+        
+        @type  pairs: list | None
+        @param pairs: list of (source_wn_version,target_wn_version) (default:
+        all pairs of paths['wn_versions'])
+        
+        @type  kinds: tuple
+        @param kinds: offset2offset (bins of the pairs and their partitions
+        per pos if they exist) | offset2lexkey |
+        lexkey2offset (bins of the wordnet versions of the pairs)
+        
+        @type  background: bool
+        @param background: if True, the bins are loaded in a background
+        thread and the method returns immediately (see wait_ready)
+        
+        @rtype: list
+        @return: report (also stored as preload_report): a dict per bin with
+        'bin', 'seconds' (time needed to load it), 'bytes' (estimated size in
+        memory) and 'error' (message of the IOError, None if loaded). In the
+        background the report is filled while the bins are loaded.
+        '''
+        if pairs is None:
+            pairs = [(source_wn_version,target_wn_version)
+                     for source_wn_version in paths['wn_versions']
+                     for target_wn_version in paths['wn_versions']]
+        
+        versions = []
+        for pair in pairs:
+            for version in pair:
+                if version not in versions:
+                    versions.append(version)
+        
+        #(name in report,path,attribute)
+        bins = []
+        for kind in kinds:
+            if kind == 'offset2offset':
+                names = ["%s_%s" % pair for pair in pairs]
+            elif kind in ('offset2lexkey','lexkey2offset'):
+                names = versions
+            else:
+                raise ValueError('unknown kind of bin: %s' % kind)
+            
+            attribute = {'offset2offset' : 'mapping_offset_to_offset',
+                         'offset2lexkey' : 'mapping_offset_to_lexkey',
+                         'lexkey2offset' : 'mapping_lexkey_to_offset'}[kind]
+            for name in names:
+                bins.append(('%s/%s' % (kind,name),
+                             os.path.join(paths['dir_%s_bins' % kind],name),
+                             attribute))
+                
+                #the partitions per pos that the methods with pos use instead
+                #(see offset_to_offset_bins)
+                if kind == 'offset2offset':
+                    for partition in ('n','v','a','r'):
+                        path_bin = os.path.join(paths['dir_offset2offset_bins'],name,partition)
+                        if os.path.exists(path_bin + self.bin_extension):
+                            bins.append(('%s/%s/%s' % (kind,name,partition),
+                                         path_bin,
+                                         attribute))
+        
+        self.ready          = False
+        self.preload_report = []
+        if background:
+            self.preload_thread = threading.Thread(target=self._preload_bins,
+                                                   args=(bins,))
+            self.preload_thread.daemon = True
+            self.preload_thread.start()
+        else:
+            self._preload_bins(bins)
+        
+        return self.preload_report
+    
+    def _preload_bins(self, bins):
+        '''
+        load bins and report per bin (see preload)
+        '''
+        try:
+            for name,path_bin,attribute in bins:
+                start = time.time()
+                entry = {'bin' : name, 'seconds' : 0.0, 'bytes' : 0, 'error' : None}
+                try:
+                    mapping          = self.load_bin_if_needed(path_bin, attribute)
+                    entry['bytes']   = estimate_size(mapping)
+                except IOError as error:
+                    entry['error']   = str(error)
+                entry['seconds'] = time.time() - start
+                self.preload_report.append(entry)
+        finally:
+            self.ready = True
+    
+    def wait_ready(self, timeout=None):
+        '''
+        wait for a background preload to finish
+        
+        @type  timeout: float | None
+        @param timeout: maximum number of seconds to wait
+        
+        @rtype: bool
+        @return: ready
+        '''
+        if self.preload_thread is not None:
+            self.preload_thread.join(timeout)
+        return self.ready
+    
+    def plan_offset_to_offset(self, source_wn_version, target_wn_version):
+        '''
+        the cheapest path of offset2offset bins from source_wn_version to
+        target_wn_version (see wn_mapper_utils.version_path). If there is a
+        bin for the pair (created from the UPC mappings or composed by
+        create_bins), a mapping is a single lookup in that bin.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> my_mapper.plan_offset_to_offset('16','21')
+        ['16', '21']
+        
+        @type  source_wn_version: str
+        @param source_wn_version: source wn_version (for example '16')
+        
+        @type  target_wn_version: str
+        @param target_wn_version: target wn_version (for example '21')
+        
+        @rtype: list
+        @return: list of wordnet versions from source_wn_version to
+        target_wn_version
+        '''
+        pair = (source_wn_version,target_wn_version)
+        if pair not in self.plans:
+            from glob import glob
             
-            try:
-                mapping = pickle.load( gzip.open(new_path_bin+'.gz',"rb") )
-            except IOError:
-                raise IOError('''there is no dict available for the combination of the given source and target versions''')
+            bins_dir  = paths['dir_offset2offset_bins']
+            available = []
+            for path in sorted(glob(os.path.join(bins_dir,'*' + self.bin_extension))):
+                name = os.path.basename(path)[:-len(self.bin_extension)]
+                available.append(tuple(name.split('_')))
             
-            self.in_memory[attribute] = new_path_bin
-            setattr(self, attribute, mapping)  
-
+            plan = utils.version_path(source_wn_version,
+                                      target_wn_version,
+                                      available)
+            
+            #the bin of a version to itself is always used directly. without
+            #any path, the direct bin is tried (IOError is raised)
+            if plan is None or len(plan) < 2:
+                plan = [source_wn_version,target_wn_version]
+            self.plans[pair] = plan
+        return self.plans[pair]
+    
+    def offset_to_offset_bins(self, source_wn_version, target_wn_version, pos=None):
+        '''
+        the offset2offset bins along the cheapest path from source_wn_version
+        to target_wn_version (see plan_offset_to_offset). With pos, the bin
+        of the partition of pos (for example offset2offset/21_30/n, see
+        create_bins.build_offset2offset) is used if it exists, otherwise the
+        bin of all parts of speech (the targets are not filtered by pos: the
+        pos of the targets in those bins is not reliable).
+        
+        >>> my_mapper = WordNetMapper()
+        >>> [os.path.basename(path_bin) for path_bin in my_mapper.offset_to_offset_bins('21','30')]
+        ['21_30']
+        >>> [os.path.basename(path_bin) for path_bin in my_mapper.offset_to_offset_bins('21','30','n')]
+        ['21_30']
+        
+        @type  pos: str | None
+        @param pos: n | v | a | r | s (None for all parts of speech)
+        
+        @rtype: list
+        @return: list of paths of bins
+        '''
+        key = (source_wn_version,target_wn_version,pos)
+        if key not in self.offset2offset_bins:
+            partition = utils.partition_pos(pos) if pos is not None else None
+            plan      = self.plan_offset_to_offset(source_wn_version,
+                                                   target_wn_version)
+            bins      = []
+            for source,target in zip(plan,plan[1:]):
+                path_bin = os.path.join(paths['dir_offset2offset_bins'],
+                                        "%s_%s" % (source,target))
+                if (partition is not None and
+                    os.path.exists(os.path.join(path_bin,partition) + self.bin_extension)):
+                    path_bin = os.path.join(path_bin,partition)
+                bins.append(path_bin)
+            self.offset2offset_bins[key] = bins
+        return self.offset2offset_bins[key]
+    
+    def load_offset_to_offset(self, source_wn_version, target_wn_version, pos=None):
+        '''
+        load the offset2offset bin from source_wn_version to
+        target_wn_version. If there is no such bin, the bins along the
+        cheapest path (see plan_offset_to_offset) are loaded and chained.
+        With pos, only the partition of pos is loaded if it exists
+        (see offset_to_offset_bins).
+        
+        @rtype: mapping_tables.Offset2OffsetTable | mmap_bins.Offset2OffsetBin | mapping_tables.ChainedOffset2Offset
+        @return: source offset (int) -> (packed target offsets,confidences)
+        '''
+        mappings = [self.load_bin_if_needed(path_bin, 'mapping_offset_to_offset')
+                    for path_bin in self.offset_to_offset_bins(source_wn_version,
+                                                               target_wn_version,
+                                                               pos)]
+        
+        if len(mappings) == 1:
+            return mappings[0]
+        from mapping_tables import ChainedOffset2Offset
+        return ChainedOffset2Offset(mappings)
+    
+    def reverse_offset_to_offset_path(self, source_wn_version, target_wn_version, pos=None):
+        '''
+        the path under which the inverted offset2offset bin from
+        source_wn_version to target_wn_version is kept in the bin cache (in
+        the directory reverse of the offset2offset bins). With pos, the
+        partition of pos is inverted if the mapping is a lookup in the bin of
+        that partition (see offset_to_offset_bins), otherwise the bin of all
+        parts of speech.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> path_bin,bin_pos = my_mapper.reverse_offset_to_offset_path('21','30','n')
+        >>> (os.path.basename(path_bin),bin_pos)
+        ('21_30', None)
+        
+        @rtype: tuple
+        @return: (path of the inverted bin,pos with which the inverted
+        offset2offset bin is loaded or None)
+        '''
+        path_bin = os.path.join(paths['dir_offset2offset_bins'],
+                                'reverse',
+                                "%s_%s" % (source_wn_version,target_wn_version))
+        if pos is not None:
+            bins = self.offset_to_offset_bins(source_wn_version,
+                                              target_wn_version,
+                                              pos)
+            partition = utils.partition_pos(pos)
+            if all(os.path.basename(path) == partition for path in bins):
+                return os.path.join(path_bin,utils.partition_pos(pos)),pos
+        return path_bin,None
+    
+    def load_reverse_offset_to_offset(self, source_wn_version, target_wn_version, pos=None):
+        '''
+        the offset2offset bin from source_wn_version to target_wn_version
+        inverted (see mapping_tables.reverse_offset2offset). The inverted bin
+        is built on first use and kept in the bin cache (see
+        reverse_offset_to_offset_path). With pos, only the partition of pos
+        is inverted if it exists.
+        
+        @rtype: mapping_tables.Offset2OffsetTable
+        @return: packed target offset -> (source offsets,confidences)
+        '''
+        path_bin,bin_pos = self.reverse_offset_to_offset_path(source_wn_version,
+                                                              target_wn_version,
+                                                              pos)
+        
+        def load_reverse(path_bin):
+            from mapping_tables import reverse_offset2offset
+            return reverse_offset2offset(self.load_offset_to_offset(source_wn_version,
+                                                                    target_wn_version,
+                                                                    bin_pos))
+        
+        return self.bin_cache.get(path_bin, load_reverse)
+    
     def map_offset_to_lexkey(self, offset, 
                                    lemma,
                                    source_wn_version):
@@ -98,47 +464,71 @@ class WordNetMapper():
         #load_bin_if_needed
         path_bin = os.path.join(paths['dir_offset2lexkey_bins'],
                                 source_wn_version)
-        self.load_bin_if_needed(path_bin, 
-                                'mapping_offset_to_lexkey')
+        mapping = self.load_bin_if_needed(path_bin, 
+                                          'mapping_offset_to_lexkey')
         
         #map offset to possible lexkeys
-        list_lexkeys = self.mapping_offset_to_lexkey[(offset,source_wn_version)]
-        
-        #check for direct match in possible lexkeys
-        for lexkey in list_lexkeys:
-            if lexkey.startswith("%s%%" % lemma):
-                return lexkey 
-            
-        #check if only one lexkeys
-        if len(list_lexkeys) == 1:
-            return list_lexkeys[0]
-        
-        #Levenshtein
-        elif len(list_lexkeys) >= 2:
-            candidates = [(lexkey.split("%")[0],lexkey) for lexkey in list_lexkeys]
-            min_levenshtein = 1000
-            best_lexkey     = ""
-            for candidate_lemma,lexkey in candidates:
-                levenshtein = utils.levenshtein(candidate_lemma,lemma)
-                if levenshtein < min_levenshtein:
-                    min_levenshtein = levenshtein
-                    best_lexkey     = lexkey
-                
-            return best_lexkey
+        int_offset   = utils.parse_offset(offset)
+        list_lexkeys = mapping.get(int_offset,())
+        
+        #only one lexkey, direct lemma match or Levenshtein
+        if self.metrics is None:
+            lexkey = utils.select_lexkey(list_lexkeys, 
+                                         lemma, 
+                                         mapping.get_lemmas(int_offset))
+        else:
+            lexkey = self.select_lexkey_timed(list_lexkeys,
+                                              lemma,
+                                              mapping.get_lemmas(int_offset),
+                                              source_wn_version)
+        if lexkey is not None:
+            return lexkey
         
         raise ValueError('''no lexkey found for combination of %s %s in wordnet version %s''' % (offset,lemma,source_wn_version))
                         
+    def select_lexkey_timed(self, list_lexkeys, lemma, lemmas, wn_version):
+        '''
+        wn_mapper_utils.select_lexkey, of which the latency is recorded per
+        strategy (see wn_mapper_utils.lexkey_strategy) in the metrics
+        
+        @rtype: str | None
+        @return: lexkey, None if list_lexkeys is empty
+        '''
+        start  = time.time()
+        lexkey = utils.select_lexkey(list_lexkeys, lemma, lemmas)
+        self.metrics.observe('wordnet_mapper_lexkey_selection_seconds',
+                             {'version'  : wn_version,
+                              'strategy' : utils.lexkey_strategy(list_lexkeys, lemma, lemmas)},
+                             time.time() - start)
+        return lexkey
+    
     def map_offset_to_offset(self, 
                              offset, 
                              source_wn_version, 
                              target_wn_version,
-                             output_format='highest'):
+                             output_format='highest',
+                             pos=None):
         '''
         
         >>> my_parser = WordNetMapper()
         >>> my_parser.map_offset_to_offset("00020846", "21", "30")
         ('00021939', 'n')
         
+        unknown offsets raise ValueError and do not grow the loaded bin
+        
+        >>> bin_size = len(my_parser.mapping_offset_to_offset)
+        >>> my_parser.map_offset_to_offset("99999999", "21", "30") # doctest: +IGNORE_EXCEPTION_DETAIL
+        Traceback (most recent call last):
+        ValueError: no mapping available for offset 99999999
+        >>> len(my_parser.mapping_offset_to_offset) == bin_size
+        True
+
+        offsets are only unique per part of speech: with pos, the partition
+        of pos is used if it exists (see offset_to_offset_bins)
+
+        >>> my_parser.map_offset_to_offset("00020846", "21", "30", pos="n")
+        ('00021939', 'n')
+
         method tries to map offset to offset across versions of wordnet
         ValueError is raised if no mapping available.
         
@@ -157,41 +547,135 @@ class WordNetMapper():
         with highest confidence. if 'all', a dict is returned mapping the 
         (offset,pos) -> confidence (float)
         
+        @type  pos: str | None
+        @param pos: part of speech of offset (n | v | a | r | s). Offsets are
+        only unique per part of speech: with pos, only the partition of pos
+        is loaded and no target of another part of speech is returned.
+        
         @rtype: tuple | dict
         @return: if param output_format == 'highest': str is returned of (offset,pos)
         with highest confidence. if param output_format == 'all', a dict is returned mapping the 
         (offset,pos) -> confidence (float). ValueError is raised if no mapping available.
         '''
         #load_bin_if_needed
-        path_bin = os.path.join(paths['dir_offset2offset_bins'],
-                                "%s_%s" % (source_wn_version,
-                                           target_wn_version))
-        self.load_bin_if_needed(path_bin,
-                                'mapping_offset_to_offset')
-        
-        #map offset to offset
-        target_offsets = self.mapping_offset_to_offset[(offset,
-                                                    source_wn_version,
-                                                    target_wn_version)]
+        mapping = self.load_offset_to_offset(source_wn_version,
+                                             target_wn_version,
+                                             pos)
+        
+        #map offset to offset (the target with the highest confidence is
+        #precomputed in the bins)
+        if output_format == "all":
+            found = mapping.get(utils.parse_offset(offset))
+        else:
+            found = mapping.get_best(utils.parse_offset(offset))
         
         #check if mapping output is not empty, else raise error
-        if not target_offsets:
+        if found is None:
             raise ValueError('''no mapping available for offset %s
                                 between wordnet version %s and %s''' % (offset,
                                                                         source_wn_version,
                                                                         target_wn_version)) 
         
-        elif output_format == "all":
-            return target_offsets
+        if output_format == "all":
+            return utils.targets_to_dict(*found)
         else:   
-            offset_with_highest_confidence,pos = utils.format_output(target_offsets)
+            offset_with_highest_confidence,pos = utils.unpack_offset(found)
             return (offset_with_highest_confidence,pos)
     
+    def map_offset_from_offset(self, 
+                               offset, 
+                               source_wn_version, 
+                               target_wn_version,
+                               output_format='highest',
+                               pos=None):
+        '''
+        the inverse of map_offset_to_offset: the synsets of source_wn_version
+        that are mapped to the synset offset of target_wn_version. The
+        offset2offset bin is inverted once (see
+        load_reverse_offset_to_offset), after which every lookup is a single
+        lookup in the inverted bin.
+        
+        >>> my_parser = WordNetMapper()
+        >>> my_parser.map_offset_from_offset("00021939", "21", "30")
+        ('00020846', 'n')
+        >>> my_parser.map_offset_from_offset("00021939", "21", "30", output_format="all", pos="n")
+        {('00020846', 'n'): 1.0}
+        >>> my_parser.map_offset_from_offset("99999999", "21", "30") # doctest: +IGNORE_EXCEPTION_DETAIL
+        Traceback (most recent call last):
+        ValueError: no mapping available for offset 99999999
+        
+        the offsets of adjective satellites are stored as adjectives
+        
+        >>> my_parser.map_offset_from_offset("00370267", "21", "30", pos="s")
+        ('00393339', 'a')
+        
+        @type  offset: str
+        @param offset: 8 character offset of target_wn_version with trailing
+        zeros (for example 00021939)
+        
+        @type  source_wn_version: str
+        @param source_wn_version: wordnet version of which the synsets are
+        returned (for example '21')
+    
+        @type  target_wn_version: str
+        @param target_wn_version: wordnet version of offset (for example '30')
+
+        @type  output_format: str
+        @param output_format: if 'highest': (offset,pos) of source_wn_version
+        with the highest confidence. if 'all', a dict is returned mapping the
+        (offset,pos) -> confidence (float)
+        
+        @type  pos: str | None
+        @param pos: part of speech of offset (n | v | a | r | s). Offsets are
+        only unique per part of speech: without pos, the synsets mapped to
+        offset in every part of speech are returned. With pos, only the
+        partition of pos is inverted if it exists.
+        
+        @rtype: tuple | dict
+        @return: (offset,pos) or dict (offset,pos) -> confidence (float) of
+        source_wn_version. The bins do not store the part of speech of the
+        source offsets, the part of speech of the target is returned (the
+        mappings are made per part of speech). ValueError is raised if no
+        mapping available.
+        '''
+        reverse = self.load_reverse_offset_to_offset(source_wn_version,
+                                                     target_wn_version,
+                                                     pos)
+        
+        target_offset = utils.parse_offset(offset)
+        scores        = {}
+        if target_offset is not None:
+            #satellites are stored as adjectives: all parts of speech of the
+            #partition of pos are looked up (see utils.partition_codes)
+            if pos is not None:
+                codes = utils.partition_codes(pos)
+                names = [name for name in utils.POS_NAMES[1:]
+                         if utils.POS_CODES[name] in codes]
+            else:
+                names = utils.POS_NAMES[1:]
+            for name in names:
+                found = reverse.get(utils.pack_offset(target_offset,name))
+                if found is None:
+                    continue
+                for source_offset,confidence in zip(*found):
+                    scores[(utils.format_offset(source_offset),name)] = confidence
+        
+        if not scores:
+            raise ValueError('''no mapping available to offset %s
+                                between wordnet version %s and %s''' % (offset,
+                                                                        source_wn_version,
+                                                                        target_wn_version)) 
+        
+        if output_format == "all":
+            return scores
+        return utils.format_output(scores)
+    
     def map_offset_to_ilidef(self,  
                              offset, 
                              source_wn_version, 
                              target_wn_version,
-                             output_format='highest'):
+                             output_format='highest',
+                             pos=None):
         '''
         method tries to map offset to ildef across versions of wordnet
         
@@ -214,6 +698,9 @@ class WordNetMapper():
         with highest confidence. if 'all', a dict is returned mapping the 
         (ilidef,pos) -> confidence (float)
         
+        @type  pos: str | None
+        @param pos: part of speech of offset (see map_offset_to_offset)
+        
         @rtype: str | dict
         @return: if param output_format == 'highest': str is returned of ilidef
         with highest confidence. if param output_format == 'all', a dict is returned mapping the 
@@ -223,7 +710,8 @@ class WordNetMapper():
         output = self.map_offset_to_offset(offset, 
                                            source_wn_version, 
                                            target_wn_version, 
-                                           output_format)
+                                           output_format,
+                                           pos)
         
         if output_format   == "highest": 
             offset_with_highest_confidence,pos = output
@@ -260,6 +748,11 @@ class WordNetMapper():
         @rtype: str
         @return: lexkey, Exception ValueError is raised if not found
         '''
+        key    = ('map_lexkey_to_lexkey',lexkey,source_wn_version,target_wn_version)
+        cached = self.result_cache.lookup(key)
+        if cached is not None:
+            return cached
+        
         #obtain lemma
         lemma = lexkey.split("%")[0]
          
@@ -269,14 +762,15 @@ class WordNetMapper():
         #map offset to offset with highest confidence
         target_offset,pos = self.map_offset_to_offset(source_offset, 
                                                       source_wn_version, 
-                                                      target_wn_version)
+                                                      target_wn_version,
+                                                      pos=utils.pos_lexkey(lexkey))
         
         #map offset to lexkey
         target_lexkey = self.map_offset_to_lexkey(target_offset, 
                                                   lemma, 
                                                   target_wn_version)
         
-        return target_lexkey
+        return self.result_cache.store(key, target_lexkey)
          
 
     def map_lexkey_to_offset(self, lexkey, source_wn_version): 
@@ -300,17 +794,17 @@ class WordNetMapper():
         #load_bin_if_needed
         path_bin = os.path.join(paths['dir_lexkey2offset_bins'],
                                 source_wn_version)
-        self.load_bin_if_needed(path_bin, 
-                                "mapping_lexkey_to_offset")
+        mapping = self.load_bin_if_needed(path_bin, 
+                                          "mapping_lexkey_to_offset")
         
         #map lexkey to offset
-        offset = self.mapping_lexkey_to_offset[(lexkey,source_wn_version)]
+        offset = mapping.get(lexkey)
         
-        if not offset:
+        if offset is None:
             raise ValueError("no offset found for %s in wordnet version %s" % (lexkey,
                                                                                 source_wn_version))
         else:
-            return offset
+            return utils.format_offset(offset)
     
     def map_lexkey_to_ilidef(self,
                              lexkey,
@@ -344,6 +838,11 @@ class WordNetMapper():
         with highest confidence. if param output_format == 'all', a dict is returned mapping the 
         (ildef,pos) -> confidence (float)
         '''
+        key    = ('map_lexkey_to_ilidef',lexkey,source_wn_version,target_wn_version,output_format)
+        cached = self.result_cache.lookup(key)
+        if cached is not None:
+            return cached
+        
         #get pos
         pos = utils.pos_lexkey(lexkey)
         
@@ -358,9 +857,10 @@ class WordNetMapper():
             ilidef = self.map_offset_to_ilidef(source_offset, 
                                                source_wn_version, 
                                                target_wn_version,
-                                               output_format=output_format)
+                                               output_format=output_format,
+                                               pos=pos)
         
-        return ilidef 
+        return self.result_cache.store(key, ilidef)
     
     def map_ilidef_to_lexkey(self, ilidef, lemma):
         '''
@@ -426,7 +926,8 @@ class WordNetMapper():
         output = self.map_offset_to_offset(source_offset, 
                                            source_wn_version, 
                                            target_wn_version,
-                                           output_format=output_format)
+                                           output_format=output_format,
+                                           pos=pos)
         
         return output
        
@@ -443,6 +944,16 @@ class WordNetMapper():
         >>> my_mapper.map_ilidef_to_ilidef('ili-30-02069355-a','30','16')
         'ili-16-01991315-a'
         
+        with max_results, results are cached and returned frozen
+        
+        >>> my_mapper = WordNetMapper(max_results=1000)
+        >>> output = my_mapper.map_ilidef_to_ilidef('ili-30-02069355-a','30','16','all')
+        >>> output is my_mapper.map_ilidef_to_ilidef('ili-30-02069355-a','30','16','all')
+        True
+        >>> output[('ili-16-01991315-a','a')] = 0.0
+        Traceback (most recent call last):
+        TypeError: FrozenDict can not be changed
+        
         @type  ili: str
         @param ili: ili defintion of wordnet synset (for example ili-30-02069355-a)
         
@@ -462,6 +973,10 @@ class WordNetMapper():
         with highest confidence. if param output_format == 'all', a dict is returned mapping the 
         (ildef,pos) -> confidence (float)
         '''
+        key    = ('map_ilidef_to_ilidef',ili,source_wn_version,target_wn_version,output_format)
+        cached = self.result_cache.lookup(key)
+        if cached is not None:
+            return cached
         
         #map ilidef2offset
         target_offsets = self.map_ilidef_to_offset(ili, 
@@ -475,7 +990,8 @@ class WordNetMapper():
             for (offset,pos),confidence in target_offsets.items():
                 ili = self.map_offset_to_ilidef(offset, 
                                                 target_wn_version, 
-                                                target_wn_version)
+                                                target_wn_version,
+                                                pos=pos)
                 output[(ili,pos)] = confidence
                 
         elif output_format == 'highest':
@@ -483,9 +999,10 @@ class WordNetMapper():
             output     = self.map_offset_to_ilidef(offset, 
                                                    target_wn_version, 
                                                    target_wn_version, 
-                                                   output_format)
+                                                   output_format,
+                                                   pos)
         
-        return output
+        return self.result_cache.store(key, output)
     
     def overlap(self,source_wn_version,target_wn_version):
         '''
@@ -508,22 +1025,20 @@ class WordNetMapper():
         indicating the percentage that was succesfully mapped. missed_mappings is 
         a list of offsets that were unable to be mapped
         '''
-        result          = 0.0
-        missed_mappings = []
+        from mapping_tables import offset_set, mapped_offsets
         
         bin_path = os.path.join(paths['dir_offset2lexkey_bins'],
                                 source_wn_version)
-        bin      = pickle.load( gzip.open(bin_path+'.gz',"rb") )
+        bin      = self.load_bin_if_needed(bin_path,
+                                           'mapping_offset_to_lexkey')
+        mapped   = mapped_offsets(offset_set(bin),
+                                  self.load_offset_to_offset(source_wn_version,
+                                                             target_wn_version))
         
-        for counter,(offset,version) in enumerate(bin):
-    
-            try:
-                output = self.map_offset_to_offset(offset,
-                                                   source_wn_version,
-                                                   target_wn_version)
-                result +=1
-            except ValueError:
-                missed_mappings.append(offset)
+        result          = float(len(mapped))
+        counter         = len(bin) - 1
+        missed_mappings = [utils.format_offset(offset) 
+                           for offset in bin if offset not in mapped]
         
         if 0 in [result,counter]:
             succes_rate = 0.0
@@ -531,4 +1046,475 @@ class WordNetMapper():
             succes_rate = result/counter
         
         return succes_rate,missed_mappings
+    
+    def coverage(self, versions=None, by_pos=False):
+        '''
+        this method determines for every pair of wordnet versions the 
+        percentage of offsets that can be succesfully mapped, with set 
+        operations on the offsets of the bins (instead of a call to 
+        map_offset_to_offset per offset as in overlap). Every bin is loaded
+        once.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> report = my_mapper.coverage(['30','171'], by_pos=True)
+        >>> report['versions']
+        ['30', '171']
+        >>> [[round(rate,4) for rate in row] for row in report['rates']]
+        [[0.9783, 0.949], [0.9914, 0.9914]]
+        >>> len(report['missed'][0][1]) == len(my_mapper.overlap('30','171')[1])
+        True
+        >>> sorted(report['pos'])
+        ['a', 'n', 'r', 'v']
+        
+        @type  versions: list | None
+        @param versions: wordnet versions (default: paths['wn_versions'])
+        
+        @type  by_pos: bool
+        @param by_pos: if True, the success rates are also computed per part
+        of speech of the source offsets (of their first lexkey)
+        
+        @rtype: dict
+        @return: 'versions' -> list of versions, 'rates' -> matrix (list of
+        rows) with the success rate from versions[row] to versions[column],
+        'missed' -> matrix with the sorted offsets that could not be mapped,
+        'pos' (if by_pos) -> pos -> matrix with the success rates of the
+        source offsets of that part of speech
+        '''
+        from mapping_tables import offset_set, mapped_offsets
+        
+        versions = list(versions or paths['wn_versions'])
+        size     = len(versions)
+        report   = {'versions' : versions,
+                    'rates'    : [[0.0] * size for version in versions],
+                    'missed'   : [[None] * size for version in versions]}
+        if by_pos:
+            report['pos'] = {}
+        
+        for row,source_wn_version in enumerate(versions):
+            bin_path       = os.path.join(paths['dir_offset2lexkey_bins'],
+                                          source_wn_version)
+            bin            = self.load_bin_if_needed(bin_path,
+                                                     'mapping_offset_to_lexkey')
+            source_offsets = offset_set(bin)
+            
+            pos_offsets = {}
+            if by_pos:
+                for offset in source_offsets:
+                    pos = utils.pos_lexkey(bin.get(offset)[0])
+                    pos_offsets.setdefault(pos,set()).add(offset)
+            
+            for column,target_wn_version in enumerate(versions):
+                mapping = self.load_offset_to_offset(source_wn_version,
+                                                     target_wn_version)
+                mapped  = mapped_offsets(source_offsets, mapping)
+                
+                if source_offsets:
+                    report['rates'][row][column] = len(mapped) / float(len(source_offsets))
+                report['missed'][row][column] = [utils.format_offset(offset) 
+                                                 for offset in sorted(source_offsets - mapped)]
+                
+                for pos,offsets in pos_offsets.items():
+                    matrix = report['pos'].setdefault(pos,[[0.0] * size for version in versions])
+                    matrix[row][column] = len(offsets & mapped) / float(len(offsets))
+        
+        return report
+        
+    
+    def map_offsets_to_offsets(self,
+                               offsets,
+                               source_wn_version,
+                               target_wn_version,
+                               output_format='highest',
+                               missing=None,
+                               pos=None):
+        '''
+        batch version of map_offset_to_offset. the bin is loaded once and
+        no exception is raised per item: offsets that can not be mapped
+        get the value of missing in the output.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> my_mapper.map_offsets_to_offsets(["00020846","99999999"], "21", "30")
+        [('00021939', 'n'), None]
+        >>> my_mapper.map_offsets_to_offsets([20846,None], "21", "30")
+        [('00021939', 'n'), None]
+        
+        @type  offsets: iterable
+        @param offsets: 8 character offsets or int offsets (for example a
+        list or a NumPy array of str or ints)
+        
+        @type  source_wn_version: str
+        @param source_wn_version: source wn_version (for example '21')
+    
+        @type  target_wn_version: str
+        @param target_wn_version: target wn_version (for example '30')
+
+        @type  output_format: str
+        @param output_format: 'highest' | 'all' (see map_offset_to_offset)
+        
+        @type  missing: object
+        @param missing: value used for offsets that can not be mapped
+        
+        @type  pos: str | None
+        @param pos: part of speech of all offsets (see map_offset_to_offset)
+        
+        @rtype: list
+        @return: output of map_offset_to_offset for each offset, aligned with
+        the input
+        '''
+        mapping = self.load_offset_to_offset(source_wn_version,
+                                             target_wn_version,
+                                             pos)
+        parse_offset = utils.parse_offset
+        
+        output = []
+        append = output.append
+        if output_format == 'all':
+            get             = mapping.get
+            targets_to_dict = utils.targets_to_dict
+            for offset in as_list(offsets):
+                found = get(parse_offset(offset))
+                append(missing if found is None else targets_to_dict(*found))
+        else:
+            get_best      = mapping.get_best
+            unpack_offset = utils.unpack_offset
+            for offset in as_list(offsets):
+                found = get_best(parse_offset(offset))
+                append(missing if found is None else unpack_offset(found))
+        
+        return output
+    
+    def map_offsets_to_ilidefs(self,
+                               offsets,
+                               source_wn_version,
+                               target_wn_version,
+                               output_format='highest',
+                               missing=None,
+                               pos=None):
+        '''
+        batch version of map_offset_to_ilidef. offsets that can not be mapped
+        get the value of missing in the output.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> my_mapper.map_offsets_to_ilidefs(["00020846","99999999"], "21", "30")
+        ['ili-30-00021939-n', None]
+        
+        @type  offsets: iterable
+        @param offsets: 8 character offsets (for example a list or a NumPy
+        array of str)
+        
+        @type  source_wn_version: str
+        @param source_wn_version: source wn_version (for example '21')
+    
+        @type  target_wn_version: str
+        @param target_wn_version: target wn_version (for example '30')
+
+        @type  output_format: str
+        @param output_format: 'highest' | 'all' (see map_offset_to_ilidef)
+        
+        @type  missing: object
+        @param missing: value used for offsets that can not be mapped
+        
+        @type  pos: str | None
+        @param pos: part of speech of all offsets (see map_offset_to_offset)
+        
+        @rtype: list
+        @return: output of map_offset_to_ilidef for each offset, aligned with
+        the input
+        '''
+        target_offsets = self.map_offsets_to_offsets(offsets,
+                                                     source_wn_version,
+                                                     target_wn_version,
+                                                     output_format,
+                                                     missing=missing,
+                                                     pos=pos)
+        
+        prefix = "ili-%s-" % target_wn_version
+        output = []
+        for target in target_offsets:
+            if target is missing:
+                output.append(missing)
+            elif output_format == 'all':
+                output.append(dict(((prefix + offset + "-" + pos,pos),confidence)
+                                   for (offset,pos),confidence in target.items()))
+            else:
+                offset,pos = target
+                output.append(prefix + offset + "-" + pos)
+        
+        return output
+    
+    def map_offsets_to_lexkeys(self,
+                               offsets,
+                               lemmas,
+                               source_wn_version,
+                               missing=None):
+        '''
+        batch version of map_offset_to_lexkey. offsets that can not be mapped
+        get the value of missing in the output.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> my_mapper.map_offsets_to_lexkeys(["05262185","99999999"], ["moustache","moustache"], "30")
+        ['moustache%1:08:00::', None]
+        
+        @type  offsets: iterable
+        @param offsets: 8 character offsets
+        
+        @type  lemmas: iterable
+        @param lemmas: the lemma corresponding to each offset
+        
+        @type  source_wn_version: str
+        @param source_wn_version: source wn_version (for example '21')
+        
+        @type  missing: object
+        @param missing: value used for offsets that can not be mapped
+        
+        @rtype: list
+        @return: lexkey for each offset, aligned with the input
+        '''
+        path_bin = os.path.join(paths['dir_offset2lexkey_bins'],
+                                source_wn_version)
+        mapping = self.load_bin_if_needed(path_bin,
+                                          'mapping_offset_to_lexkey')
+        get           = mapping.get
+        get_lemmas    = mapping.get_lemmas
+        parse_offset  = utils.parse_offset
+        select_lexkey = utils.select_lexkey
+        
+        if self.metrics is not None:
+            select_lexkey = lambda list_lexkeys, lemma, lemmas: self.select_lexkey_timed(list_lexkeys,
+                                                                                        lemma,
+                                                                                        lemmas,
+                                                                                        source_wn_version)
+        output = []
+        for offset,lemma in zip(as_list(offsets),as_list(lemmas)):
+            offset = parse_offset(offset)
+            lexkey = select_lexkey(get(offset,()), lemma, get_lemmas(offset))
+            output.append(missing if lexkey is None else lexkey)
+        
+        return output
+    
+    def map_lexkeys_to_offsets(self,
+                               lexkeys,
+                               source_wn_version,
+                               missing=None):
+        '''
+        batch version of map_lexkey_to_offset. lexkeys that can not be mapped
+        get the value of missing in the output.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> my_mapper.map_lexkeys_to_offsets(['rock_hopper%1:05:00::','no_lexkey%1:05:00::'],'21')
+        ['02037384', None]
         
+        @type  lexkeys: iterable
+        @param lexkeys: wordnet sensekeys (for example a list or a NumPy
+        array of str)
+        
+        @type  source_wn_version: str
+        @param source_wn_version: source wn_version (for example '21')
+        
+        @type  missing: object
+        @param missing: value used for lexkeys that can not be mapped
+        
+        @rtype: list
+        @return: offset for each lexkey, aligned with the input
+        '''
+        path_bin = os.path.join(paths['dir_lexkey2offset_bins'],
+                                source_wn_version)
+        get = self.load_bin_if_needed(path_bin,
+                                      'mapping_lexkey_to_offset').get
+        
+        format_offset = utils.format_offset
+        
+        output = []
+        for lexkey in as_list(lexkeys):
+            offset = get(lexkey)
+            output.append(missing if offset is None else format_offset(offset))
+        
+        return output
+    
+    def map_lexkeys_to_ilidefs(self,
+                               lexkeys,
+                               source_wn_version,
+                               target_wn_version,
+                               output_format='highest',
+                               missing=None):
+        '''
+        batch version of map_lexkey_to_ilidef. lexkeys that can not be mapped
+        get the value of missing in the output.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> my_mapper.map_lexkeys_to_ilidefs(['rock_hopper%1:05:00::','no_lexkey%1:05:00::'],'20','30')
+        ['ili-30-02057330-n', None]
+        
+        the offsets are mapped with the pos of their lexkey, as in
+        map_lexkey_to_ilidef
+        
+        >>> lexkeys = ['latria%1:04:00::','cerulean%5:00:00:chromatic:00']
+        >>> my_mapper.map_lexkeys_to_ilidefs(lexkeys,'21','30') == [my_mapper.map_lexkey_to_ilidef(lexkey,'21','30') for lexkey in lexkeys]
+        True
+        
+        @type  lexkeys: iterable
+        @param lexkeys: wordnet sensekeys (for example a list or a NumPy
+        array of str)
+        
+        @type  source_wn_version: str
+        @param source_wn_version: source wn_version (for example '21')
+    
+        @type  target_wn_version: str
+        @param target_wn_version: target wn_version (for example '30')
+        
+        @type  output_format: str
+        @param output_format: 'highest' | 'all' (see map_lexkey_to_ilidef)
+        
+        @type  missing: object
+        @param missing: value used for lexkeys that can not be mapped
+        
+        @rtype: list
+        @return: output of map_lexkey_to_ilidef for each lexkey, aligned with
+        the input
+        '''
+        lexkeys        = as_list(lexkeys)
+        source_offsets = self.map_lexkeys_to_offsets(lexkeys,
+                                                     source_wn_version,
+                                                     missing=missing)
+        
+        if source_wn_version == target_wn_version:
+            prefix = "ili-%s-" % source_wn_version
+            return [missing if offset is missing
+                    else prefix + offset + "-" + utils.pos_lexkey(lexkey)
+                    for lexkey,offset in zip(lexkeys,source_offsets)]
+        
+        return self.map_offsets_per_pos(self.map_offsets_to_ilidefs,
+                                        lexkeys,
+                                        source_offsets,
+                                        source_wn_version,
+                                        target_wn_version,
+                                        output_format,
+                                        missing)
+    
+    def map_offsets_per_pos(self,
+                            batch_method,
+                            lexkeys,
+                            source_offsets,
+                            source_wn_version,
+                            target_wn_version,
+                            output_format='highest',
+                            missing=None):
+        '''
+        map the offsets of lexkeys with batch_method (map_offsets_to_offsets
+        or map_offsets_to_ilidefs), one call per part of speech of the
+        lexkeys, as the single methods pass the pos of the lexkey (see
+        map_offset_to_offset).
+        
+        @type  lexkeys: list
+        @param lexkeys: wordnet sensekeys
+        
+        @type  source_offsets: list
+        @param source_offsets: offset of each lexkey, missing if not found
+        
+        @rtype: list
+        @return: output of batch_method for each offset, aligned with the
+        input
+        '''
+        positions_pos = {}
+        for position,(lexkey,offset) in enumerate(zip(lexkeys,source_offsets)):
+            if offset is not missing:
+                positions_pos.setdefault(utils.pos_lexkey(lexkey),[]).append(position)
+        
+        output = [missing] * len(source_offsets)
+        for pos,positions in positions_pos.items():
+            targets = batch_method([source_offsets[position] for position in positions],
+                                   source_wn_version,
+                                   target_wn_version,
+                                   output_format,
+                                   missing=missing,
+                                   pos=pos)
+            for position,target in zip(positions,targets):
+                output[position] = target
+        
+        return output
+    
+    def map_lexkeys_to_lexkeys(self,
+                               lexkeys,
+                               source_wn_version,
+                               target_wn_version,
+                               missing=None):
+        '''
+        batch version of map_lexkey_to_lexkey. lexkeys that can not be mapped
+        get the value of missing in the output.
+        
+        >>> my_mapper = WordNetMapper()
+        >>> my_mapper.map_lexkeys_to_lexkeys(['rock_hopper%1:05:00::','no_lexkey%1:05:00::'],'21','30')
+        ['rock_hopper%1:05:00::', None]
+        
+        the offsets are mapped with the pos of their lexkey, as in
+        map_lexkey_to_lexkey
+        
+        >>> lexkeys = ['latria%1:04:00::','cerulean%5:00:00:chromatic:00']
+        >>> my_mapper.map_lexkeys_to_lexkeys(lexkeys,'21','30') == [my_mapper.map_lexkey_to_lexkey(lexkey,'21','30') for lexkey in lexkeys]
+        True
+        >>> my_mapper.map_lexkeys_to_lexkeys(['endwise%4:02:02::'],'17','17')
+        ['endwise%4:02:02::']
+        
+        @type  lexkeys: iterable
+        @param lexkeys: wordnet sensekeys
+        
+        @type  source_wn_version: str
+        @param source_wn_version: source wn_version (for example '21')
+    
+        @type  target_wn_version: str
+        @param target_wn_version: target wn_version (for example '30')
+        
+        @type  missing: object
+        @param missing: value used for lexkeys that can not be mapped
+        
+        @rtype: list
+        @return: lexkey in target_wn_version for each lexkey, aligned with
+        the input
+        '''
+        lexkeys        = as_list(lexkeys)
+        source_offsets = self.map_lexkeys_to_offsets(lexkeys,
+                                                     source_wn_version,
+                                                     missing=missing)
+        
+        target_offsets = self.map_offsets_per_pos(self.map_offsets_to_offsets,
+                                                  lexkeys,
+                                                  source_offsets,
+                                                  source_wn_version,
+                                                  target_wn_version,
+                                                  missing=missing)
+        
+        offsets,lemmas,positions = [],[],[]
+        for position,(lexkey,target) in enumerate(zip(lexkeys,target_offsets)):
+            if target is missing:
+                continue
+            offsets.append(target[0])
+            lemmas.append(lexkey.split("%")[0])
+            positions.append(position)
+        
+        output = [missing] * len(lexkeys)
+        target_lexkeys = self.map_offsets_to_lexkeys(offsets,
+                                                     lemmas,
+                                                     target_wn_version,
+                                                     missing=missing)
+        for position,target_lexkey in zip(positions,target_lexkeys):
+            output[position] = target_lexkey
+        
+        return output
+
+def as_list(items):
+    '''
+    convert the input of the batch methods to a list.
+    NumPy arrays are converted with tolist, which is much faster than
+    iterating over the array.
+    
+    @type  items: iterable
+    @param items: list | tuple | NumPy array | generator
+    
+    @rtype: list
+    @return: the items as list
+    '''
+    if hasattr(items,'tolist'):
+        return items.tolist()
+    if isinstance(items,list):
+        return items
+    return list(items)